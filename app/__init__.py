@@ -1,27 +1,62 @@
+import os
+import weakref
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_mail import Mail
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
-from flask_migrate import Migrate   # ✅ Import Flask-Migrate
-from config import Config
+from app.utils.database import RoutingSession, configure_database, install_sqlite_pragmas
 
 csrf = CSRFProtect()
-db = SQLAlchemy()
-mail = Mail()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
-migrate = Migrate()   # ✅ Create Migrate instance
 
-def create_app():
+# Apps created in this process, for the fork hook below
+_apps = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    # With gunicorn --preload the app is built in the master; a forked
+    # worker must not reuse pooled connections inherited from it
+    for app in list(_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def init_migrate(app):
+    """Set up Flask-Migrate on first use; it imports Alembic, which only `flask db` needs"""
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+
+def create_app(preload=False):
+    """Build the app without side effects beyond the app object itself.
+
+    Nothing here connects to the database, starts threads or writes files,
+    so the app can be created in the gunicorn master (--preload) and forked.
+    Pillow loads on the first photo and Alembic only for `flask db`;
+    preload=True imports Pillow and compiles the templates up front instead,
+    so forked workers share those pages copy-on-write.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()  # before Config reads the environment
+    from config import Config
+
     app = Flask(__name__, template_folder='templates')
     app.config.from_object(Config)
 
     # Initialize extensions
+    configure_database(app)
     db.init_app(app)
-    mail.init_app(app)
+    with app.app_context():
+        install_sqlite_pragmas(app, db.engines.values())
     login_manager.init_app(app)
     csrf.init_app(app)
-    migrate.init_app(app, db)  # ✅ Initialize Flask-Migrate with app & db
 
     # Register blueprints
     from app.routes.public_routes import public_bp
@@ -32,4 +67,20 @@ def create_app():
     app.register_blueprint(admin_bp)
     app.register_blueprint(auth_bp)
 
+    from app.cli import register_commands
+    register_commands(app)
+
+    from app.utils.instrumentation import init_instrumentation
+    init_instrumentation(app)
+
+    if preload:
+        _preload(app)
+    _apps.add(app)
     return app
+
+
+def _preload(app):
+    from app.utils.image_utils import pillow
+    pillow()
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
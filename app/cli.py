@@ -0,0 +1,233 @@
+import click
+from flask.cli import AppGroup, with_appcontext
+
+match_cli = AppGroup('match', help='Candidate matching commands.')
+mail_cli = AppGroup('mail', help='Email outbox commands.')
+search_cli = AppGroup('search', help='Full-text search commands.')
+plans_cli = AppGroup('plans', help='Query plan checks.')
+reports_cli = AppGroup('reports', help='Bulk report import and export.')
+places_cli = AppGroup('places', help='Offline gazetteer for geocoding report locations.')
+retention_cli = AppGroup('retention', help='Archive and purge old closed reports.')
+
+
+@match_cli.command('backfill')
+@click.option('--kind', type=click.Choice(['lost', 'found', 'all']), default='all')
+@click.option('--batch-size', default=500, show_default=True)
+def match_backfill(kind, batch_size):
+    """Score existing reports and store their top candidates."""
+    from app.utils.match_worker import backfill
+    for each_kind in (['lost', 'found'] if kind == 'all' else [kind]):
+        total = 0
+        for last_id, scored in backfill(each_kind, batch_size):
+            total += scored
+            click.echo(f'{each_kind}: {total} reports scored (up to id {last_id})')
+
+
+@match_cli.command('photos')
+@click.option('--older-than', default=0, show_default=True,
+              help='Only reports submitted at least this many minutes ago.')
+def match_photos(older_than):
+    """Process staged photos no worker has finished, then score their reports."""
+    from datetime import datetime, timedelta
+    from app.utils.file_utils import pending_photo_ids
+    from app.utils.match_utils import report_model
+    from app.utils.match_worker import process_report
+    for kind in ('lost', 'found'):
+        ids = pending_photo_ids(report_model(kind), datetime.utcnow() - timedelta(minutes=older_than))
+        failed = sum(not process_report(kind, report_id) for report_id in ids)
+        click.echo(f'{kind}: {len(ids) - failed} pending photos processed, {failed} failed')
+
+
+@mail_cli.command('send')
+@click.option('--flush', is_flag=True, help='Send pending digests now instead of waiting for MAIL_DIGEST_SECONDS.')
+@click.option('--retry-failed', is_flag=True, help='Retry events whose digest could not be rendered before.')
+def mail_send(flush, retry_failed):
+    """Queue due notification digests, deliver every due outbox email and exit."""
+    from flask import current_app
+    from app.utils.email_utils import SMTPSender, drain_outbox
+    from app.utils.notification_utils import coalesce_notifications, retry_failed_notifications
+    if retry_failed:
+        click.echo(f'{retry_failed_notifications()} set-aside event(s) retried')
+    digests = 0
+    while True:
+        queued = coalesce_notifications(flush=flush)
+        if not queued:
+            break
+        digests += queued
+    click.echo(f'{digests} notification email(s) queued')
+    sender = SMTPSender(current_app.config)
+    try:
+        sent, failed = drain_outbox(sender)
+    finally:
+        sender.close()
+    click.echo(f'{sent} sent, {failed} failed')
+
+
+@mail_cli.command('status')
+def mail_status():
+    """Show outbox entries per delivery status."""
+    from app.utils.email_utils import outbox_status
+    from app.utils.notification_utils import notification_status
+    for status, count in sorted(outbox_status().items()):
+        click.echo(f'{status}: {count}')
+    events, recipients, failed = notification_status()
+    click.echo(f'awaiting digest: {events} event(s) for {recipients} recipient(s)')
+    if failed:
+        click.echo(f'set aside: {failed} event(s) whose digest could not be rendered '
+                   f'(see the log; retry with `flask mail send --retry-failed`)')
+
+
+@search_cli.command('rebuild')
+def search_rebuild():
+    """Install the full-text index on existing tables and repopulate it."""
+    from app import db
+    from app.utils.search_utils import install_search_index
+    with db.engine.begin() as connection:
+        for table in ('lost_report', 'found_report'):
+            installed = install_search_index(connection, table, rebuild=True)
+            click.echo(f"{table}: {'indexed' if installed else 'not supported, using LIKE fallback'}")
+
+
+@plans_cli.command('check')
+@click.option('--verbose', '-v', is_flag=True, help='Print the plan of every query.')
+def plans_check(verbose):
+    """Fail if a hot query falls back to a full table scan."""
+    from app.utils.query_plans import check_query_plans
+    failures = 0
+    for name, lines, scanned in check_query_plans():
+        if scanned:
+            failures += 1
+            click.echo(f"❌ {name}: full scan of {', '.join(scanned)}")
+        else:
+            click.echo(f'✅ {name}')
+        if verbose or scanned:
+            for line in lines:
+                click.echo(f'    {line}')
+    if failures:
+        raise click.ClickException(f'{failures} hot queries fall back to a full scan')
+
+
+@reports_cli.command('import')
+@click.argument('file', type=click.File('rb'))
+@click.option('--kind', type=click.Choice(['lost', 'found']), required=True)
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True)
+def reports_import(file, kind, fmt, batch_size):
+    """Import reports from a CSV or JSONL file and queue them for matching."""
+    from app.utils.bulk_utils import format_for, import_reports, read_rows
+    from app.utils.match_worker import wait_for_pending
+    fmt = fmt or format_for(file.name)
+    result = import_reports(kind, read_rows(file, fmt), batch_size)
+    for line_number, error in result.errors:
+        click.echo(f'❌ line {line_number}: {error}')
+    click.echo(f'✅ {result.inserted} {kind} reports imported, {result.skipped} skipped')
+    click.echo('Scoring candidates...')
+    wait_for_pending()
+
+
+@reports_cli.command('export')
+@click.option('--kind', type=click.Choice(['lost', 'found']), required=True)
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-')
+def reports_export(kind, fmt, output):
+    """Stream every report of one kind as CSV or JSONL."""
+    from app.utils.bulk_utils import export_reports
+    for chunk in export_reports(kind, fmt):
+        output.write(chunk)
+
+
+@places_cli.command('import')
+@click.argument('file', type=click.File('rb'))
+@click.option('--replace', is_flag=True, help='Delete every existing place first.')
+def places_import(file, replace):
+    """Load places from a CSV with name, latitude, longitude[, aliases separated by |]."""
+    from app.utils.geo_utils import import_places, read_places
+    written = import_places(read_places(file), replace=replace)
+    click.echo(f'✅ {written} place names stored. Run `flask places geocode` to locate existing reports.')
+
+
+@places_cli.command('geocode')
+@click.option('--batch-size', default=1000, show_default=True)
+def places_geocode(batch_size):
+    """Geocode the locations of existing reports against the place table."""
+    from app.utils.geo_utils import geocode_reports
+    from app.utils.match_utils import report_model
+    for kind in ('lost', 'found'):
+        located = 0
+        for last_id, batch_located in geocode_reports(report_model(kind), batch_size):
+            located += batch_located
+            click.echo(f'{kind}: {located} reports located (up to id {last_id})')
+
+
+@retention_cli.command('run')
+@click.option('--older-than', type=int, help='Days since closed (matched/recovered); defaults to RETENTION_DAYS.')
+@click.option('--batch-size', type=int, help='Reports per transaction; defaults to RETENTION_BATCH_SIZE.')
+@click.option('--dry-run', is_flag=True, help='Only report what would be archived.')
+@click.option('--vacuum', is_flag=True, help='Also VACUUM SQLite afterwards (locks the database while it runs).')
+def retention_run(older_than, batch_size, dry_run, vacuum):
+    """Archive matched/recovered reports past retention, then delete them and their photos."""
+    from datetime import datetime, timedelta
+    from flask import current_app
+    from app.utils.retention_utils import apply_retention, compact, retention_report
+    days = current_app.config['RETENTION_DAYS'] if older_than is None else older_than
+    if not days:
+        click.echo('Retention is disabled (RETENTION_DAYS=0); pass --older-than to run anyway.')
+        return
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    if dry_run:
+        report = retention_report(cutoff)
+        click.echo(f"Closed before {cutoff:%Y-%m-%d}: {report['lost']} lost and {report['found']} found "
+                   f"reports, {report['photos']} photos ({current_app.config['RETENTION_PHOTOS']})")
+        if report['oldest']:
+            click.echo(f"Oldest {report['oldest']:%Y-%m-%d}, newest {report['newest']:%Y-%m-%d}")
+        return
+
+    lost = found = photos = 0
+    for batch in apply_retention(cutoff, batch_size):
+        lost, found, photos = lost + batch.lost, found + batch.found, photos + batch.photos
+        click.echo(f'{lost} lost and {found} found reports archived, {photos} photos')
+    compact(vacuum)
+    click.echo(f'✅ Retention done: {lost} lost and {found} found reports archived, {photos} photos')
+
+
+class _MigrateGroup(click.Group):
+    """Flask-Migrate's `flask db` commands, looked up only when `flask db` runs.
+
+    Importing Flask-Migrate loads Alembic, which costs every other command
+    and every worker a noticeable part of their startup.
+    """
+
+    def _group(self):
+        from flask_migrate.cli import db
+        return db
+
+    def list_commands(self, ctx):
+        return self._group().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._group().get_command(ctx, name)
+
+
+@click.group('db', cls=_MigrateGroup, help='Perform database migrations.')
+@click.option('-d', '--directory', default=None, help='Migration script directory (default is "migrations")')
+@click.option('-x', '--x-arg', multiple=True, help='Additional arguments consumed by custom env.py scripts')
+@with_appcontext
+def migrate_cli(directory, x_arg):
+    from flask import current_app, g
+    from app import init_migrate
+    init_migrate(current_app)
+    # Same as Flask-Migrate's own group: its commands read these from g
+    g.directory = directory
+    g.x_arg = x_arg
+
+
+def register_commands(app):
+    app.cli.add_command(match_cli)
+    app.cli.add_command(mail_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(plans_cli)
+    app.cli.add_command(reports_cli)
+    app.cli.add_command(places_cli)
+    app.cli.add_command(retention_cli)
+    app.cli.add_command(migrate_cli)
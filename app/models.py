@@ -3,6 +3,19 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db, login_manager
 
+# Report lifecycle; open reports are still waiting for their counterpart
+REPORT_STATUSES = ('reported', 'verified', 'matched', 'recovered')
+OPEN_STATUSES = ('reported', 'verified')
+CLOSED_STATUSES = ('matched', 'recovered')
+ID_TYPES = ('Student ID', 'Staff ID', 'Employee ID', 'Library Card', 'Access Card', 'Other')
+
+# Native ENUM types on PostgreSQL (4 bytes a row instead of the repeated label)
+ReportStatus = db.Enum(*REPORT_STATUSES, name='report_status')
+IdType = db.Enum(*ID_TYPES, name='report_id_type')
+
+# Partial-index predicate; queries must spell the same literal IN list to use it
+OPEN_PREDICATE = db.text('status IN (%s)' % ', '.join(f"'{status}'" for status in OPEN_STATUSES))
+
 class Admin(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -21,15 +34,46 @@ class LostReport(db.Model):
     reporter_email = db.Column(db.String(120), nullable=False)
     reporter_phone = db.Column(db.String(20))
     id_number = db.Column(db.String(50), nullable=False)
-    id_type = db.Column(db.String(50), nullable=False)
+    normalized_id = db.Column(db.String(50))
+    id_type = db.Column(IdType, nullable=False)
     owner_name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     photo_path = db.Column(db.String(200))
+    photo_hash = db.Column(db.BigInteger)  # 64-bit dHash, stored signed
+    photo_upload = db.Column(db.String(200))  # staged upload awaiting processing
+    photo_attached_at = db.Column(db.DateTime)
     date_lost = db.Column(db.Date)
     location_lost = db.Column(db.String(200))
-    status = db.Column(db.String(20), default='reported')
+    location_lat = db.Column(db.Float)  # geocoded from location_lost via the place table
+    location_lon = db.Column(db.Float)
+    status = db.Column(ReportStatus, nullable=False, default='reported')
     date_reported = db.Column(db.DateTime, default=datetime.utcnow)
     matched_with = db.Column(db.Integer, db.ForeignKey('found_report.id'), nullable=True)
+    closed_at = db.Column(db.DateTime)  # when the status last became matched or recovered
+
+    __table_args__ = (
+        # Candidate lookup by ID number; closed reports are never candidates
+        db.Index('ix_lost_report_open_id', 'normalized_id', 'id_type',
+                 sqlite_where=OPEN_PREDICATE, postgresql_where=OPEN_PREDICATE),
+        db.Index('ix_lost_report_matched_with', 'matched_with',
+                 sqlite_where=db.text('matched_with IS NOT NULL'),
+                 postgresql_where=db.text('matched_with IS NOT NULL')),
+        # Keyset pagination of the dashboard, unfiltered and per filter
+        db.Index('ix_lost_report_recent', 'date_reported', 'id'),
+        db.Index('ix_lost_report_status_recent', 'status', 'date_reported', 'id'),
+        db.Index('ix_lost_report_type_recent', 'id_type', 'date_reported', 'id'),
+        # Covering index for the dashboard's status/type counts
+        db.Index('ix_lost_report_status_type', 'status', 'id_type'),
+        # Photos still being processed, and photos attached after the row
+        db.Index('ix_lost_report_photo_pending', 'photo_upload',
+                 sqlite_where=db.text('photo_upload IS NOT NULL'),
+                 postgresql_where=db.text('photo_upload IS NOT NULL')),
+        db.Index('ix_lost_report_photo_attached', 'photo_attached_at'),
+        # Retention: closed reports by the time they were closed
+        db.Index('ix_lost_report_closed', 'closed_at',
+                 sqlite_where=db.text('closed_at IS NOT NULL'),
+                 postgresql_where=db.text('closed_at IS NOT NULL')),
+    )
 
 class FoundReport(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -37,15 +81,153 @@ class FoundReport(db.Model):
     finder_email = db.Column(db.String(120), nullable=False)
     finder_phone = db.Column(db.String(20))
     id_number = db.Column(db.String(50))
-    id_type = db.Column(db.String(50), nullable=False)
+    normalized_id = db.Column(db.String(50))
+    id_type = db.Column(IdType, nullable=False)
     owner_name = db.Column(db.String(100))
     description = db.Column(db.Text)
     photo_path = db.Column(db.String(200))
+    photo_hash = db.Column(db.BigInteger)  # 64-bit dHash, stored signed
+    photo_upload = db.Column(db.String(200))  # staged upload awaiting processing
+    photo_attached_at = db.Column(db.DateTime)
     date_found = db.Column(db.Date)
     location_found = db.Column(db.String(200))
-    status = db.Column(db.String(20), default='reported')
+    location_lat = db.Column(db.Float)  # geocoded from location_found via the place table
+    location_lon = db.Column(db.Float)
+    status = db.Column(ReportStatus, nullable=False, default='reported')
     date_reported = db.Column(db.DateTime, default=datetime.utcnow)
     matched_with = db.Column(db.Integer, db.ForeignKey('lost_report.id'), nullable=True)
+    closed_at = db.Column(db.DateTime)  # when the status last became matched or recovered
+
+    __table_args__ = (
+        # Candidate lookup by ID number; closed reports are never candidates
+        db.Index('ix_found_report_open_id', 'normalized_id', 'id_type',
+                 sqlite_where=OPEN_PREDICATE, postgresql_where=OPEN_PREDICATE),
+        db.Index('ix_found_report_matched_with', 'matched_with',
+                 sqlite_where=db.text('matched_with IS NOT NULL'),
+                 postgresql_where=db.text('matched_with IS NOT NULL')),
+        db.Index('ix_found_report_recent', 'date_reported', 'id'),
+        db.Index('ix_found_report_status_recent', 'status', 'date_reported', 'id'),
+        db.Index('ix_found_report_type_recent', 'id_type', 'date_reported', 'id'),
+        db.Index('ix_found_report_status_type', 'status', 'id_type'),
+        db.Index('ix_found_report_photo_pending', 'photo_upload',
+                 sqlite_where=db.text('photo_upload IS NOT NULL'),
+                 postgresql_where=db.text('photo_upload IS NOT NULL')),
+        db.Index('ix_found_report_photo_attached', 'photo_attached_at'),
+        db.Index('ix_found_report_closed', 'closed_at',
+                 sqlite_where=db.text('closed_at IS NOT NULL'),
+                 postgresql_where=db.text('closed_at IS NOT NULL')),
+    )
+
+class Place(db.Model):
+    """Gazetteer entry used to geocode report locations offline; one row per name or alias"""
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(200), unique=True, nullable=False)  # normalized name or alias
+    name = db.Column(db.String(200), nullable=False)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+
+class NameToken(db.Model):
+    """Blocking index of owner-name tokens used for candidate lookup"""
+    id = db.Column(db.Integer, primary_key=True)
+    report_kind = db.Column(db.String(5), nullable=False)  # 'lost' or 'found'
+    report_id = db.Column(db.Integer, nullable=False)
+    token = db.Column(db.String(100), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_name_token_lookup', 'report_kind', 'token', 'report_id'),
+        db.Index('ix_name_token_report', 'report_id', 'report_kind'),
+    )
+
+class MatchCandidate(db.Model):
+    """Precomputed lost/found candidate pair produced by the match worker"""
+    id = db.Column(db.Integer, primary_key=True)
+    lost_id = db.Column(db.Integer, db.ForeignKey('lost_report.id'), nullable=False)
+    found_id = db.Column(db.Integer, db.ForeignKey('found_report.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    date_scored = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('lost_id', 'found_id', name='uq_match_candidate_pair'),
+        db.Index('ix_match_candidate_found', 'found_id', 'score'),
+        db.Index('ix_match_candidate_lost', 'lost_id', 'score'),
+    )
+
+class EmailOutbox(db.Model):
+    """Notification email queued for delivery by the outbox sender"""
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(120), nullable=False)
+    to_name = db.Column(db.String(100))
+    subject = db.Column(db.String(200), nullable=False)
+    html_content = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    date_created = db.Column(db.DateTime, default=datetime.utcnow)
+    date_sent = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_due', 'status', 'next_attempt_at'),
+    )
+
+class Notification(db.Model):
+    """Event waiting to be mailed; pending events for one recipient go out as one digest"""
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(120), nullable=False)
+    to_name = db.Column(db.String(100))
+    template = db.Column(db.String(50), nullable=False)  # templates/email/<template>.html
+    context = db.Column(db.Text, nullable=False)  # JSON
+    date_created = db.Column(db.DateTime, default=datetime.utcnow)
+    failed_at = db.Column(db.DateTime)  # the digest could not be rendered; set aside until retried
+
+    __table_args__ = (
+        db.Index('ix_notification_recipient', 'to_email', 'date_created'),
+    )
+
+def name_tokens_delete(kind, report_id):
+    return NameToken.__table__.delete().where(NameToken.report_kind == kind, NameToken.report_id == report_id)
+
+def _set_normalized_id(mapper, connection, target):
+    from app.utils.match_utils import normalize_id_number
+    target.normalized_id = normalize_id_number(target.id_number)
+
+def _sync_name_tokens(mapper, connection, target):
+    from app.utils.match_utils import report_kind, token_rows
+    kind = report_kind(target)
+    connection.execute(name_tokens_delete(kind, target.id))
+    rows = token_rows(kind, target.id, target.owner_name)
+    if rows:
+        connection.execute(NameToken.__table__.insert(), rows)
+
+def _resync_name_tokens(mapper, connection, target):
+    if db.inspect(target).attrs.owner_name.history.has_changes():
+        _sync_name_tokens(mapper, connection, target)
+
+def _set_closed_at(mapper, connection, target):
+    state = db.inspect(target)
+    if state.persistent:
+        if state.attrs.status.history.has_changes():
+            target.closed_at = datetime.utcnow() if target.status in CLOSED_STATUSES else None
+    elif target.closed_at is None and target.status in CLOSED_STATUSES:
+        target.closed_at = datetime.utcnow()
+
+def _set_location_point(mapper, connection, target):
+    from app.utils.geo_utils import geocode
+    attr = 'location_lost' if isinstance(target, LostReport) else 'location_found'
+    state = db.inspect(target)
+    if state.persistent and not state.attrs[attr].history.has_changes():
+        return
+    target.location_lat, target.location_lon = geocode(connection, getattr(target, attr))
+
+for _model in (LostReport, FoundReport):
+    db.event.listen(_model, 'before_insert', _set_normalized_id)
+    db.event.listen(_model, 'before_update', _set_normalized_id)
+    db.event.listen(_model, 'before_insert', _set_location_point)
+    db.event.listen(_model, 'before_update', _set_location_point)
+    db.event.listen(_model, 'before_insert', _set_closed_at)
+    db.event.listen(_model, 'before_update', _set_closed_at)
+    db.event.listen(_model, 'after_insert', _sync_name_tokens)
+    db.event.listen(_model, 'after_update', _resync_name_tokens)
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -1,58 +1,108 @@
 import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from datetime import datetime
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, abort, Response, stream_with_context, jsonify
 from flask_login import login_required
 from app import db
-from app.models import LostReport, FoundReport
-from app.utils.email_utils import send_email_notification
+from app.models import LostReport, FoundReport, ID_TYPES, REPORT_STATUSES
+from app.utils import admin_actions, bulk_utils
+from app.utils.cache import cache_key, cached, invalidate
+from app.utils.database import replica_reads
+from app.utils.notification_utils import notify_match
+from app.utils.match_utils import load_ranked, match_signals, verify_candidates
+from app.utils.pagination import keyset_page
+from app.utils.search_utils import get_search_backend
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
 
 @admin_bp.route('/dashboard',endpoint='admin_dashboard')
 @login_required
+@replica_reads
 def dashboard():
     """Admin dashboard with filters and search"""
+    # The report tabs depend only on the query string and the report tables,
+    # so they are rendered once per filter/page until a report changes
+    reports_html = cached('dashboard_reports', cache_key(sorted(request.args.items(multi=True))),
+                          _render_dashboard_reports)
+    return render_template('admin_dashboard.html', reports_html=reports_html, id_types=ID_TYPES)
+
+
+def _render_dashboard_reports():
     search_query = request.args.get('search', '')
+    # Values outside the enums would be a database error on PostgreSQL;
+    # they are ignored like an empty filter
     filter_status = request.args.get('status', '')
+    if filter_status not in REPORT_STATUSES:
+        filter_status = ''
     filter_type = request.args.get('type', '')
+    if filter_type not in ID_TYPES:
+        filter_type = ''
 
     lost_query = LostReport.query
     found_query = FoundReport.query
 
-    if search_query:
-        lost_query = lost_query.filter(
-            db.or_(
-                LostReport.id_number.contains(search_query),
-                LostReport.owner_name.contains(search_query),
-                LostReport.reporter_name.contains(search_query)
-            )
-        )
-        found_query = found_query.filter(
-            db.or_(
-                FoundReport.id_number.contains(search_query),
-                FoundReport.owner_name.contains(search_query),
-                FoundReport.finder_name.contains(search_query)
-            )
-        )
+    search = get_search_backend() if search_query else None
+    if search:
+        lost_query = search.filter(lost_query, LostReport, search_query)
+        found_query = search.filter(found_query, FoundReport, search_query)
 
     if filter_status:
-        lost_query = lost_query.filter_by(status=filter_status)
-        found_query = found_query.filter_by(status=filter_status)
+        lost_query = lost_query.filter(LostReport.status == filter_status)
+        found_query = found_query.filter(FoundReport.status == filter_status)
 
     if filter_type:
-        lost_query = lost_query.filter_by(id_type=filter_type)
-        found_query = found_query.filter_by(id_type=filter_type)
-
-    lost_reports = lost_query.order_by(LostReport.date_reported.desc()).all()
-    found_reports = found_query.order_by(FoundReport.date_reported.desc()).all()
-
-    return render_template('admin_dashboard.html',
+        lost_query = lost_query.filter(LostReport.id_type == filter_type)
+        found_query = found_query.filter(FoundReport.id_type == filter_type)
+
+    page_size = min(request.args.get('per_page', current_app.config['ADMIN_PAGE_SIZE'], type=int),
+                    current_app.config['ADMIN_MAX_PAGE_SIZE'])
+    page_size = max(page_size, 1)
+    if search:
+        # Relevance-ranked: only the best page_size hits per tab are shown
+        lost_reports = search.order(lost_query, LostReport, search_query).limit(page_size).all()
+        found_reports = search.order(found_query, FoundReport, search_query).limit(page_size).all()
+        lost_next = found_next = None
+    else:
+        lost_reports, lost_next = keyset_page(lost_query, LostReport, request.args.get('lost_after'), page_size)
+        found_reports, found_next = keyset_page(found_query, FoundReport, request.args.get('found_after'), page_size)
+
+    # Counts don't depend on the page, so paging reuses them
+    counts = cached('dashboard_counts', cache_key(search_query, filter_status, filter_type),
+                    lambda: _report_counts(lost_query, found_query))
+
+    return render_template('admin_dashboard_reports.html',
                            lost_reports=lost_reports,
-                           found_reports=found_reports)
+                           found_reports=found_reports,
+                           lost_next=lost_next,
+                           found_next=found_next,
+                           counts=counts)
+
+
+def report_counts_query(lost_query, found_query):
+    """(kind, status, id_type, count) rows for both filtered queries, as one UNION ALL"""
+    lost_counts = lost_query.with_entities(
+        db.literal('lost').label('kind'), LostReport.status, LostReport.id_type, db.func.count()
+    ).group_by(LostReport.status, LostReport.id_type)
+    found_counts = found_query.with_entities(
+        db.literal('found').label('kind'), FoundReport.status, FoundReport.id_type, db.func.count()
+    ).group_by(FoundReport.status, FoundReport.id_type)
+    return lost_counts.union_all(found_counts)
+
+
+def _report_counts(lost_query, found_query):
+    """Totals per status and per ID type for both filtered queries in one GROUP BY round trip"""
+    counts = {kind: {'total': 0, 'status': {}, 'type': {}} for kind in ('lost', 'found')}
+    for kind, status, id_type, count in report_counts_query(lost_query, found_query):
+        bucket = counts[kind]
+        bucket['total'] += count
+        bucket['status'][status] = bucket['status'].get(status, 0) + count
+        bucket['type'][id_type] = bucket['type'].get(id_type, 0) + count
+    return counts
 
 
 @admin_bp.route('/verify-lost/<int:report_id>', methods=['GET', 'POST'])
 @login_required
+@replica_reads
 def verify_lost(report_id):
     """Verify or match a lost ID report"""
     report = LostReport.query.get_or_404(report_id)
@@ -74,27 +124,7 @@ def verify_lost(report_id):
                     found_report.matched_with = report.id
                     report.status = found_report.status = 'matched'
 
-                    # email notifications
-                    subject_owner = "Good News! Your Lost ID Card Has Been Found"
-                    msg_owner = f"""
-                    <p>Dear {report.reporter_name},</p>
-                    <p>Your lost <strong>{report.id_type}</strong> has been found!</p>
-                    <p><strong>ID Number:</strong> {report.id_number}</p>
-                    <p><strong>Found Location:</strong> {found_report.location_found or 'N/A'}</p>
-                    <p>Our admin team will contact you soon for recovery details.</p>
-                    """
-
-                    send_email_notification(report.reporter_email, report.reporter_name, subject_owner, msg_owner)
-
-                    subject_finder = "Thank You for Reporting a Found ID Card"
-                    msg_finder = f"""
-                    <p>Dear {found_report.finder_name},</p>
-                    <p>The ID card you reported has been successfully matched with its owner!</p>
-                    <p><strong>ID Type:</strong> {found_report.id_type}</p>
-                    <p>Our admin team will contact you soon to arrange return.</p>
-                    """
-
-                    send_email_notification(found_report.finder_email, found_report.finder_name, subject_finder, msg_finder)
+                    notify_match(report, found_report)
                     flash('Lost and Found reports matched successfully!', 'success')
 
         elif action == 'recovered':
@@ -102,21 +132,20 @@ def verify_lost(report_id):
             flash('Report marked as recovered!', 'success')
 
         db.session.commit()
+        invalidate()
         return redirect(url_for('admin.admin_dashboard'))
 
-    potential_matches = FoundReport.query.filter(
-        FoundReport.status.in_(['reported', 'verified']),
-        db.or_(
-            FoundReport.id_number == report.id_number,
-            FoundReport.owner_name.contains(report.owner_name)
-        )
-    ).all()
+    ranked = cached('verify_candidates', f'lost:{report.id}', lambda: verify_candidates(report))
+    potential_matches = load_ranked(FoundReport, ranked)
+    signals = match_signals(report, [match for match, _ in potential_matches])
 
-    return render_template('verify_lost.html', report=report, potential_matches=potential_matches)
+    return render_template('verify_lost.html', report=report, potential_matches=potential_matches,
+                           signals=signals)
 
 
 @admin_bp.route('/verify-found/<int:report_id>', methods=['GET', 'POST'])
 @login_required
+@replica_reads
 def verify_found(report_id):
     """Verify or match a found ID report"""
     report = FoundReport.query.get_or_404(report_id)
@@ -137,24 +166,7 @@ def verify_found(report_id):
                     lost_report.matched_with = report.id
                     report.status = lost_report.status = 'matched'
 
-                    subject_owner = "Good News! Your Lost ID Card Has Been Found"
-                    msg_owner = f"""
-                    <p>Dear {lost_report.reporter_name},</p>
-                    <p>Your lost <strong>{lost_report.id_type}</strong> has been found!</p>
-                    <p><strong>ID Number:</strong> {lost_report.id_number}</p>
-                    <p><strong>Found Location:</strong> {report.location_found or 'N/A'}</p>
-                    """
-
-                    send_email_notification(lost_report.reporter_email, lost_report.reporter_name, subject_owner, msg_owner)
-
-                    subject_finder = "Thank You for Reporting a Found ID Card"
-                    msg_finder = f"""
-                    <p>Dear {report.finder_name},</p>
-                    <p>The ID card you found has been matched with its owner!</p>
-                    <p><strong>ID Type:</strong> {report.id_type}</p>
-                    """
-
-                    send_email_notification(report.finder_email, report.finder_name, subject_finder, msg_finder)
+                    notify_match(lost_report, report)
                     flash('Reports matched successfully!', 'success')
 
         elif action == 'recovered':
@@ -162,14 +174,219 @@ def verify_found(report_id):
             flash('Report marked as recovered!', 'success')
 
         db.session.commit()
+        invalidate()
         return redirect(url_for('admin.admin_dashboard'))
 
-    potential_matches = LostReport.query.filter(
-        LostReport.status.in_(['reported', 'verified']),
-        db.or_(
-            LostReport.id_number == report.id_number,
-            LostReport.owner_name.contains(report.owner_name)
-        )
-    ).all()
+    ranked = cached('verify_candidates', f'found:{report.id}', lambda: verify_candidates(report))
+    potential_matches = load_ranked(LostReport, ranked)
+    signals = match_signals(report, [match for match, _ in potential_matches])
+
+    return render_template('verify_found.html', report=report, potential_matches=potential_matches,
+                           signals=signals)
+
+
+def _parse_bulk_value(value):
+    """(kind, id, status) of a dashboard checkbox value "kind:id:status", None if malformed"""
+    parts = value.split(':', 2)
+    if len(parts) != 3 or parts[0] not in ('lost', 'found') or parts[2] not in REPORT_STATUSES:
+        return None
+    try:
+        report_id = int(parts[1])
+    except ValueError:
+        return None
+    return (parts[0], report_id, parts[2]) if report_id > 0 else None
+
+
+def _parse_bulk_pair(value):
+    """(lost id, lost status, found id, found status) of a confirmed pair
+    "lost_id:lost_status:found_id:found_status", None if malformed"""
+    parts = value.split(':', 3)
+    if len(parts) != 4 or parts[1] not in REPORT_STATUSES or parts[3] not in REPORT_STATUSES:
+        return None
+    try:
+        lost_id, found_id = int(parts[0]), int(parts[2])
+    except ValueError:
+        return None
+    return (lost_id, parts[1], found_id, parts[3]) if lost_id > 0 and found_id > 0 else None
+
+
+def _parse_bulk_payload(payload):
+    """(action, kind, items) of a JSON bulk request; raises ValueError with the reason"""
+    if not isinstance(payload, dict):
+        raise ValueError('expected a JSON object')
+    action, kind = payload.get('action'), payload.get('kind')
+    if action != 'match' and (action not in admin_actions.STATUS_ACTIONS or kind not in ('lost', 'found')):
+        raise ValueError('unknown action or kind')
+    entries = payload.get('pairs' if action == 'match' else 'reports', [])
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+        raise ValueError('reports and pairs must be lists of objects')
+
+    def report_id(entry, field):
+        value = entry.get(field)
+        if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise ValueError(f'{field} must be a positive integer')
+        return value
+
+    def status(entry, field):
+        value = entry.get(field)
+        if value not in REPORT_STATUSES:
+            raise ValueError(f'{field} must be one of {", ".join(REPORT_STATUSES)}')
+        return value
+
+    if action == 'match':
+        items = [(report_id(pair, 'lost_id'), status(pair, 'lost_status'),
+                  report_id(pair, 'found_id'), status(pair, 'found_status')) for pair in entries]
+    else:
+        items = {report_id(report, 'id'): status(report, 'status') for report in entries}
+    return action, kind, items
+
+
+@admin_bp.route('/bulk', methods=['POST'])
+@login_required
+def bulk_action():
+    """Apply one action to the reports ticked on the dashboard"""
+    action = request.form.get('action')
+    seen = {'lost': {}, 'found': {}}
+    invalid = 0
+    for value in request.form.getlist('report'):
+        # kind:id:status, the status being what the dashboard showed
+        parsed = _parse_bulk_value(value)
+        if parsed is None:
+            invalid += 1
+            continue
+        kind, report_id, status = parsed
+        seen[kind][report_id] = status
+    if invalid:
+        flash(f'{invalid} selected entries were not valid reports and were ignored.', 'warning')
+    selected = len(seen['lost']) + len(seen['found'])
+    if action not in admin_actions.ACTIONS or not selected:
+        flash('Select reports and an action.', 'danger')
+        return redirect(request.referrer or url_for('admin.admin_dashboard'))
+    if selected > current_app.config['ADMIN_BULK_MAX_REPORTS']:
+        flash(f"Select at most {current_app.config['ADMIN_BULK_MAX_REPORTS']} reports at a time.", 'danger')
+        return redirect(request.referrer or url_for('admin.admin_dashboard'))
+
+    if action == 'match':
+        return _propose_matches(seen, selected)
+
+    # Both report kinds change in one transaction
+    updated = 0
+    for kind, kind_seen in seen.items():
+        if kind_seen:
+            updated += len(admin_actions.apply_status(kind, action, kind_seen, commit=False).updated)
+    db.session.commit()
+    invalidate()
+
+    if updated:
+        flash(f'{updated} of {selected} selected reports updated.', 'success')
+    if updated < selected:
+        flash(f"{selected - updated} reports were skipped: they changed since the page was loaded, "
+              f"or the action doesn't apply to them.", 'warning')
+    return redirect(request.referrer or url_for('admin.admin_dashboard'))
+
+
+def _propose_matches(seen, selected):
+    """Confirmation page listing each selected report with its best stored candidate.
+
+    Nothing is matched (or mailed) until the admin submits the pairs they
+    keep to bulk_match.
+    """
+    min_score = current_app.config['ADMIN_BULK_MATCH_MIN_SCORE']
+    proposed, lost_ids, found_ids = [], set(), set()
+    for kind, kind_seen in seen.items():
+        if not kind_seen:
+            continue
+        for pair, score in admin_actions.best_candidate_pairs(kind, kind_seen, min_score):
+            # A report ticked on both tabs is proposed once
+            if pair[0] not in lost_ids and pair[2] not in found_ids:
+                lost_ids.add(pair[0])
+                found_ids.add(pair[2])
+                proposed.append((pair, score))
+    lost = {report.id: report for report in LostReport.query.filter(LostReport.id.in_(lost_ids))}
+    found = {report.id: report for report in FoundReport.query.filter(FoundReport.id.in_(found_ids))}
+    pairs = [(':'.join(map(str, pair)), lost[pair[0]], found[pair[2]], score) for pair, score in proposed]
+    return render_template('admin_bulk_match.html', pairs=pairs, selected=selected, min_score=min_score)
+
+
+@admin_bp.route('/bulk/match', methods=['POST'])
+@login_required
+def bulk_match():
+    """Match the lost/found pairs the admin confirmed on the bulk match page"""
+    back = url_for('admin.admin_dashboard')
+    pairs = [_parse_bulk_pair(value) for value in request.form.getlist('pair')]
+    if None in pairs:
+        flash(f'{pairs.count(None)} submitted pairs were not valid and were ignored.', 'warning')
+        pairs = [pair for pair in pairs if pair is not None]
+    if not pairs:
+        flash('No pairs were confirmed; nothing was matched.', 'info')
+        return redirect(back)
+    if len(pairs) > current_app.config['ADMIN_BULK_MAX_REPORTS']:
+        flash(f"Confirm at most {current_app.config['ADMIN_BULK_MAX_REPORTS']} pairs at a time.", 'danger')
+        return redirect(back)
+
+    result = admin_actions.match_pairs(pairs)
+    if result.updated:
+        flash(f'{len(result.updated)} of {len(pairs)} pairs matched; both sides were notified.', 'success')
+    if result.conflicts:
+        flash(f"{len(result.conflicts)} pairs were skipped: a report changed since the proposals were made, "
+              f"or was listed twice.", 'warning')
+    return redirect(back)
+
+
+@admin_bp.route('/api/bulk', methods=['POST'])
+@login_required
+def bulk_action_api():
+    """JSON bulk actions.
+
+    {"action": "verify"|"recover", "kind": "lost"|"found",
+     "reports": [{"id": 1, "status": "reported"}, ...]}
+    {"action": "match", "pairs": [{"lost_id": 1, "lost_status": "verified",
+                                   "found_id": 2, "found_status": "reported"}, ...]}
+
+    status fields are the statuses the client last saw; reports changed since
+    come back under "conflicts" and are left untouched.
+    """
+    try:
+        action, kind, items = _parse_bulk_payload(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if len(items) > current_app.config['ADMIN_BULK_MAX_REPORTS']:
+        return jsonify(error=f"at most {current_app.config['ADMIN_BULK_MAX_REPORTS']} per request"), 400
+
+    if action == 'match':
+        result = admin_actions.match_pairs(items)
+    else:
+        result = admin_actions.apply_status(kind, action, items)
+    return jsonify(updated=result.updated, conflicts=result.conflicts)
+
+
+@admin_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_reports():
+    """Bulk import lost or found reports from a CSV or JSONL upload"""
+    result = None
+    if request.method == 'POST':
+        kind = request.form.get('kind')
+        upload = request.files.get('file')
+        if kind not in ('lost', 'found') or not upload or upload.filename == '':
+            flash('Choose a report type and a CSV or JSONL file.', 'danger')
+        else:
+            fmt = bulk_utils.format_for(upload.filename)
+            result = bulk_utils.import_reports(kind, bulk_utils.read_rows(upload.stream, fmt),
+                                               current_app.config['IMPORT_BATCH_SIZE'])
+            flash(f'{result.inserted} {kind} reports imported, {result.skipped} skipped.',
+                  'success' if result.inserted else 'info')
 
-    return render_template('verify_found.html', report=report, potential_matches=potential_matches)
+    return render_template('admin_import.html', result=result)
+
+
+@admin_bp.route('/export/<kind>.<fmt>')
+@login_required
+def export_reports(kind, fmt):
+    """Download every lost or found report, streamed as CSV or JSONL"""
+    if kind not in ('lost', 'found') or fmt not in bulk_utils.FORMATS:
+        abort(404)
+    filename = f"{kind}_reports_{datetime.utcnow():%Y%m%d}.{fmt}"
+    return Response(stream_with_context(bulk_utils.export_reports(kind, fmt)),
+                    mimetype=bulk_utils.FORMAT_MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
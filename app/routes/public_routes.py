@@ -1,13 +1,21 @@
 import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_from_directory, current_app
+import mimetypes
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_from_directory, current_app, abort, make_response, jsonify
+from werkzeug.security import safe_join
 from datetime import datetime
 from app import db
-from app.models import LostReport, FoundReport
-from app.utils.file_utils import save_uploaded_file
+from app.models import LostReport, FoundReport, ID_TYPES
+from app.utils.cache import invalidate
+from app.utils.file_utils import (allowed_file, claim_direct_upload, content_etag, is_photo_key,
+                                  stage_upload, staged_upload_key, variant_filename)
+from app.utils.storage import get_storage
+from app.utils.match_worker import enqueue_report
 from config import Config
 
 public_bp = Blueprint('public', __name__)
 
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
 @public_bp.route('/')
 def index():
     """Homepage"""
@@ -17,9 +25,12 @@ def index():
 def report_lost():
     """Allow user to report a lost ID"""
     if request.method == 'POST':
-        photo = request.files.get('photo')
-        # Save file and get only the filename
-        photo_filename = save_uploaded_file(photo, prefix='lost')  # ✅ store only filename
+        if request.form.get('id_type') not in ID_TYPES:
+            flash('Please select a valid ID type.', 'danger')
+            return render_template('report_lost.html')
+
+        # The photo is processed by the match worker once the report is stored
+        photo_upload = _staged_photo()
 
         date_lost = None
         if request.form.get('date_lost'):
@@ -33,13 +44,15 @@ def report_lost():
             id_type=request.form.get('id_type'),
             owner_name=request.form.get('owner_name'),
             description=request.form.get('description'),
-            photo_path=photo_filename,  # ✅ store only filename
+            photo_upload=photo_upload,
             date_lost=date_lost,
             location_lost=request.form.get('location_lost')
         )
 
         db.session.add(lost_report)
         db.session.commit()
+        invalidate()
+        enqueue_report('lost', lost_report.id)
         flash('Lost ID report submitted successfully! We will contact you if it is found.', 'success')
         return redirect(url_for('public.index'))
 
@@ -50,8 +63,11 @@ def report_lost():
 def report_found():
     """Allow user to report a found ID"""
     if request.method == 'POST':
-        photo = request.files.get('photo')
-        photo_path = save_uploaded_file(photo, prefix='found')
+        if request.form.get('id_type') not in ID_TYPES:
+            flash('Please select a valid ID type.', 'danger')
+            return render_template('report_found.html')
+
+        photo_upload = _staged_photo()
         date_found = None
         if request.form.get('date_found'):
             date_found = datetime.strptime(request.form.get('date_found'), '%Y-%m-%d').date()
@@ -64,20 +80,94 @@ def report_found():
             id_type=request.form.get('id_type'),
             owner_name=request.form.get('owner_name'),
             description=request.form.get('description'),
-            photo_path=photo_path,
+            photo_upload=photo_upload,
             date_found=date_found,
             location_found=request.form.get('location_found')
         )
         db.session.add(found_report)
         db.session.commit()
+        invalidate()
+        enqueue_report('found', found_report.id)
         flash('Found ID report submitted successfully! Thank you for helping.', 'success')
         return redirect(url_for('public.index'))
 
     return render_template('report_found.html')
 
 
+def _staged_photo():
+    """Staging key of the submitted photo: uploaded with the form or straight to storage"""
+    return stage_upload(request.files.get('photo')) or claim_direct_upload(request.form.get('photo_upload'))
+
+
+@public_bp.route('/uploads/presign', methods=['POST'])
+def presign_upload():
+    """Signed form for sending a report photo straight to the object store"""
+    filename = request.form.get('filename', '')
+    if not allowed_file(filename):
+        abort(400)
+    key = staged_upload_key(filename)
+    form = get_storage().presign_upload(key, current_app.config['MAX_CONTENT_LENGTH'])
+    if form is None:
+        abort(404)
+    return jsonify(key=key, url=form['url'], fields=form['fields'])
+
 
-@public_bp.route('/uploads/<filename>')
+@public_bp.app_template_global()
+def direct_uploads():
+    """Whether browsers upload photos to storage themselves instead of through the app"""
+    return get_storage().name != 'local'
+
+
+@public_bp.app_template_global()
+def photo_url(filename, size=None):
+    """URL of a stored photo at a pre-generated size, falling back to the original"""
+    if not is_photo_key(filename):
+        return None
+    storage = get_storage()
+    if size:
+        sized = variant_filename(filename, size)
+        # Content-addressed uploads always have every size; legacy ones may not
+        if content_etag(filename) or storage.exists(sized):
+            filename = sized
+    # Object stores hand out signed URLs so browsers fetch photos directly
+    return storage.presign(filename) or url_for('public.uploaded_file', filename=filename)
+
+
+@public_bp.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+    """Serve an upload with long-lived caching for immutable, content-addressed files"""
+    if not is_photo_key(filename):
+        abort(404)
+    storage = get_storage()
+    if storage.name != 'local':
+        # Old links to /uploads keep working against an object store
+        url = storage.presign(filename)
+        if url is None:
+            abort(404)
+        return redirect(url)
+
+    etag = content_etag(filename)
+    if etag is None:
+        # Legacy timestamped upload: revalidate after an hour
+        return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename,
+                                   max_age=current_app.config['UPLOAD_LEGACY_MAX_AGE'])
 
+    # The name is the content hash, so a matching ETag needs no disk access
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+    elif current_app.config['UPLOAD_SENDFILE_MODE'] == 'x-accel':
+        if safe_join(current_app.config['UPLOAD_FOLDER'], filename) is None:
+            abort(404)
+        # nginx serves the bytes (and ranges) from its internal location
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = current_app.config['UPLOAD_ACCEL_PREFIX'] + filename
+        response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    else:
+        # X-Sendfile is applied by send_file when USE_X_SENDFILE is set
+        response = send_from_directory(current_app.config['UPLOAD_FOLDER'], filename,
+                                       etag=False, conditional=True, max_age=IMMUTABLE_MAX_AGE)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
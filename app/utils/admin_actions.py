@@ -0,0 +1,139 @@
+from collections import namedtuple
+from datetime import datetime
+from app import db
+from app.models import LostReport, FoundReport, MatchCandidate, CLOSED_STATUSES, OPEN_STATUSES, REPORT_STATUSES
+from app.utils.cache import invalidate
+from app.utils.match_utils import report_model
+from app.utils.notification_utils import notify_match
+
+# Status an action sets, and the statuses it may be applied to
+STATUS_ACTIONS = {
+    'verify': ('verified', ('reported',)),
+    'recover': ('recovered', tuple(status for status in REPORT_STATUSES if status != 'recovered')),
+}
+ACTIONS = tuple(STATUS_ACTIONS) + ('match',)
+
+# conflicts: ids whose status changed since the admin saw it (or that the
+# action doesn't apply to); they are left as they are
+BulkResult = namedtuple('BulkResult', 'updated conflicts')
+
+
+def _conditional_update(model, seen, values):
+    """UPDATE the rows still in the status the admin saw; returns the ids updated.
+
+    seen maps id -> status shown to the admin. Rows another admin changed in
+    the meantime no longer match their (id, status) pair and are skipped, so
+    concurrent edits are never overwritten.
+    """
+    if not seen:
+        return set()
+    statement = db.update(model).where(
+        model.id.in_(list(seen)),  # primary key lookup; the pair check filters those rows
+        db.tuple_(model.id, model.status).in_(list(seen.items()))
+    ).values(**values).returning(model.id).execution_options(synchronize_session=False)
+    return set(db.session.execute(statement).scalars())
+
+
+def _by_id(model, ids, column):
+    """CASE expression mapping each id to its own value"""
+    return db.case(ids, value=model.id, else_=column)
+
+
+def apply_status(kind, action, seen, commit=True):
+    """Set the status of many reports of one kind with a single UPDATE.
+
+    seen maps report id -> the status the admin saw. Returns a BulkResult;
+    with commit, also commits and invalidates cached pages.
+    """
+    model = report_model(kind)
+    status, from_statuses = STATUS_ACTIONS[action]
+    updated = _conditional_update(model, {report_id: seen_status for report_id, seen_status in seen.items()
+                                          if seen_status in from_statuses},
+                                  {'status': status, 'closed_at': datetime.utcnow() if status in CLOSED_STATUSES else None})
+    if commit:
+        db.session.commit()
+        invalidate()
+    return BulkResult(sorted(updated), sorted(set(seen) - updated))
+
+
+def match_pairs(pairs, commit=True):
+    """Match many lost/found pairs in one transaction and notify both sides.
+
+    pairs is [(lost id, lost status seen, found id, found status seen)]. Both
+    reports of a pair must still be open and as seen; a pair where either side
+    changed is left untouched on both sides. Returns a BulkResult of
+    (lost id, found id) pairs.
+    """
+    lost_ids, found_ids = set(), set()
+    valid = []
+    for pair in pairs:
+        lost_id, lost_status, found_id, found_status = pair
+        # A report can only be matched once, even if listed twice
+        if lost_status in OPEN_STATUSES and found_status in OPEN_STATUSES \
+                and lost_id not in lost_ids and found_id not in found_ids:
+            valid.append(pair)
+            lost_ids.add(lost_id)
+            found_ids.add(found_id)
+
+    now = datetime.utcnow()
+    lost_to_found = {lost_id: found_id for lost_id, _, found_id, _ in valid}
+    lost_updated = _conditional_update(
+        LostReport, {lost_id: lost_status for lost_id, lost_status, _, _ in valid},
+        {'status': 'matched', 'closed_at': now,
+         'matched_with': _by_id(LostReport, lost_to_found, LostReport.matched_with)})
+    valid = [pair for pair in valid if pair[0] in lost_updated]
+
+    found_to_lost = {found_id: lost_id for lost_id, _, found_id, _ in valid}
+    found_updated = _conditional_update(
+        FoundReport, {found_id: found_status for _, _, found_id, found_status in valid},
+        {'status': 'matched', 'closed_at': now,
+         'matched_with': _by_id(FoundReport, found_to_lost, FoundReport.matched_with)})
+
+    # Put back the lost side of pairs whose found report had changed
+    undo = {lost_id: lost_status for lost_id, lost_status, found_id, _ in valid if found_id not in found_updated}
+    if undo:
+        db.session.execute(db.update(LostReport).where(LostReport.id.in_(list(undo))).values(
+            status=_by_id(LostReport, undo, LostReport.status), matched_with=None, closed_at=None
+        ).execution_options(synchronize_session=False))
+    valid = [pair for pair in valid if pair[2] in found_updated]
+
+    if valid:
+        lost_reports = {report.id: report for report in
+                        LostReport.query.filter(LostReport.id.in_([pair[0] for pair in valid]))}
+        found_reports = {report.id: report for report in
+                         FoundReport.query.filter(FoundReport.id.in_([pair[2] for pair in valid]))}
+        for lost_id, _, found_id, _ in valid:
+            notify_match(lost_reports[lost_id], found_reports[found_id])
+    if commit:
+        db.session.commit()
+        invalidate()
+    matched = {(lost_id, found_id) for lost_id, _, found_id, _ in valid}
+    return BulkResult(sorted(matched), sorted({(lost_id, found_id) for lost_id, _, found_id, _ in pairs} - matched))
+
+
+def best_candidate_pairs(kind, seen, min_score):
+    """Propose [(pair for match_pairs, score)]: each report with its best stored open candidate.
+
+    seen maps report id -> status seen; reports without a stored candidate
+    scoring at least min_score are left out. A candidate already taken by a
+    better-ranked report of the selection goes to nobody else.
+    """
+    if kind == 'lost':
+        own_col, other_col, other = MatchCandidate.lost_id, MatchCandidate.found_id, FoundReport
+    else:
+        own_col, other_col, other = MatchCandidate.found_id, MatchCandidate.lost_id, LostReport
+    rows = db.session.execute(db.select(own_col, other_col, other.status, MatchCandidate.score).join(
+        other, other.id == other_col
+    ).where(
+        own_col.in_(list(seen)), MatchCandidate.score >= min_score
+    ).order_by(MatchCandidate.score.desc())).all()
+
+    pairs, taken = {}, set()
+    for own_id, other_id, other_status, score in rows:
+        if own_id in pairs or other_id in taken or other_status not in OPEN_STATUSES:
+            continue
+        taken.add(other_id)
+        pair = (own_id, seen[own_id], other_id, other_status) if kind == 'lost' \
+            else (other_id, other_status, own_id, seen[own_id])
+        pairs[own_id] = (pair, score)
+    return list(pairs.values())
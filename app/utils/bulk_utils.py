@@ -0,0 +1,195 @@
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import date, datetime
+from app import db
+from app.models import LostReport, FoundReport, NameToken, ID_TYPES
+from app.utils.cache import invalidate
+from app.utils.geo_utils import geocode_many
+from app.utils.match_utils import normalize_id_number, report_model, token_rows
+from app.utils.match_worker import enqueue_report
+
+FORMATS = ('csv', 'jsonl')
+FORMAT_MIMETYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+# Columns an import may set; status, photos and matches are managed by admins
+IMPORT_FIELDS = {
+    'lost': ('reporter_name', 'reporter_email', 'reporter_phone', 'id_number', 'id_type',
+             'owner_name', 'description', 'date_lost', 'location_lost'),
+    'found': ('finder_name', 'finder_email', 'finder_phone', 'id_number', 'id_type',
+              'owner_name', 'description', 'date_found', 'location_found'),
+}
+REQUIRED_FIELDS = {
+    'lost': ('reporter_name', 'reporter_email', 'id_number', 'id_type', 'owner_name'),
+    'found': ('finder_name', 'finder_email', 'id_type'),
+}
+EXPORT_FIELDS = {kind: ('id',) + fields + ('photo_path', 'status', 'date_reported', 'matched_with')
+                 for kind, fields in IMPORT_FIELDS.items()}
+
+ImportResult = namedtuple('ImportResult', 'inserted skipped errors')
+
+# One multi-row INSERT ... RETURNING per batch; ids come back in row order
+_INSERTS = {model: model.__table__.insert().returning(model.__table__.c.id, sort_by_parameter_order=True)
+            for model in (LostReport, FoundReport)}
+
+
+def format_for(filename, default='csv'):
+    """Import/export format implied by a file name's extension"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    return 'csv' if extension == 'csv' else default
+
+
+def read_rows(stream, fmt):
+    """Yield (line_number, row) from a binary CSV (with a header) or JSONL stream.
+
+    Undecodable JSON lines yield None as the row, so they are reported as
+    invalid instead of aborting the import.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, None
+
+
+def validate_row(kind, row):
+    """Return (values, None) for a valid import row, or (None, error message)"""
+    if not isinstance(row, dict):
+        return None, 'not a valid record'
+    columns = report_model(kind).__table__.c
+    values = {}
+    for field in IMPORT_FIELDS[kind]:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            if field in REQUIRED_FIELDS[kind]:
+                return None, f'{field} is required'
+            values[field] = None
+            continue
+        if field.startswith('date_'):
+            try:
+                value = date.fromisoformat(str(value))
+            except ValueError:
+                return None, f'{field} must be a YYYY-MM-DD date'
+        else:
+            value = str(value)
+            length = getattr(columns[field].type, 'length', None)
+            if length and len(value) > length:
+                return None, f'{field} is longer than {length} characters'
+        values[field] = value
+
+    if values['id_type'] not in ID_TYPES:
+        return None, f"unknown id_type {values['id_type']!r}"
+    if '@' not in values[f"{'reporter' if kind == 'lost' else 'finder'}_email"]:
+        return None, 'invalid email address'
+    return values, None
+
+
+def _insert_batch(kind, batch):
+    """Insert one batch with its name tokens in a single transaction and queue it for matching.
+
+    Core inserts skip the ORM events, so the derived columns are filled in here.
+    """
+    model = report_model(kind)
+    connection = db.session.connection()
+    points = geocode_many(connection, [values[f'location_{kind}'] for values in batch])
+    for values, (lat, lon) in zip(batch, points):
+        values.update(location_lat=lat, location_lon=lon)
+    report_ids = connection.execute(_INSERTS[model], batch).scalars().all()
+    tokens = [token for report_id, values in zip(report_ids, batch)
+              for token in token_rows(kind, report_id, values['owner_name'])]
+    if tokens:
+        connection.execute(NameToken.__table__.insert(), tokens)
+    db.session.commit()
+    invalidate()
+    for report_id in report_ids:
+        enqueue_report(kind, report_id)
+    return len(report_ids)
+
+
+def import_reports(kind, rows, batch_size=1000, max_errors=100):
+    """Validate and insert (line_number, row) pairs in batched transactions.
+
+    Invalid rows are skipped; the first max_errors of them are returned as
+    (line_number, message). Returns an ImportResult.
+    """
+    now = datetime.utcnow()
+    inserted = skipped = 0
+    errors = []
+    batch = []
+    for line_number, row in rows:
+        values, error = validate_row(kind, row)
+        if error:
+            skipped += 1
+            if len(errors) < max_errors:
+                errors.append((line_number, error))
+            continue
+        values.update(normalized_id=normalize_id_number(values['id_number']),
+                      status='reported', date_reported=now)
+        batch.append(values)
+        if len(batch) >= batch_size:
+            inserted += _insert_batch(kind, batch)
+            batch = []
+    if batch:
+        inserted += _insert_batch(kind, batch)
+    return ImportResult(inserted, skipped, errors)
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _csv_cell(value):
+    """Neutralize publicly submitted text that a spreadsheet would run as a formula"""
+    if isinstance(value, str) and value[:1] in ('=', '@', '\t', '\r', '+', '-') \
+            and not value[1:2].isdigit():
+        return "'" + value
+    return value
+
+
+def export_reports(kind, fmt, batch_size=1000):
+    """Yield an export of one report table as CSV (with a header) or JSONL chunks.
+
+    Rows are read in primary-key batches, each its own short query, so
+    memory stays flat however large the table is and no cursor keeps a
+    transaction open for the length of the download.
+    """
+    model = report_model(kind)
+    fields = EXPORT_FIELDS[kind]
+    query = db.select(*[model.__table__.c[field] for field in fields]).where(
+        model.id > db.bindparam('last_id')).order_by(model.id).limit(batch_size)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(fields)
+    last_id = 0
+    while True:
+        with db.engine.connect() as connection:
+            rows = connection.execute(query, {'last_id': last_id}).all()
+        if not rows:
+            break
+        for row in rows:
+            values = [_export_value(value) for value in row]
+            if fmt == 'csv':
+                writer.writerow([_csv_cell(value) for value in values])
+            else:
+                buffer.write(json.dumps(dict(zip(fields, values)), ensure_ascii=False) + '\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        last_id = rows[-1].id
+    if buffer.tell():
+        yield buffer.getvalue()
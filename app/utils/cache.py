@@ -0,0 +1,196 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from app.utils.database import reading_replica
+from app.utils.metrics import CACHE_REQUESTS, CACHE_INVALIDATIONS
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCache:
+    """Per-process LRU with a TTL per entry; for a single worker process.
+
+    Each gunicorn worker has its own copy, so an invalidation only reaches
+    the worker that handled the write, and the others keep serving their
+    entries until the TTL runs out. Use the Redis backend with several
+    workers.
+    """
+    name = 'memory'
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._generations = {}  # namespace -> (generation, time of the last bump)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self, namespace):
+        """(generation, time.time() of the last invalidation or 0)"""
+        return self._generations.get(namespace, (0, 0.0))
+
+    def bump(self, namespace):
+        with self._lock:
+            self._generations[namespace] = (self.generation(namespace)[0] + 1, time.time())
+
+
+class RedisCache:
+    """Cache shared by every worker in Redis; values are stored as JSON.
+
+    Redis errors are reported and treated as misses, so an unavailable
+    Redis slows pages down instead of failing them.
+    """
+    name = 'redis'
+
+    def __init__(self, url, prefix='lostid:', client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError('CACHE_BACKEND=redis requires redis (pip install redis)') from e
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.client = client
+        self.prefix = prefix
+
+    def _call(self, method, *args):
+        try:
+            return getattr(self.client, method)(*args)
+        except Exception as e:
+            logger.warning('Cache %s failed: %s', method, e)
+            return None
+
+    def get(self, key):
+        value = self._call('get', self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl):
+        self._call('set', self.prefix + key, json.dumps(value), ttl)
+
+    def generation(self, namespace):
+        generation, invalidated_at = self._call(
+            'mget', [f'{self.prefix}generation:{namespace}', f'{self.prefix}invalidated:{namespace}']) or (0, 0)
+        return int(generation or 0), float(invalidated_at or 0)
+
+    def bump(self, namespace):
+        # The time first: a reader that sees the new generation sees it too
+        self._call('set', f'{self.prefix}invalidated:{namespace}', time.time())
+        self._call('incr', f'{self.prefix}generation:{namespace}')
+
+
+class NullCache:
+    """CACHE_BACKEND=none: every lookup is a miss"""
+    name = 'none'
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def generation(self, namespace):
+        return 0, 0.0
+
+    def bump(self, namespace):
+        pass
+
+
+def _worker_processes():
+    """Worker processes this server runs, from gunicorn's -w/--workers or WEB_CONCURRENCY"""
+    argv = sys.argv
+    for position, arg in enumerate(argv):
+        value = None
+        if arg in ('-w', '--workers') and position + 1 < len(argv):
+            value = argv[position + 1]
+        elif arg.startswith('--workers='):
+            value = arg.split('=', 1)[1]
+        elif arg.startswith('-w') and arg[2:].isdigit():
+            value = arg[2:]
+        if value and value.isdigit():
+            return int(value)
+    concurrency = os.getenv('WEB_CONCURRENCY', '')
+    return int(concurrency) if concurrency.isdigit() else 1
+
+
+def create_cache(config):
+    if config['CACHE_BACKEND'] == 'redis':
+        return RedisCache(config['CACHE_REDIS_URL'])
+    if config['CACHE_BACKEND'] == 'none':
+        return NullCache()
+    workers = _worker_processes()
+    if workers > 1:
+        logger.warning('CACHE_BACKEND=memory with %d worker processes: a change made through one worker '
+                       'shows on the others only when their cached entries expire. Set CACHE_REDIS_URL '
+                       'to share one cache.', workers)
+    return MemoryCache(config['CACHE_MAX_ENTRIES'])
+
+
+def get_cache():
+    """Cache backend of the current app, created on first use"""
+    extensions = current_app.extensions
+    if 'cache' not in extensions:
+        extensions['cache'] = create_cache(current_app.config)
+    return extensions['cache']
+
+
+def cache_key(*parts):
+    """Short stable key for arbitrary JSON-able parts (filters, request args, ...)"""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def cached(name, key, compute, namespace='reports'):
+    """Value of compute() for `key`, from the cache while `namespace` is unchanged.
+
+    Entries live for CACHE_TTLS[name] seconds at most, and are dropped as soon
+    as invalidate(namespace) is called, since the namespace's generation is
+    part of every key. Values must be JSON-serializable for the Redis backend.
+
+    Inside replica_reads views the value is computed on the replica, which
+    may not have the write behind the last invalidate() yet. Entries filled
+    within CACHE_REPLICA_LAG seconds of an invalidation therefore live only
+    that long, so stale replica rows are re-read soon instead of being
+    served for the whole TTL.
+    """
+    config = current_app.config
+    cache = get_cache()
+    generation, invalidated_at = cache.generation(namespace)
+    full_key = f'{name}:{namespace}:{generation}:{key}'
+    value = cache.get(full_key)
+    if value is not None:
+        CACHE_REQUESTS.inc(name, 'hit')
+        return value
+    CACHE_REQUESTS.inc(name, 'miss')
+    value = compute()
+    ttl = config['CACHE_TTLS'].get(name, config['CACHE_DEFAULT_TTL'])
+    lag = config['CACHE_REPLICA_LAG']
+    if reading_replica() and time.time() - invalidated_at < lag:
+        ttl = min(ttl, lag)
+    cache.set(full_key, value, ttl)
+    return value
+
+
+def invalidate(namespace='reports'):
+    """Drop every cached value derived from `namespace` (reports by default)"""
+    get_cache().bump(namespace)
+    CACHE_INVALIDATIONS.inc(namespace)
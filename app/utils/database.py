@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+REPLICA_BIND = 'replica'
+
+
+def engine_options(config, url):
+    """SQLALCHEMY_ENGINE_OPTIONS for a database URL under the configured profile"""
+    if make_url(url).get_backend_name() == 'sqlite':
+        # SQLite takes one writer at a time; waiting on the lock is done by
+        # busy_timeout in the connect hook, not by the pool
+        return {}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        # Reconnect before server/proxy idle timeouts and after failovers
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+
+
+def configure_database(app):
+    """Fill in engine options and the replica bind; call before db.init_app"""
+    config = app.config
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(config, config['SQLALCHEMY_DATABASE_URI']))
+    replica = config['DATABASE_REPLICA_URL']
+    if replica:
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds.setdefault(REPLICA_BIND, {'url': replica, **engine_options(config, replica)})
+        config['SQLALCHEMY_BINDS'] = binds
+
+
+def _sqlite_pragmas(config):
+    pragmas = [f"busy_timeout = {config['SQLITE_BUSY_TIMEOUT_MS']}"]
+    if config['SQLITE_JOURNAL_MODE']:
+        pragmas.append(f"journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+    # NORMAL only syncs at checkpoints in WAL mode: durable across app
+    # crashes, may lose the last commits on power loss
+    pragmas += [f"synchronous = {config['SQLITE_SYNCHRONOUS']}",
+                f"cache_size = -{config['SQLITE_CACHE_KB']}",
+                'temp_store = MEMORY',
+                f"mmap_size = {config['SQLITE_MMAP_BYTES']}"]
+    return pragmas
+
+
+def install_sqlite_pragmas(app, engines):
+    """Apply the SQLite profile to every new connection of the SQLite engines"""
+    pragmas = _sqlite_pragmas(app.config)
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f'PRAGMA {pragma}')
+        cursor.close()
+
+    for engine in engines:
+        if engine.dialect.name == 'sqlite' and not event.contains(engine, 'connect', on_connect):
+            event.listen(engine, 'connect', on_connect)
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica bind inside replica_reads views.
+
+    Anything flushed or written in the same request still goes to the
+    primary, as do all queries outside those views.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and has_app_context() and g.get('replica_reads')
+                and REPLICA_BIND in self._db.engines):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_reads(view):
+    """Serve the GET requests of a view from the read replica, when one is configured"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method == 'GET':
+            g.replica_reads = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def reading_replica():
+    """Whether session reads of the current request go to the read replica"""
+    from app import db
+    return has_app_context() and bool(g.get('replica_reads')) and REPLICA_BIND in db.engines
+
+
+class IdWatermark:
+    """Highest id loaded from an append-only table, and the ids below it not seen yet.
+
+    Ids are assigned at INSERT but rows only become visible at COMMIT, so a
+    row can commit after a higher id was already loaded (a bulk import next
+    to web submissions, say). Ids skipped within the last `span` are kept as
+    gaps and looked up again on each load until `window` has passed; gaps
+    left by rolled back inserts or deleted rows just expire.
+    """
+
+    def __init__(self, span=5000, window=timedelta(minutes=5)):
+        self.last_id = 0
+        self.span = span
+        self.window = window
+        self._gaps = {}  # id -> when it was first skipped
+
+    @property
+    def gaps(self):
+        return list(self._gaps)
+
+    def advance(self, new_ids, late_ids=()):
+        """Record the ids loaded above last_id (ascending) and the gaps that turned up"""
+        now = datetime.utcnow()
+        for late_id in late_ids:
+            self._gaps.pop(late_id, None)
+        if new_ids:
+            loaded = set(new_ids)
+            top = new_ids[-1]
+            for missing in range(max(self.last_id, top - self.span) + 1, top):
+                if missing not in loaded:
+                    self._gaps.setdefault(missing, now)
+            self.last_id = top
+        horizon = now - self.window
+        self._gaps = {gap: since for gap, since in self._gaps.items() if since >= horizon}
@@ -1,24 +1,240 @@
 import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
 from email.message import EmailMessage
-from config import Config
-import os
+from flask import current_app
+from app import db
+from app.models import EmailOutbox
+from app.utils.metrics import EMAILS, SMTP_SECONDS, timed
+
+# Statuses an outbox entry can be claimed from; 'sending' rows are only
+# reclaimed once their lease (next_attempt_at) has expired
+CLAIMABLE_STATUSES = ('pending', 'sending')
+
+_sender_thread = None
+_sender_lock = threading.Lock()
+_wake = threading.Event()
+
 
 def send_email_notification(to_email, to_name, subject, html_content):
-    try:
+    """Queue an email in the outbox.
+
+    The entry is added to the current session, so it is only delivered once
+    the caller commits; the background sender picks it up from there.
+    """
+    db.session.add(EmailOutbox(to_email=to_email, to_name=to_name,
+                               subject=subject, html_content=html_content))
+    app = current_app._get_current_object()
+    if app.config.get('MAIL_OUTBOX_SENDER'):
+        _start_sender(app)
+        db.session.info['outbox_pending'] = True
+    return True
+
+
+def _wake_sender_after_commit(session):
+    if session.info.pop('outbox_pending', False):
+        _wake.set()
+
+
+db.event.listen(db.session, 'after_commit', _wake_sender_after_commit)
+
+
+class RateLimiter:
+    """Spaces calls to wait() at most per_minute apart; 0 disables the limit"""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(self._next, now) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class SMTPSender:
+    """Delivers messages over one authenticated SMTP connection, reused across sends"""
+
+    def __init__(self, config):
+        self.config = config
+        self._smtp = None
+        self.connections_opened = 0
+        self.limiter = RateLimiter(config.get('MAIL_RATE_LIMIT_PER_MINUTE', 0))
+
+    def ping(self):
+        """Drop the cached connection if the server has closed it"""
+        if self._smtp is not None:
+            try:
+                with timed(SMTP_SECONDS, 'noop'):
+                    self._smtp.noop()
+            except (smtplib.SMTPException, OSError):
+                self.close()
+
+    def connect(self):
+        if self._smtp is not None:
+            return self._smtp
+        with timed(SMTP_SECONDS, 'connect'):
+            smtp = smtplib.SMTP(self.config['MAIL_SERVER'], self.config['MAIL_PORT'],
+                                timeout=self.config.get('MAIL_TIMEOUT', 30))
+            if self.config.get('MAIL_USE_TLS'):
+                smtp.starttls()
+            if self.config.get('MAIL_USERNAME') and self.config.get('MAIL_PASSWORD'):
+                smtp.login(self.config['MAIL_USERNAME'], self.config['MAIL_PASSWORD'])
+        self._smtp = smtp
+        self.connections_opened += 1
+        return smtp
+
+    def send(self, entry):
         msg = EmailMessage()
-        msg['Subject'] = subject
-        msg['From'] = f"{Config.SENDER_NAME} <{Config.MAIL_USERNAME}>"
-        msg['To'] = to_email
+        msg['Subject'] = entry.subject
+        msg['From'] = f"{self.config['SENDER_NAME']} <{self.config['MAIL_USERNAME']}>"
+        msg['To'] = entry.to_email
         msg.set_content("This is an HTML email. Please view in HTML-compatible client.")
-        msg.add_alternative(html_content, subtype='html')
-
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(Config.MAIL_USERNAME, Config.MAIL_PASSWORD)
-            server.send_message(msg)
-
-        print(f"✅ Email sent to {to_email}")
-        return True
-    except Exception as e:
-        print(f"❌ Error sending email: {e}")
-        return False
+        msg.add_alternative(entry.html_content, subtype='html')
+        smtp = self.connect()
+        self.limiter.wait()
+        with timed(SMTP_SECONDS, 'send'):
+            smtp.send_message(msg)
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+
+def due_entries_query(now, batch_size):
+    """Ids of the outbox entries due at `now`, longest waiting first"""
+    return db.select(EmailOutbox.id).where(
+        EmailOutbox.status.in_(CLAIMABLE_STATUSES),
+        EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.next_attempt_at).limit(batch_size)
+
+
+def _claim_due(batch_size, lease_seconds):
+    """Lease up to batch_size due entries to this sender and return them"""
+    now = datetime.utcnow()
+    due_ids = db.session.scalars(due_entries_query(now, batch_size)).all()
+    if not due_ids:
+        return []
+
+    # Conditional update: entries another sender claimed in between are skipped
+    lease_until = now + timedelta(seconds=lease_seconds)
+    db.session.query(EmailOutbox).filter(
+        EmailOutbox.id.in_(due_ids),
+        EmailOutbox.status.in_(CLAIMABLE_STATUSES),
+        EmailOutbox.next_attempt_at <= now
+    ).update({'status': 'sending', 'next_attempt_at': lease_until}, synchronize_session=False)
+    db.session.commit()
+
+    return EmailOutbox.query.filter(
+        EmailOutbox.id.in_(due_ids),
+        EmailOutbox.status == 'sending',
+        EmailOutbox.next_attempt_at == lease_until
+    ).order_by(EmailOutbox.id).all()
+
+
+def _batch_size(config, batch_size=None):
+    """Outbox batch size, small enough for a rate-limited batch to finish within half its lease"""
+    batch_size = batch_size or config['MAIL_OUTBOX_BATCH_SIZE']
+    rate = config.get('MAIL_RATE_LIMIT_PER_MINUTE', 0)
+    if rate:
+        batch_size = min(batch_size, max(1, rate * config['MAIL_OUTBOX_LEASE_SECONDS'] // 120))
+    return batch_size
+
+
+def deliver_pending(sender, batch_size=None):
+    """Send one batch of due outbox entries; returns (sent, failed).
+
+    Failed sends are retried with exponential backoff until MAIL_MAX_ATTEMPTS
+    is reached, after which the entry is marked 'failed'.
+    """
+    config = current_app.config
+    entries = _claim_due(_batch_size(config, batch_size), config['MAIL_OUTBOX_LEASE_SECONDS'])
+    sent = failed = 0
+    if entries:
+        sender.ping()  # one liveness check per batch, not per message
+    for entry in entries:
+        try:
+            sender.send(entry)
+        except (smtplib.SMTPException, OSError) as e:
+            if not isinstance(e, smtplib.SMTPRecipientsRefused):
+                sender.close()  # connection state is unknown, start fresh
+            entry.attempts = (entry.attempts or 0) + 1
+            entry.last_error = str(e)
+            if entry.attempts >= config['MAIL_MAX_ATTEMPTS']:
+                entry.status = 'failed'
+                EMAILS.inc('failed')
+            else:
+                EMAILS.inc('retry')
+                entry.status = 'pending'
+                delay = config['MAIL_RETRY_BASE_SECONDS'] * 2 ** (entry.attempts - 1)
+                entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            failed += 1
+            current_app.logger.warning('Error sending email to %s: %s', entry.to_email, e)
+        else:
+            entry.status = 'sent'
+            entry.attempts = (entry.attempts or 0) + 1
+            entry.date_sent = datetime.utcnow()
+            entry.last_error = None
+            sent += 1
+            EMAILS.inc('sent')
+    db.session.commit()
+    if sent:
+        current_app.logger.info('%d email(s) sent', sent)
+    return sent, failed
+
+
+def drain_outbox(sender):
+    """Deliver batches until nothing is due; returns (sent, failed)"""
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = deliver_pending(sender)
+        total_sent += sent
+        total_failed += failed
+        if not (sent or failed):
+            return total_sent, total_failed
+
+
+def outbox_status():
+    """Number of outbox entries per delivery status"""
+    rows = db.session.query(EmailOutbox.status, db.func.count(EmailOutbox.id)) \
+        .group_by(EmailOutbox.status)
+    return dict(rows)
+
+
+def _start_sender(app):
+    global _sender_thread
+    if _sender_thread is not None:
+        return
+    with _sender_lock:
+        if _sender_thread is None:
+            _sender_thread = threading.Thread(target=_run_sender, args=(app,),
+                                              name='outbox-sender', daemon=True)
+            _sender_thread.start()
+
+
+def _run_sender(app):
+    from app.utils.notification_utils import coalesce_notifications
+    sender = SMTPSender(app.config)
+    while True:
+        # Wake early on new mail; the poll picks up retries, digests that have
+        # waited long enough and other workers' entries
+        _wake.wait(app.config['MAIL_OUTBOX_POLL_SECONDS'])
+        _wake.clear()
+        try:
+            with app.app_context():
+                while coalesce_notifications():
+                    pass
+                drain_outbox(sender)
+        except Exception:
+            app.logger.exception('Outbox sender error')
@@ -1,28 +1,151 @@
+import hashlib
+import io
 import os
-from werkzeug.utils import secure_filename
+import re
+import tempfile
+import uuid
 from datetime import datetime
 from flask import current_app
+from app import db
+from app.utils.image_utils import output_format, process_image
+from app.utils.metrics import IMAGE_SECONDS, timed
+from app.utils.phash_utils import to_db
+from app.utils.storage import get_storage
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+FORMAT_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+FORMAT_CONTENT_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+# "ab/cd/<sha256>[_size].ext": named after the content, so never rewritten
+CONTENT_ADDRESSED_RE = re.compile(r'^([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})(?:_([a-z]+))?\.[a-z]+$')
+
+# Raw uploads waiting for processing: "incoming/<uuid4 hex>.ext"
+STAGED_UPLOAD_RE = re.compile(r'^incoming/[0-9a-f]{32}\.(?:%s)$' % '|'.join(sorted(ALLOWED_EXTENSIONS)))
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def save_uploaded_file(file, prefix='file'):
-    """Save uploaded file to UPLOAD_FOLDER and return filename only"""
-    if not file or file.filename == '':
+def is_photo_key(filename):
+    """A live report photo: content-addressed, or a legacy upload stored flat.
+
+    Staged uploads and anything else in storage are never served.
+    """
+    return bool(CONTENT_ADDRESSED_RE.match(filename)) or ('/' not in filename and allowed_file(filename))
+
+def variant_filename(filename, size=None):
+    """Name of a pre-generated size of a stored photo ('sm', 'md', ...)"""
+    if not size:
+        return filename
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}_{size}{ext}"
+
+def content_etag(filename):
+    """Strong ETag for a content-addressed file, None for legacy uploads"""
+    match = CONTENT_ADDRESSED_RE.match(filename)
+    if not match:
         return None
+    digest, size = match.group(3), match.group(4)
+    return f"{digest}-{size}" if size else digest
+
+def content_addressed_name(data, extension):
+    """Sharded path of a file named after the SHA-256 of its bytes"""
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{extension}"
 
-    if allowed_file(file.filename):
-        # Get the absolute path from Flask config
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, exist_ok=True)  # ensure folder exists
+def staged_upload_key(filename):
+    """Fresh storage key for a raw upload, keeping the extension of `filename`"""
+    return f"incoming/{uuid.uuid4().hex}.{filename.rsplit('.', 1)[1].lower()}"
 
-        # Secure filename
-        filename = secure_filename(f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}")
+def stage_upload(file):
+    """Store an uploaded photo as-is for the background worker to process.
 
-        # Save the file
-        file.save(os.path.join(upload_folder, filename))
+    Werkzeug has already spooled the body to a temporary file, so this is a
+    plain copy; decoding, resizing and hashing happen in attach_pending_photo.
+    Returns the staging key, or None if there is no acceptable file.
+    """
+    if not file or file.filename == '' or not allowed_file(file.filename):
+        return None
+    key = staged_upload_key(file.filename)
+    get_storage().put(key, file.stream, file.mimetype)
+    return key
 
-        return filename  # store only the filename
+def claim_direct_upload(key):
+    """Staging key of a photo the browser sent straight to storage, None if invalid"""
+    if key and STAGED_UPLOAD_RE.match(key) and get_storage().exists(key):
+        return key
     return None
+
+def save_photo(fileobj, label):
+    """Re-encode a photo with its thumbnails under a content-addressed name.
+
+    Returns (filename, photo_hash): the storage key and the perceptual hash
+    in its database form, or (None, None) if it is not a usable image.
+    Identical photos are stored once.
+    """
+    config = current_app.config
+    fmt = output_format(config['IMAGE_FORMAT'])
+    try:
+        with timed(IMAGE_SECONDS):
+            processed = process_image(fileobj, config['IMAGE_MAX_DIMENSION'],
+                                      config['IMAGE_THUMBNAIL_SIZES'], fmt, config['IMAGE_QUALITY'])
+    except ValueError as e:
+        current_app.logger.warning('Rejected upload %s: %s', label, e)
+        return None, None
+
+    storage = get_storage()
+    filename = content_addressed_name(processed.variants[''], FORMAT_EXTENSIONS[fmt])
+    if not storage.exists(filename):
+        # Thumbnails first: once the original exists, every size does
+        for size in sorted(processed.variants, reverse=True):
+            storage.put(variant_filename(filename, size), io.BytesIO(processed.variants[size]),
+                        FORMAT_CONTENT_TYPES[fmt])
+
+    return filename, to_db(processed.phash)  # store only the storage key
+
+def attach_pending_photo(report):
+    """Process a report's staged upload and attach the result to the row.
+
+    The update only applies while the row still points at the same staged
+    upload, so two workers finishing one report attach it once. Returns
+    True if this call attached a photo.
+    """
+    key = report.photo_upload
+    if not key:
+        return False
+    storage = get_storage()
+    model = type(report)
+    # Spooled to disk in chunks rather than held in memory whole
+    with tempfile.TemporaryFile() as staged:
+        filename, photo_hash = None, None
+        if storage.exists(key):
+            for chunk in storage.stream(key):
+                staged.write(chunk)
+            staged.seek(0)
+            filename, photo_hash = save_photo(staged, key)
+        else:
+            current_app.logger.warning('Staged upload %s is gone; report kept without a photo', key)
+
+        attached = db.session.execute(
+            db.update(model).where(model.id == report.id, model.photo_upload == key).values(
+                photo_path=filename, photo_hash=photo_hash, photo_upload=None,
+                photo_attached_at=datetime.utcnow() if filename else None)
+        ).rowcount
+        db.session.commit()
+        if attached and filename and not storage.exists(filename):
+            # Retention retired an identical stored photo between save_photo
+            # finding it and this row pointing at it
+            staged.seek(0)
+            save_photo(staged, key)
+    storage.delete(key)
+    return bool(attached and filename)
+
+def pending_photos_query(model):
+    # Only the partial index is used; with a date term SQLite would walk the
+    # date_reported index over every older report instead
+    return db.select(model.id, model.date_reported).where(model.photo_upload.isnot(None))
+
+def pending_photo_ids(model, submitted_before=None):
+    """Ids of reports whose staged photo has not been processed yet"""
+    return [report_id for report_id, date_reported in db.session.execute(pending_photos_query(model))
+            if submitted_before is None or date_reported < submitted_before]
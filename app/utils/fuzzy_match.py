@@ -0,0 +1,270 @@
+from collections import namedtuple
+from math import cos, radians
+import numpy as np
+from app.models import ID_TYPES
+from app.utils.geo_utils import KM_PER_DEGREE, distances_km
+
+# Weights of the signals in the candidate score (sum to 1)
+ID_MATCH_WEIGHT = 0.35
+NAME_MATCH_WEIGHT = 0.25
+PHOTO_MATCH_WEIGHT = 0.15
+TYPE_MATCH_WEIGHT = 0.1
+DATE_MATCH_WEIGHT = 0.075
+LOCATION_MATCH_WEIGHT = 0.075
+
+# Characters OCR and hurried typing mix up are folded together, so "O" vs
+# "0" or "I" vs "1" costs nothing in the ID-number edit distance
+_OCR_FOLD = str.maketrans('OQDILJSBZG', '0001115826')
+MAX_ID_LENGTH = 24
+# Name tokens at least this similar count as the same name ("Mohammed" /
+# "Muhammad"); shorter tokens must match exactly
+FUZZY_TOKEN_SIMILARITY = 0.75
+FUZZY_TOKEN_MIN_LENGTH = 4
+# Dates this many days apart score 1/e
+DATE_SCALE_DAYS = 14
+
+_TYPE_CODES = {id_type: code for code, id_type in enumerate(ID_TYPES, 1)}
+
+Features = namedtuple('Features', 'id_key id_type name_tokens day location_tokens point')
+
+
+def ocr_key(normalized_id):
+    """ID number with OCR-confusable characters folded, as ASCII bytes"""
+    if not normalized_id:
+        return b''
+    return normalized_id.translate(_OCR_FOLD)[:MAX_ID_LENGTH].encode('ascii', 'replace')
+
+
+def features(normalized_id, id_type, name_tokens, date, location_tokens, lat=None, lon=None):
+    """Scoring inputs of one report"""
+    return Features(ocr_key(normalized_id), _TYPE_CODES.get(id_type, 0), frozenset(name_tokens),
+                    date.toordinal() if date else 0, frozenset(location_tokens),
+                    (lat, lon) if lat is not None and lon is not None else None)
+
+
+def _char_matrix(keys, width):
+    """(width, n) uint8 matrix holding one key per column, zero padded"""
+    chars = np.zeros((len(keys), width), np.uint8)
+    for row, key in enumerate(keys):
+        chars[row, :len(key)] = np.frombuffer(key, np.uint8)
+    return np.ascontiguousarray(chars.T)
+
+
+def edit_distances(query, chars, lengths):
+    """Levenshtein distance from `query` (bytes) to every column of `chars`.
+
+    The dynamic program runs one query character at a time over all
+    candidates at once: each cell of a DP row is a contiguous vector with one
+    entry per candidate. Substitution and deletion come from the previous
+    row as whole-matrix operations; only insertion, which depends on the cell
+    to its left, is applied cell by cell.
+    """
+    width, n = chars.shape
+    if not query:
+        return lengths.astype(np.int16)
+    previous = np.broadcast_to(np.arange(width + 1, dtype=np.uint8)[:, None], (width + 1, n))
+    for i, code in enumerate(query, 1):
+        current = np.empty((width + 1, n), np.uint8)
+        current[0] = i
+        np.minimum(previous[:-1] + (chars != code), previous[1:] + 1, out=current[1:])
+        for j in range(1, width + 1):
+            np.minimum(current[j], current[j - 1] + 1, out=current[j])
+        previous = current
+    return previous[lengths, np.arange(n)].astype(np.int16)
+
+
+def _similarities(query, chars, lengths):
+    """1 - edit distance / longer length, per column"""
+    distances = edit_distances(query, chars, lengths)
+    longest = np.maximum(lengths, len(query))
+    return np.where(longest > 0, 1 - distances / np.maximum(longest, 1), 0.0)
+
+
+class TokenColumn:
+    """A set of tokens per candidate, stored as (candidate, token code) pairs.
+
+    Pairs are kept in candidate order, so a candidate's pairs start at
+    starts[candidate] and a subset of candidates can be gathered directly.
+    """
+
+    def __init__(self):
+        self.vocabulary = {}
+        self.rows = np.zeros(0, np.int32)
+        self.codes = np.zeros(0, np.int32)
+        self.sizes = np.zeros(0, np.int16)
+        self.starts = np.zeros(0, np.int64)
+        self._vocabulary_chars = None
+
+    def extend(self, token_sets, start):
+        rows, codes = [], []
+        for offset, tokens in enumerate(token_sets):
+            for token in tokens:
+                rows.append(start + offset)
+                codes.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+        self.rows = np.concatenate([self.rows, np.array(rows, np.int32)])
+        self.codes = np.concatenate([self.codes, np.array(codes, np.int32)])
+        sizes = np.array([len(t) for t in token_sets], np.int16)
+        self.starts = np.concatenate([self.starts, len(self.rows) - len(rows) + np.cumsum(sizes) - sizes])
+        self.sizes = np.concatenate([self.sizes, sizes])
+        self._vocabulary_chars = None
+
+    def _fuzzy_weights(self, token):
+        if self._vocabulary_chars is None:
+            keys = [t.encode('utf-8')[:MAX_ID_LENGTH] for t in self.vocabulary]
+            width = max((len(key) for key in keys), default=0)
+            self._vocabulary_chars = (_char_matrix(keys, width),
+                                      np.array([len(key) for key in keys], np.intp))
+        chars, lengths = self._vocabulary_chars
+        similarity = _similarities(token.encode('utf-8')[:MAX_ID_LENGTH], chars, lengths)
+        similarity[lengths < FUZZY_TOKEN_MIN_LENGTH] = 0
+        return np.where(similarity >= FUZZY_TOKEN_SIMILARITY, similarity, 0)
+
+    def similarity(self, tokens, fuzzy=False, positions=None):
+        """Dice coefficient between `tokens` and every candidate's token set (or those at `positions`)"""
+        if positions is None:
+            rows, codes, sizes = self.rows, self.codes, self.sizes
+        else:
+            sizes = self.sizes[positions]
+            ends = np.cumsum(sizes)
+            pairs = np.repeat(self.starts[positions] - ends + sizes, sizes) + np.arange(ends[-1] if len(ends) else 0)
+            rows, codes = np.repeat(np.arange(len(positions), dtype=np.int32), sizes), self.codes[pairs]
+        n = len(sizes)
+        if not tokens or not self.vocabulary:
+            return np.zeros(n)
+        weights = np.zeros(len(self.vocabulary))
+        for token in tokens:
+            if fuzzy and len(token) >= FUZZY_TOKEN_MIN_LENGTH:
+                np.maximum(weights, self._fuzzy_weights(token), out=weights)
+            code = self.vocabulary.get(token)
+            if code is not None:
+                weights[code] = 1
+        matched = np.bincount(rows, weights=weights[codes], minlength=n)
+        # A query token can resemble several candidate tokens; count it once
+        matched = np.minimum(matched, np.minimum(sizes, len(tokens)))
+        total = sizes + len(tokens)
+        return 2 * matched / total
+
+
+class CandidateMatrix:
+    """Column-wise features of many reports, scored against one report at a time.
+
+    Every signal is computed for all candidates with whole-array NumPy
+    operations, so one report is ranked against 100k candidates in tens of
+    milliseconds. Within the candidates it holds, typo'd ID numbers, swapped
+    or transliterated names and missing fields still score.
+    """
+
+    def __init__(self):
+        self.ids = np.zeros(0, np.int64)
+        self.id_chars = np.zeros((0, 0), np.uint8)
+        self.id_lengths = np.zeros(0, np.intp)
+        self.types = np.zeros(0, np.int8)
+        self.days = np.zeros(0, np.int32)
+        self.lats = np.zeros(0)  # NaN where the place is unknown
+        self.lons = np.zeros(0)
+        self.names = TokenColumn()
+        self.locations = TokenColumn()
+        self._by_id_key = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def extend(self, ids, rows):
+        """Append candidates; ids ascending and above the current ones"""
+        if not ids:
+            return
+        start = len(self.ids)
+        keys = [row.id_key for row in rows]
+        width = max(self.id_chars.shape[0], max(len(key) for key in keys))
+        existing = np.zeros((width, start), np.uint8)
+        existing[:self.id_chars.shape[0]] = self.id_chars
+        self.id_chars = np.concatenate([existing, _char_matrix(keys, width)], axis=1)
+        self.id_lengths = np.concatenate([self.id_lengths, np.array([len(k) for k in keys], np.intp)])
+        self.ids = np.concatenate([self.ids, np.array(ids, np.int64)])
+        self.types = np.concatenate([self.types, np.array([row.id_type for row in rows], np.int8)])
+        self.days = np.concatenate([self.days, np.array([row.day for row in rows], np.int32)])
+        points = np.array([row.point or (np.nan, np.nan) for row in rows], float)
+        self.lats = np.concatenate([self.lats, points[:, 0]])
+        self.lons = np.concatenate([self.lons, points[:, 1]])
+        for offset, key in enumerate(keys):
+            if key:
+                self._by_id_key.setdefault(key, []).append(start + offset)
+        self.names.extend([row.name_tokens for row in rows], start)
+        self.locations.extend([row.location_tokens for row in rows], start)
+
+    def positions(self, ids):
+        """Positions of the given candidate ids, -1 where absent"""
+        ids = np.asarray(ids, np.int64)
+        found = np.searchsorted(self.ids, ids)
+        found[found >= len(self.ids)] = 0
+        return np.where(self.ids[found] == ids, found, -1) if len(self.ids) else np.full(len(ids), -1)
+
+    def within(self, query, radius_km=None, window_days=None, keep=()):
+        """Positions of the candidates close enough to be worth scoring.
+
+        Candidates farther than radius_km from the query's place, or dated
+        more than window_days from it, are left out. Those without a known
+        place or date are kept, as are exact ID-number matches and the
+        positions in `keep`, since nothing rules them out.
+        """
+        near = np.ones(len(self.ids), bool)
+        if window_days and query.day:
+            near &= (self.days == 0) | (np.abs(self.days - query.day) <= window_days)
+        if radius_km and query.point:
+            lat, lon = query.point
+            # Bounding box first: plain comparisons over every candidate,
+            # then the exact distance for the few inside it
+            lat_span = radius_km / KM_PER_DEGREE
+            lon_span = lat_span / max(cos(radians(lat)), 0.01)
+            box = (np.abs(self.lats - lat) <= lat_span) & (np.abs((self.lons - lon + 180) % 360 - 180) <= lon_span)
+            box[box] = distances_km(lat, lon, self.lats[box], self.lons[box]) <= radius_km
+            near &= box | np.isnan(self.lats)
+        positions = np.flatnonzero(near)
+        extra = list(keep) + self._by_id_key.get(query.id_key, [])
+        if extra:
+            extra = np.asarray(extra, np.intp)
+            positions = np.union1d(positions, extra)
+        return positions
+
+    def signals(self, query, positions=None):
+        """{signal: similarity in [0, 1] per candidate} for one report's features.
+
+        With `positions`, only those candidates are scored, in that order.
+        """
+        pick = slice(None) if positions is None else positions
+        days = self.days[pick]
+        signals = {
+            'id': np.zeros(len(days)) if not query.id_key else
+            _similarities(query.id_key, self.id_chars[:, pick], self.id_lengths[pick]),
+            'name': self.names.similarity(query.name_tokens, fuzzy=True, positions=positions),
+            'type': (self.types[pick] == query.id_type).astype(float),
+            'location': self.locations.similarity(query.location_tokens, positions=positions),
+        }
+        if query.day:
+            gap = np.abs(days - query.day)
+            signals['date'] = np.where(days > 0, np.exp(-gap / DATE_SCALE_DAYS), 0.0)
+        else:
+            signals['date'] = np.zeros(len(days))
+        return signals
+
+    def score(self, query, positions=None):
+        """Weighted score of every candidate (or those at `positions`), photo signal excluded"""
+        signals = self.signals(query, positions)
+        return (ID_MATCH_WEIGHT * signals['id'] + NAME_MATCH_WEIGHT * signals['name']
+                + TYPE_MATCH_WEIGHT * signals['type'] + DATE_MATCH_WEIGHT * signals['date']
+                + LOCATION_MATCH_WEIGHT * signals['location'])
+
+    def top(self, scores, k, min_score=0.0, positions=None):
+        """[(candidate id, score)] of the k best candidates, best first.
+
+        `scores` are for the candidates at `positions`, or for all of them.
+        """
+        pick = slice(None) if positions is None else positions
+        ids = self.ids[pick]
+        if k < len(scores):
+            best = np.argpartition(-scores, k)[:k]
+        else:
+            best = np.arange(len(scores))
+        best = best[scores[best] >= max(min_score, 0.0)]
+        order = np.lexsort((ids[best], -scores[best]))
+        return [(int(ids[i]), float(scores[i])) for i in best[order]]
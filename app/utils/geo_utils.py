@@ -0,0 +1,132 @@
+import csv
+import io
+import re
+import numpy as np
+from app import db
+from app.models import Place
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.195
+# Longest place name (in words) looked up in the gazetteer
+MAX_PLACE_WORDS = 4
+
+_WORD_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+PLACE_LOOKUP = db.select(Place.key, Place.latitude, Place.longitude).where(
+    Place.key.in_(db.bindparam('keys', expanding=True)))
+
+
+def place_key(text):
+    """Normalized form of a place name: lower-case words separated by single spaces"""
+    return ' '.join(_WORD_RE.findall((text or '').lower()))
+
+
+def _phrases(text):
+    """Every run of up to MAX_PLACE_WORDS words of a location, longest first"""
+    words = place_key(text).split()
+    return [' '.join(words[start:start + size])
+            for size in range(min(MAX_PLACE_WORDS, len(words)), 0, -1)
+            for start in range(len(words) - size + 1)]
+
+
+def geocode_many(connection, texts):
+    """[(lat, lon)] for free-text locations, (None, None) where no place is known.
+
+    Each location resolves to the longest gazetteer name it contains, so
+    "Library, North Campus" prefers "north campus" over "library" when both
+    are listed. Texts are looked up together, 500 names per indexed query.
+    """
+    phrases = [_phrases(text) for text in texts]
+    keys = sorted({phrase for text_phrases in phrases for phrase in text_phrases})
+    points = {}
+    # Stay well below the bound-parameter limits of SQLite and PostgreSQL
+    for offset in range(0, len(keys), 500):
+        points.update((key, (lat, lon)) for key, lat, lon in connection.execute(
+            PLACE_LOOKUP, {'keys': keys[offset:offset + 500]}))
+    return [next((points[phrase] for phrase in text_phrases if phrase in points), (None, None))
+            for text_phrases in phrases]
+
+
+def geocode(connection, text):
+    """(lat, lon) of a free-text location, or (None, None)"""
+    if not text:
+        return None, None
+    return geocode_many(connection, [text])[0]
+
+
+def distances_km(lat, lon, lats, lons):
+    """Great-circle distance from one point to arrays of points (haversine)"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def read_places(stream):
+    """Yield Place rows from a CSV with name, latitude, longitude and optional aliases.
+
+    Aliases are separated by '|'; each gets its own row pointing at the
+    same coordinates.
+    """
+    for row in csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')):
+        name = row['name'].strip()
+        latitude, longitude = float(row['latitude']), float(row['longitude'])
+        for alias in [name] + (row.get('aliases') or '').split('|'):
+            key = place_key(alias)
+            if key:
+                yield {'key': key, 'name': name, 'latitude': latitude, 'longitude': longitude}
+
+
+def import_places(rows, replace=False, batch_size=1000):
+    """Store gazetteer rows; a name already present gets the new coordinates.
+
+    With replace, the place table is emptied first. Returns the number of
+    rows written.
+    """
+    connection = db.session.connection()
+    if replace:
+        connection.execute(db.delete(Place))
+    written = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            written += _write_places(connection, batch)
+            batch = []
+    if batch:
+        written += _write_places(connection, batch)
+    db.session.commit()
+    return written
+
+
+def _write_places(connection, batch):
+    # Later rows win, within the batch as in the table
+    batch = list({row['key']: row for row in batch}.values())
+    connection.execute(db.delete(Place).where(Place.key.in_([row['key'] for row in batch])))
+    connection.execute(db.insert(Place), batch)
+    return len(batch)
+
+
+def geocode_reports(model, batch_size=1000):
+    """Re-geocode every report of one table in id-ordered batches.
+
+    Yields (last_id, located) after each batch, where located counts the
+    reports of the batch that resolved to a place.
+    """
+    location = model.location_lost if model.__tablename__ == 'lost_report' else model.location_found
+    update = db.update(model).where(model.id == db.bindparam('report_id')).values(
+        location_lat=db.bindparam('lat'), location_lon=db.bindparam('lon'))
+    last_id = 0
+    while True:
+        connection = db.session.connection()
+        rows = connection.execute(db.select(model.id, location).where(model.id > last_id)
+                                  .order_by(model.id).limit(batch_size)).all()
+        if not rows:
+            return
+        points = geocode_many(connection, [text for _, text in rows])
+        connection.execute(update,
+                           [{'report_id': report_id, 'lat': lat, 'lon': lon}
+                            for (report_id, _), (lat, lon) in zip(rows, points)])
+        db.session.commit()
+        last_id = rows[-1][0]
+        yield last_id, sum(lat is not None for lat, _ in points)
@@ -0,0 +1,63 @@
+import io
+from collections import namedtuple
+from app.utils.phash_utils import dhash
+
+# Refuse images that would decode to more pixels than this (decompression bombs)
+MAX_IMAGE_PIXELS = 40_000_000
+
+ProcessedImage = namedtuple('ProcessedImage', 'variants phash')
+
+
+def pillow():
+    """(Image, ImageOps, features) from Pillow, imported on first use"""
+    from PIL import Image, ImageOps, features
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    return Image, ImageOps, features
+
+
+def output_format(preferred):
+    """Preferred format if this Pillow build can encode it, else JPEG"""
+    _, _, features = pillow()
+    if preferred.upper() == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return preferred.upper()
+
+
+def _encode(img, fmt, quality):
+    buffer = io.BytesIO()
+    if fmt == 'JPEG' and img.mode != 'RGB':
+        img = img.convert('RGB')
+    # No exif= argument: metadata (GPS, device, timestamps) is dropped
+    img.save(buffer, fmt, quality=quality, optimize=fmt == 'JPEG', method=4 if fmt == 'WEBP' else 0)
+    return buffer.getvalue()
+
+
+def process_image(stream, max_dimension, thumbnail_sizes, fmt='WEBP', quality=80):
+    """Decode an uploaded photo once and re-encode it at every size.
+
+    Returns a ProcessedImage: variants maps '' to the capped-resolution
+    image and each thumbnail name from thumbnail_sizes (name -> max edge) to
+    its encoded bytes; phash is the 64-bit perceptual hash of the photo.
+    Raises ValueError if the stream is not a readable image.
+    """
+    Image, ImageOps, _ = pillow()
+    try:
+        img = Image.open(stream)
+        # JPEG can decode straight to a reduced scale, skipping most of the work
+        img.draft('RGB', (max_dimension, max_dimension))
+        img = ImageOps.exif_transpose(img)
+    except (OSError, Image.DecompressionBombError, SyntaxError) as e:
+        raise ValueError(f'Unreadable image: {e}') from e
+
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'PA') else 'RGB')
+    img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    variants = {'': _encode(img, fmt, quality)}
+    # Thumbnails are derived from the already-downscaled image, largest first
+    for name, edge in sorted(thumbnail_sizes.items(), key=lambda item: -item[1]):
+        img = img.copy()
+        img.thumbnail((edge, edge), Image.LANCZOS)
+        variants[name] = _encode(img, fmt, quality)
+    # Hashing the smallest rendition is as stable as hashing the original, and cheap
+    return ProcessedImage(variants, dhash(img))
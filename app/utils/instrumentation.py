@@ -0,0 +1,120 @@
+import collections
+import hmac
+import time
+from flask import Response, abort, current_app, g, has_request_context, request
+from sqlalchemy.engine import Engine
+from app import db
+from app.utils.metrics import (REGISTRY, REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_QUERY_SECONDS,
+                               N_PLUS_ONE, QUERY_SECONDS)
+from app.utils.profiler import SamplingProfiler, write_folded
+
+
+class SqlStats:
+    """SQL executed while serving one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = collections.Counter()
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.seconds += elapsed
+        self.statements[statement] += 1
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    QUERY_SECONDS.observe(elapsed, statement.lstrip().split(None, 1)[0].upper() if statement else '')
+    if has_request_context():
+        stats = g.get('sql_stats')
+        if stats is not None:
+            stats.record(statement, elapsed)
+
+
+def _listen_engine_events():
+    # Class-level listeners cover every engine, including ones created later
+    if not db.event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        db.event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        db.event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.sql_stats = SqlStats()
+    profiler = current_app.extensions.get('profiler')
+    if profiler is not None:
+        profiler.start()
+        g.profiling = True
+
+
+def _record_status(response):
+    g.response_status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    # A teardown handler, so requests whose view raised are counted (as the
+    # error handler's status, or 500) and their profiler is stopped too
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or 'unmatched'
+    config = current_app.config
+    status = g.pop('response_status', None) or 500
+
+    stacks = current_app.extensions['profiler'].stop() if g.pop('profiling', False) else None
+
+    REQUEST_SECONDS.observe(elapsed, endpoint, request.method, str(status))
+    stats = g.pop('sql_stats')
+    REQUEST_QUERIES.observe(stats.count, endpoint)
+    REQUEST_QUERY_SECONDS.observe(stats.seconds, endpoint)
+
+    # The same statement run again and again with different parameters is
+    # the signature of a lazy load inside a loop
+    threshold = config['METRICS_N_PLUS_ONE_THRESHOLD']
+    if threshold and stats.statements:
+        statement, repeats = stats.statements.most_common(1)[0]
+        if repeats >= threshold:
+            N_PLUS_ONE.inc(endpoint)
+            current_app.logger.warning('Possible N+1 query in %s: ran %d times: %s',
+                                       endpoint, repeats, ' '.join(statement.split())[:200])
+
+    if stacks and elapsed >= config['PROFILE_SLOW_SECONDS']:
+        path = write_folded(stacks, config['PROFILE_DIR'], endpoint.replace('.', '-'))
+        current_app.logger.info('Profiled slow request %s %s (%.2fs, %s): %s',
+                                request.method, request.path, elapsed, status, path)
+
+
+def metrics_view():
+    """Prometheus scrape endpoint"""
+    token = current_app.config['METRICS_TOKEN']
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(403)
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_instrumentation(app):
+    """Time requests, SQL, SMTP and storage, and serve the results on /metrics.
+
+    Route names, latencies and queue depths are not for the public, so the
+    endpoint only exists when METRICS_TOKEN is set.
+    """
+    if not app.config['METRICS_ENABLED']:
+        return
+    _listen_engine_events()
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
+    if app.config['METRICS_TOKEN']:
+        app.add_url_rule('/metrics', 'metrics', metrics_view)
+    if app.config['PROFILE_SLOW_REQUESTS']:
+        app.extensions['profiler'] = SamplingProfiler(app.config['PROFILE_SAMPLE_INTERVAL'])
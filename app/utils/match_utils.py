@@ -0,0 +1,270 @@
+import re
+import numpy as np
+from flask import current_app
+from app import db
+from app.models import LostReport, FoundReport, MatchCandidate, NameToken, OPEN_STATUSES
+from app.utils.cache import invalidate
+from app.utils.fuzzy_match import CandidateMatrix, PHOTO_MATCH_WEIGHT, features
+from app.utils.metrics import MATCH_CANDIDATES_SCORED
+from app.utils.phash_utils import from_db, hamming, photo_index
+
+_ID_STRIP_RE = re.compile(r'[\s\-]+')
+_NAME_TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def normalize_id_number(value):
+    """Canonical form of an ID number: no spaces or dashes, upper case"""
+    if not value:
+        return None
+    normalized = _ID_STRIP_RE.sub('', value).upper()
+    return normalized or None
+
+
+def name_tokens(name):
+    """Distinct lower-cased word tokens of an owner name"""
+    if not name:
+        return set()
+    return {token for token in _NAME_TOKEN_RE.findall(name.lower()) if len(token) > 1}
+
+
+def report_kind(report):
+    return 'lost' if isinstance(report, LostReport) else 'found'
+
+
+def report_model(kind):
+    return LostReport if kind == 'lost' else FoundReport
+
+
+def token_rows(kind, report_id, name):
+    """Rows for the name_token table describing one report"""
+    return [{'report_kind': kind, 'report_id': report_id, 'token': token}
+            for token in sorted(name_tokens(name))]
+
+
+def _opposite(report):
+    if isinstance(report, LostReport):
+        return FoundReport, 'found'
+    return LostReport, 'lost'
+
+
+def is_open(model):
+    """Open-status filter with literal values, which the partial indexes require"""
+    return model.status.in_([db.literal_column(f"'{status}'") for status in OPEN_STATUSES])
+
+
+def _id_block(model):
+    # Served by the partial ix_<table>_open_id index
+    return db.select(model.id).where(model.normalized_id == db.bindparam('normalized_id'), is_open(model))
+
+
+def _token_block(model, kind):
+    hits = db.func.count().label('hits')
+    return db.select(NameToken.report_id).join(
+        model, model.id == NameToken.report_id
+    ).where(
+        NameToken.report_kind == kind,
+        NameToken.token.in_(db.bindparam('tokens', expanding=True)),
+        is_open(model)
+    ).group_by(NameToken.report_id).order_by(
+        hits.desc(), NameToken.report_id.desc()
+    ).limit(db.bindparam('limit'))
+
+
+# Date and place columns differ by report kind
+_WHEN_WHERE = {LostReport: ('date_lost', 'location_lost'), FoundReport: ('date_found', 'location_found')}
+
+
+def _candidate_rows(model):
+    date_col, location_col = (getattr(model, attr) for attr in _WHEN_WHERE[model])
+    # Open status is checked in Python: with a status term in the WHERE
+    # clause SQLite walks the status indexes instead of the primary key
+    return db.select(model.id, model.normalized_id, model.id_type, model.owner_name,
+                     date_col, location_col, model.location_lat, model.location_lon, model.status).where(
+        model.id.in_(db.bindparam('ids', expanding=True))
+    ).order_by(model.id)
+
+
+# Statements are built once so SQLAlchemy's compiled cache is hit on every lookup
+_ID_BLOCKS = {model: _id_block(model) for model in (FoundReport, LostReport)}
+_TOKEN_BLOCKS = {FoundReport: _token_block(FoundReport, 'found'), LostReport: _token_block(LostReport, 'lost')}
+_CANDIDATE_ROWS = {model: _candidate_rows(model) for model in (FoundReport, LostReport)}
+
+
+def report_features(report):
+    """Fuzzy-scoring inputs of a report"""
+    date_attr, location_attr = _WHEN_WHERE[type(report)]
+    return features(report.normalized_id or normalize_id_number(report.id_number), report.id_type,
+                    name_tokens(report.owner_name), getattr(report, date_attr),
+                    name_tokens(getattr(report, location_attr)), report.location_lat, report.location_lon)
+
+
+def blocked_candidate_ids(report, extra_ids=()):
+    """Ids of the open reports of the opposite table worth scoring against report.
+
+    Two indexed lookups pick them: the same normalized ID number, and the
+    MATCH_BLOCK_SIZE reports sharing the most owner-name tokens. extra_ids
+    (photo index hits) are added as they are.
+    """
+    other, _ = _opposite(report)
+    connection = db.session.connection()
+    ids = set(extra_ids)
+    normalized_id = report.normalized_id or normalize_id_number(report.id_number)
+    if normalized_id:
+        ids.update(connection.scalars(_ID_BLOCKS[other], {'normalized_id': normalized_id}))
+    tokens = name_tokens(report.owner_name)
+    if tokens:
+        ids.update(connection.scalars(_TOKEN_BLOCKS[other], {
+            'tokens': sorted(tokens), 'limit': current_app.config['MATCH_BLOCK_SIZE']}))
+    return ids
+
+
+def candidate_matrix(model, ids):
+    """CandidateMatrix of the open reports of model among ids, read fresh from the database"""
+    matrix = CandidateMatrix()
+    if not ids:
+        return matrix
+    rows = [row for row in db.session.connection().execute(_CANDIDATE_ROWS[model], {'ids': sorted(ids)})
+            if row.status in OPEN_STATUSES]
+    if rows:
+        matrix.extend([row[0] for row in rows], [
+            features(normalized_id, id_type, name_tokens(owner_name), date, name_tokens(location), lat, lon)
+            for _, normalized_id, id_type, owner_name, date, location, lat, lon, _ in rows])
+    return matrix
+
+
+def _photo_similarities(report, other):
+    if report.photo_hash is None:
+        return {}
+    radius = current_app.config['PHOTO_MATCH_MAX_DISTANCE']
+    return {candidate_id: 1 - distance / (radius + 1)
+            for candidate_id, distance in photo_index(other).search(from_db(report.photo_hash), radius)}
+
+
+def rank_candidate_ids(report, limit=None):
+    """Return [(candidate_id, score)] from the opposite table, best first.
+
+    Candidates are blocked on the ID-number and name-token indexes (see
+    blocked_candidate_ids), plus the photos within PHOTO_MATCH_MAX_DISTANCE
+    bits of the report's perceptual hash. Those within MATCH_RADIUS_KM and
+    MATCH_DATE_WINDOW_DAYS of this report are scored with the fuzzy
+    CandidateMatrix: ID-number edit distance with OCR confusions folded,
+    owner-name token similarity, ID type, date and place proximity, and the
+    photo similarity. Candidates below MATCH_MIN_SCORE are left out.
+    """
+    config = current_app.config
+    limit = limit or config.get('MATCH_CANDIDATE_LIMIT', 20)
+    other, kind = _opposite(report)
+    photo_hits = _photo_similarities(report, other)
+    matrix = candidate_matrix(other, blocked_candidate_ids(report, photo_hits))
+    if not len(matrix):
+        return []
+
+    query = report_features(report)
+    hit_ids = list(photo_hits)
+    hit_positions = matrix.positions(hit_ids)
+    positions = matrix.within(query, config['MATCH_RADIUS_KM'], config['MATCH_DATE_WINDOW_DAYS'],
+                              keep=hit_positions[hit_positions >= 0])
+    MATCH_CANDIDATES_SCORED.observe(len(positions), kind)
+    scores = matrix.score(query, positions)
+    for position, candidate_id in zip(np.searchsorted(positions, hit_positions), hit_ids):
+        if position < len(positions) and matrix.ids[positions[position]] == candidate_id:
+            scores[position] += PHOTO_MATCH_WEIGHT * photo_hits[candidate_id]
+    ranked = matrix.top(scores, limit, config['MATCH_MIN_SCORE'], positions)
+    return [(candidate_id, round(score, 3)) for candidate_id, score in ranked]
+
+
+def match_signals(report, candidates):
+    """{candidate id: {signal: similarity}} explaining the scores of the given candidates"""
+    if not candidates:
+        return {}
+    matrix = CandidateMatrix()
+    ordered = sorted(candidates, key=lambda candidate: candidate.id)
+    matrix.extend([c.id for c in ordered], [report_features(c) for c in ordered])
+    signals = matrix.signals(report_features(report))
+    radius = current_app.config['PHOTO_MATCH_MAX_DISTANCE']
+    explained = {}
+    for position, candidate in enumerate(ordered):
+        explained[candidate.id] = {name: float(values[position]) for name, values in signals.items()}
+        photo = None
+        if report.photo_hash is not None and candidate.photo_hash is not None:
+            distance = hamming(from_db(report.photo_hash), from_db(candidate.photo_hash))
+            photo = max(0.0, 1 - distance / (radius + 1))
+        explained[candidate.id]['photo'] = photo
+    return explained
+
+
+def load_ranked(model, ranked):
+    """[(candidate, score)] for [(candidate id, score)], in order, skipping deleted rows"""
+    if not ranked:
+        return []
+    candidates = {c.id: c for c in model.query.filter(model.id.in_([cid for cid, _ in ranked]))}
+    return [(candidates[cid], score) for cid, score in ranked if cid in candidates]
+
+
+def find_candidates(report, limit=None):
+    """Return [(candidate, score)] of ranked open reports from the opposite table"""
+    other, _ = _opposite(report)
+    return load_ranked(other, rank_candidate_ids(report, limit))
+
+
+def _pair_columns(report):
+    """(own column, other column) of MatchCandidate for a report"""
+    if isinstance(report, LostReport):
+        return MatchCandidate.lost_id, MatchCandidate.found_id
+    return MatchCandidate.found_id, MatchCandidate.lost_id
+
+
+def score_report(kind, report_id, commit=True):
+    """Store the top-k candidates of one report in match_candidate.
+
+    Pairs are upserted, so re-running for the same report (or scoring the
+    pair again from the other side) leaves a single row with the latest score.
+    Returns the number of candidate pairs written.
+    """
+    report = db.session.get(report_model(kind), report_id)
+    if report is None:
+        return 0
+    ranked = rank_candidate_ids(report)
+    if not ranked:
+        return 0
+
+    own_col, other_col = _pair_columns(report)
+    existing = {row.found_id if kind == 'lost' else row.lost_id: row
+                for row in MatchCandidate.query.filter(
+                    own_col == report.id, other_col.in_([cid for cid, _ in ranked]))}
+    for candidate_id, score in ranked:
+        row = existing.get(candidate_id)
+        if row is None:
+            pair = {'lost_id': report.id, 'found_id': candidate_id} if kind == 'lost' \
+                else {'lost_id': candidate_id, 'found_id': report.id}
+            db.session.add(MatchCandidate(score=score, **pair))
+        elif row.score != score:
+            row.score = score
+    if commit:
+        db.session.commit()
+        invalidate()
+    return len(ranked)
+
+
+def stored_candidates_query(report, limit):
+    other, _ = _opposite(report)
+    own_col, other_col = _pair_columns(report)
+    return db.session.query(other, MatchCandidate.score).join(
+        MatchCandidate, other_col == other.id
+    ).filter(
+        own_col == report.id,
+        is_open(other)
+    ).order_by(MatchCandidate.score.desc(), other.id).limit(limit)
+
+
+def stored_candidates(report, limit=None):
+    """Return precomputed [(candidate, score)] for a report, best first"""
+    limit = limit or current_app.config.get('MATCH_CANDIDATE_LIMIT', 20)
+    return [(candidate, score) for candidate, score in stored_candidates_query(report, limit)]
+
+
+def verify_candidates(report):
+    """[(candidate id, score)] for a verify page: precomputed by the match
+    worker, or scored live if it hasn't caught up yet"""
+    stored = [(candidate.id, score) for candidate, score in stored_candidates(report)]
+    return stored or rank_candidate_ids(report)
@@ -0,0 +1,123 @@
+import queue
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.utils.cache import invalidate
+from app.utils.file_utils import attach_pending_photo, pending_photo_ids
+from app.utils.match_utils import report_model, score_report
+
+# Staged photos older than this are assumed orphaned by a restarted worker
+PENDING_PHOTO_GRACE = timedelta(minutes=5)
+
+# Delays before retrying a staged photo that failed for a reason other than
+# a bad image (storage unavailable, ...); after the last one it waits for
+# the next worker start or `flask match photos`
+PHOTO_RETRY_SECONDS = (30, 120, 600)
+
+_queue = queue.Queue()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def enqueue_report(kind, report_id):
+    """Queue a new lost/found report for photo processing and candidate scoring"""
+    app = current_app._get_current_object()
+    if app.config.get('MATCH_WORKERS', 0) <= 0:
+        # No pool configured (tests, one-off scripts): process inline
+        process_report(kind, report_id)
+        return
+    _start_workers(app)
+    _queue.put((kind, report_id, 0))
+
+
+def process_report(kind, report_id):
+    """Attach the report's staged photo, if any, then score it.
+
+    The report is scored on its text fields even when the photo fails; the
+    staged upload is kept and False is returned so the photo can be retried.
+    """
+    report = db.session.get(report_model(kind), report_id)
+    photo_done = True
+    if report is not None and report.photo_upload:
+        try:
+            attach_pending_photo(report)
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Photo of %s report %s failed; scoring it without the photo', kind, report_id)
+            photo_done = False
+    score_report(kind, report_id)
+    return photo_done
+
+
+def _retry_photo(app, kind, report_id, attempt):
+    if attempt >= len(PHOTO_RETRY_SECONDS):
+        app.logger.warning('Giving up on the photo of %s report %s until the next restart', kind, report_id)
+        return
+    timer = threading.Timer(PHOTO_RETRY_SECONDS[attempt], _queue.put, args=((kind, report_id, attempt + 1),))
+    timer.daemon = True
+    timer.start()
+
+
+def _start_workers(app):
+    if _workers:
+        return
+    with _workers_lock:
+        if _workers:
+            return
+        for index in range(app.config['MATCH_WORKERS']):
+            worker = threading.Thread(target=_run_worker, args=(app,),
+                                      name=f'match-worker-{index}', daemon=True)
+            worker.start()
+            _workers.append(worker)
+        # Pick up photos a previous process accepted but never finished
+        for kind in ('lost', 'found'):
+            for report_id in pending_photo_ids(report_model(kind), datetime.utcnow() - PENDING_PHOTO_GRACE):
+                _queue.put((kind, report_id, 0))
+
+
+def _run_worker(app):
+    while True:
+        kind, report_id, attempt = _queue.get()
+        try:
+            with app.app_context():
+                try:
+                    if not process_report(kind, report_id):
+                        _retry_photo(app, kind, report_id, attempt)
+                except IntegrityError:
+                    # Another worker stored the same pair first (scoring its
+                    # counterpart); once rolled back its row is updated instead
+                    db.session.rollback()
+                    score_report(kind, report_id)
+        except Exception:
+            app.logger.exception('Error processing %s report %s', kind, report_id)
+        finally:
+            _queue.task_done()
+
+
+def wait_for_pending():
+    """Block until every queued report has been processed"""
+    _queue.join()
+
+
+def backfill(kind, batch_size=500):
+    """Score every existing report of one kind in id-ordered batches.
+
+    Yields (last_id, scored) after each batch so callers can report progress;
+    scoring is idempotent, so an interrupted backfill can simply be re-run.
+    """
+    model = report_model(kind)
+    last_id = 0
+    while True:
+        ids = [report_id for (report_id,) in db.session.query(model.id)
+               .filter(model.id > last_id).order_by(model.id).limit(batch_size)]
+        if not ids:
+            return
+        for report_id in ids:
+            score_report(kind, report_id, commit=False)
+        db.session.commit()
+        invalidate()
+        last_id = ids[-1]
+        db.session.expunge_all()
+        yield last_id, len(ids)
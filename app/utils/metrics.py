@@ -0,0 +1,141 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter per label combination"""
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination"""
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts + overflow, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, (list(series[0]), series[1], series[2]))
+                           for labels, series in self._series.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _number(bound)
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", le)])} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {count}'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+# Values are per process; with several gunicorn workers each scrape sees the
+# worker that served it, so scrape workers individually or aggregate by instance
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint.', ('endpoint', 'method', 'status')))
+REQUEST_QUERIES = REGISTRY.register(Histogram(
+    'http_request_db_queries', 'SQL statements executed per request.', ('endpoint',), COUNT_BUCKETS))
+REQUEST_QUERY_SECONDS = REGISTRY.register(Histogram(
+    'http_request_db_seconds', 'Time spent in SQL per request.', ('endpoint',)))
+N_PLUS_ONE = REGISTRY.register(Counter(
+    'http_request_n_plus_one_total', 'Requests that repeated one SQL statement past the threshold.',
+    ('endpoint',)))
+QUERY_SECONDS = REGISTRY.register(Histogram(
+    'db_query_duration_seconds', 'Duration of individual SQL statements.', ('operation',)))
+SMTP_SECONDS = REGISTRY.register(Histogram(
+    'smtp_operation_duration_seconds', 'Outbound SMTP time by operation.', ('operation',)))
+EMAILS = REGISTRY.register(Counter(
+    'emails_delivered_total', 'Outbox delivery attempts by result.', ('result',)))
+FILE_IO_SECONDS = REGISTRY.register(Histogram(
+    'file_io_duration_seconds', 'Photo storage time by backend and operation.', ('backend', 'operation')))
+IMAGE_SECONDS = REGISTRY.register(Histogram(
+    'image_processing_duration_seconds', 'Decode, resize and re-encode time per uploaded photo.'))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit/miss).', ('cache', 'result')))
+CACHE_INVALIDATIONS = REGISTRY.register(Counter(
+    'cache_invalidations_total', 'Write-driven cache invalidations by namespace.', ('namespace',)))
+MATCH_CANDIDATES_SCORED = REGISTRY.register(Histogram(
+    'match_candidates_scored', 'Candidates scored per ranking, after place/date pruning.', ('kind',),
+    (10, 100, 1000, 10000, 100000, 1000000)))
+
+
+@contextmanager
+def timed(histogram, *labels):
+    """Observe the duration of the with-block, including when it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, *labels)
@@ -0,0 +1,130 @@
+import json
+from datetime import datetime, timedelta
+from flask import current_app
+from markupsafe import Markup
+from app import db
+from app.models import EmailOutbox, Notification
+from app.utils.email_utils import _start_sender
+
+# Template wrapping every email: one greeting, then the body of each event
+DIGEST_TEMPLATE = 'email/notification.html'
+
+
+def _event_module(template, context):
+    """Render one event template; its module exposes `subject` and str() is the body.
+
+    Templates come from the app's Jinja environment, which compiles each one
+    once and caches it, with autoescaping on like the page templates.
+    """
+    return current_app.jinja_env.get_template(f'email/{template}.html').make_module(context)
+
+
+def render_email(to_name, events):
+    """(subject, html) of one email covering [(template, context)] events"""
+    items = []
+    for template, context in events:
+        module = _event_module(template, context)
+        items.append({'subject': module.subject, 'body': Markup(str(module))})
+    module = current_app.jinja_env.get_template(DIGEST_TEMPLATE).make_module({
+        'name': to_name, 'items': items, 'sender': current_app.config['SENDER_NAME']})
+    return module.subject, str(module)
+
+
+def notify(to_email, to_name, template, **context):
+    """Queue one notification event for a recipient.
+
+    Like send_email_notification, the event is only sent once the caller
+    commits. Events of one recipient that arrive within MAIL_DIGEST_SECONDS
+    of each other are sent together as a single email.
+    """
+    db.session.add(Notification(to_email=to_email, to_name=to_name, template=template,
+                                context=json.dumps(context)))
+    app = current_app._get_current_object()
+    if app.config.get('MAIL_OUTBOX_SENDER'):
+        _start_sender(app)
+        if not app.config['MAIL_DIGEST_SECONDS']:
+            db.session.info['outbox_pending'] = True
+
+
+def notify_match(lost_report, found_report):
+    """Tell the owner and the finder that their reports were matched"""
+    notify(lost_report.reporter_email, lost_report.reporter_name, 'match_owner',
+           id_type=lost_report.id_type, id_number=lost_report.id_number,
+           found_location=found_report.location_found)
+    notify(found_report.finder_email, found_report.finder_name, 'match_finder',
+           id_type=found_report.id_type)
+
+
+def due_recipients_query(cutoff, limit):
+    """Recipients whose oldest pending event was created at or before cutoff, longest waiting first"""
+    oldest = db.func.min(Notification.date_created)
+    return db.select(Notification.to_email).where(Notification.failed_at.is_(None)).group_by(
+        Notification.to_email).having(oldest <= cutoff).order_by(oldest).limit(limit)
+
+
+def recipient_events_query(to_email):
+    """Every pending event of one recipient, oldest first"""
+    return db.select(Notification).where(
+        Notification.to_email == to_email, Notification.failed_at.is_(None)).order_by(Notification.id)
+
+
+def coalesce_notifications(flush=False, batch_size=None):
+    """Turn due notification events into outbox emails, one per recipient.
+
+    A recipient is due once their oldest event has waited MAIL_DIGEST_SECONDS
+    (or at once with flush); every event pending for them at that point goes
+    into the same email. If that email cannot be rendered, the recipient's
+    events are set aside (failed_at) so they don't hold up everyone else's.
+    Returns the number of emails queued.
+    """
+    config = current_app.config
+    cutoff = datetime.utcnow()
+    if not flush:
+        cutoff -= timedelta(seconds=config['MAIL_DIGEST_SECONDS'])
+    recipients = db.session.scalars(due_recipients_query(
+        cutoff, batch_size or config['MAIL_OUTBOX_BATCH_SIZE'])).all()
+
+    queued = 0
+    for to_email in recipients:
+        events = db.session.scalars(recipient_events_query(to_email)).all()
+        if not events:
+            continue
+        event_ids = [event.id for event in events]
+        try:
+            subject, html = render_email(events[-1].to_name,
+                                         [(event.template, json.loads(event.context)) for event in events])
+        except Exception:
+            current_app.logger.exception('Could not render the digest for %s; %d event(s) set aside',
+                                         to_email, len(events))
+            db.session.execute(db.update(Notification).where(Notification.id.in_(event_ids)).values(
+                failed_at=datetime.utcnow()))
+            db.session.commit()
+            continue
+        db.session.add(EmailOutbox(to_email=to_email, to_name=events[-1].to_name,
+                                   subject=subject, html_content=html))
+        # Conditional delete: if another sender already took these events, back out
+        deleted = db.session.execute(db.delete(Notification).where(
+            Notification.id.in_(event_ids))).rowcount
+        if deleted != len(events):
+            db.session.rollback()
+            continue
+        db.session.commit()
+        queued += 1
+    return queued
+
+
+def retry_failed_notifications():
+    """Put events set aside after a rendering error back in line; returns how many"""
+    retried = db.session.execute(db.update(Notification).where(Notification.failed_at.isnot(None)).values(
+        failed_at=None)).rowcount
+    db.session.commit()
+    return retried
+
+
+def notification_status():
+    """(pending events, recipients waiting, events set aside)"""
+    pending = Notification.failed_at.is_(None)
+    return db.session.execute(db.select(
+        db.func.count(db.case((pending, Notification.id))),
+        db.func.count(db.distinct(db.case((pending, Notification.to_email)))),
+        db.func.count(Notification.failed_at))).one()
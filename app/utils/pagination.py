@@ -0,0 +1,37 @@
+from datetime import datetime
+from app import db
+
+
+def encode_cursor(report):
+    """Opaque position of a report in (date_reported, id) order"""
+    return f"{report.date_reported.isoformat()}_{report.id}"
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; returns None for a missing or malformed cursor"""
+    if not cursor:
+        return None
+    try:
+        timestamp, report_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(timestamp), int(report_id)
+    except ValueError:
+        return None
+
+
+def keyset_query(query, model, cursor, page_size):
+    """Query for the page after cursor plus one row to detect a next page"""
+    position = decode_cursor(cursor)
+    if position:
+        query = query.filter(db.tuple_(model.date_reported, model.id) < position)
+    return query.order_by(model.date_reported.desc(), model.id.desc()).limit(page_size + 1)
+
+
+def keyset_page(query, model, cursor, page_size):
+    """Return (rows, next_cursor) for the page after cursor, newest first.
+
+    Seeks on the (date_reported, id) index instead of using OFFSET, so every
+    page costs the same no matter how deep it is.
+    """
+    rows = keyset_query(query, model, cursor, page_size).all()
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
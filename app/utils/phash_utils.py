@@ -0,0 +1,164 @@
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import combinations
+from app import db
+from app.utils.database import IdWatermark
+
+HASH_BITS = 64
+
+# Photos are attached after their row is inserted; each refresh re-reads
+# this much attach history so commits that land out of order are not missed
+ATTACH_WINDOW = timedelta(minutes=5)
+
+
+def dhash(img, hash_size=8):
+    """64-bit difference hash: brightness gradient between adjacent pixels.
+
+    Robust to re-encoding, scaling and small brightness changes, so two
+    photos of the same card land within a few bits of each other.
+    """
+    from PIL import Image  # already loaded: img is a Pillow image
+    small = img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def to_db(value):
+    """Unsigned 64-bit hash -> signed value that fits a BIGINT column"""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def from_db(value):
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+@lru_cache(maxsize=None)
+def _flip_masks(bits, radius):
+    """Every mask of `bits` width with at most `radius` bits set"""
+    return [sum(1 << bit for bit in flipped)
+            for count in range(radius + 1)
+            for flipped in combinations(range(bits), count)]
+
+
+class MultiIndexHash:
+    """Multi-index hashing over Hamming distance (Norouzi et al.).
+
+    Each 64-bit hash is split into `chunks` substrings, each with its own
+    hash table. By the pigeonhole principle, a hash within radius r of the
+    query has at least one substring within r // chunks of the query's, so a
+    search only probes the buckets of those few substring neighbours and
+    verifies what it finds there, instead of comparing against every hash.
+    """
+
+    def __init__(self, chunks=4):
+        self.chunks = chunks
+        self.bits = HASH_BITS // chunks
+        self._mask = (1 << self.bits) - 1
+        self._tables = [{} for _ in range(chunks)]
+        self.size = 0
+
+    def _substrings(self, value):
+        return [(value >> (index * self.bits)) & self._mask for index in range(self.chunks)]
+
+    def add(self, value, item):
+        for table, key in zip(self._tables, self._substrings(value)):
+            table.setdefault(key, []).append((value, item))
+        self.size += 1
+
+    def search(self, value, radius):
+        """Return [(distance, item)] for every item within radius, closest first"""
+        masks = _flip_masks(self.bits, radius // self.chunks)
+        seen = set()
+        results = []
+        for table, key in zip(self._tables, self._substrings(value)):
+            for mask in masks:
+                for candidate, item in table.get(key ^ mask, ()):
+                    if item in seen:
+                        continue
+                    seen.add(item)
+                    distance = hamming(value, candidate)
+                    if distance <= radius:
+                        results.append((distance, item))
+        results.sort(key=lambda result: result[0])
+        return results
+
+
+class PhotoIndex:
+    """Multi-index hash of one report table's photo hashes, topped up incrementally.
+
+    Rows are append-only by id, so each lookup loads the rows above the
+    highest id already seen, the lower ids that were still uncommitted then
+    (see IdWatermark), and the older rows whose photo was attached by the
+    worker since the last lookup. This keeps every process's copy current
+    without a rebuild.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.index = MultiIndexHash()
+        self.watermark = IdWatermark(window=ATTACH_WINDOW)
+        self.attached_since = None
+        self._recent = {}  # report id -> photo_attached_at, for rows attached within the window
+        self._lock = threading.Lock()
+        columns = (model.id, model.photo_hash, model.photo_attached_at)
+        # Every new row is read, with or without a photo, so skipped ids show up as gaps
+        self.new_rows = db.select(*columns).where(model.id > db.bindparam('last_id')).order_by(model.id)
+        self.late_rows = db.select(*columns).where(model.id.in_(db.bindparam('ids', expanding=True)))
+        # Rows above last_id are left for new_rows; that is checked in Python,
+        # since with an id term SQLite walks the primary key instead of the index
+        self.late_attaches = db.select(*columns).where(
+            model.photo_attached_at >= db.bindparam('since'),
+            model.photo_hash.isnot(None))
+
+    def refresh(self):
+        with self._lock:
+            now = datetime.utcnow()
+            connection = db.session.connection()
+            watermark = self.watermark
+            new_rows = connection.execute(self.new_rows, {'last_id': watermark.last_id}).all()
+            late_rows = connection.execute(self.late_rows, {'ids': watermark.gaps}).all() \
+                if watermark.gaps else []
+            watermark.advance([row[0] for row in new_rows], [row[0] for row in late_rows])
+            rows = new_rows + late_rows
+            if self.attached_since is not None:
+                rows += [row for row in connection.execute(self.late_attaches, {
+                    'since': self.attached_since - ATTACH_WINDOW}) if row[0] <= watermark.last_id]
+            self.attached_since = now
+            for report_id, photo_hash, attached_at in rows:
+                if photo_hash is None:
+                    continue
+                if attached_at is not None:
+                    if report_id in self._recent:
+                        continue
+                    self._recent[report_id] = attached_at
+                self.index.add(from_db(photo_hash), report_id)
+            horizon = now - ATTACH_WINDOW
+            self._recent = {report_id: attached_at for report_id, attached_at in self._recent.items()
+                            if attached_at >= horizon}
+
+    def search(self, photo_hash, radius):
+        self.refresh()
+        return [(report_id, distance) for distance, report_id in self.index.search(photo_hash, radius)]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def photo_index(model):
+    """Process-wide PhotoIndex for a report model, keyed per database engine"""
+    key = (db.engine.url, model)
+    if key not in _indexes:
+        with _indexes_lock:
+            _indexes.setdefault(key, PhotoIndex(model))
+    return _indexes[key]
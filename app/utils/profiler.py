@@ -0,0 +1,74 @@
+import collections
+import os
+import sys
+import threading
+import time
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def _folded_stack(frame):
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+class SamplingProfiler:
+    """Statistical profiler for request threads.
+
+    One daemon thread wakes every `interval` seconds and records the current
+    stack of each thread that is inside a request, so the overhead is fixed
+    per sample rather than per function call. Stacks are kept in the folded
+    format ("outer;inner;leaf count") that flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._active = {}  # thread id -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_running(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[_folded_stack(frame)] += 1
+
+    def start(self):
+        """Begin sampling the calling thread"""
+        self._ensure_running()
+        with self._lock:
+            self._active[threading.get_ident()] = collections.Counter()
+
+    def stop(self):
+        """Stop sampling the calling thread and return its stack counts"""
+        with self._lock:
+            return self._active.pop(threading.get_ident(), collections.Counter())
+
+
+def write_folded(stacks, directory, name):
+    """Save stack counts as a .folded file; returns its path"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}.folded")
+    with open(path, 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f'{stack} {count}\n')
+    return path
@@ -0,0 +1,149 @@
+import json
+import re
+from datetime import datetime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from app import db
+from app.models import LostReport, FoundReport, name_tokens_delete
+
+# "SCAN lost_report" with no index is a full table scan; "SCAN ... USING
+# [COVERING] INDEX" walks an index and "SCAN ... VIRTUAL TABLE" is FTS
+_SQLITE_FULL_SCAN_RE = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+_SQLITE_SUBQUERY_RE = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\w+)$')
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN of a statement, compiled with its parameters like the statement itself"""
+    inherit_cache = False
+    # Read by the compiler when the wrapped statement is an UPDATE or DELETE
+    _inline = False
+    _return_defaults = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+def _process(element, compiler, **kw):
+    sql = compiler.process(element.statement, **kw)
+    # Plan rows don't have the statement's columns; keep its types off them
+    compiler._result_columns = []
+    return sql
+
+
+@compiles(Explain, 'sqlite')
+def _explain_sqlite(element, compiler, **kw):
+    return 'EXPLAIN QUERY PLAN ' + _process(element, compiler, **kw)
+
+
+@compiles(Explain, 'postgresql')
+def _explain_postgresql(element, compiler, **kw):
+    return 'EXPLAIN (FORMAT JSON) ' + _process(element, compiler, **kw)
+
+
+def _statement(query):
+    return query.statement if hasattr(query, 'statement') else query
+
+
+def hot_queries():
+    """[(name, statement, params)] for the queries on the request and worker hot paths.
+
+    Each statement is the one the code path runs, built by the same function
+    or constant, so a change there is what gets checked.
+    """
+    from app.routes.admin_routes import report_counts_query
+    from app.utils import match_utils
+    from app.utils.email_utils import due_entries_query
+    from app.utils.file_utils import pending_photos_query
+    from app.utils.geo_utils import PLACE_LOOKUP
+    from app.utils.notification_utils import due_recipients_query, recipient_events_query
+    from app.utils.pagination import keyset_query
+    from app.utils.phash_utils import PhotoIndex
+    from app.utils.retention_utils import expired_ids_query, unlink_query
+    from app.utils.search_utils import get_search_backend
+
+    when = datetime(2024, 1, 1)
+    cursor = f'{when.isoformat()}_1000'
+    search = get_search_backend()
+    queries = []
+    for model, kind in ((LostReport, 'lost'), (FoundReport, 'found')):
+        photos = PhotoIndex(model)
+        queries += [
+            (f'{kind}: candidate ID block', match_utils._ID_BLOCKS[model], {'normalized_id': 'A12000123'}),
+            (f'{kind}: candidate name-token block', match_utils._TOKEN_BLOCKS[model],
+             {'tokens': ['ravi', 'kumar'], 'limit': 500}),
+            (f'{kind}: candidate rows', match_utils._CANDIDATE_ROWS[model], {'ids': [1, 2, 3]}),
+            (f'{kind}: stored candidates',
+             match_utils.stored_candidates_query(model(id=1), 20), {}),
+            (f'{kind}: dashboard page', keyset_query(model.query, model, cursor, 50), {}),
+            (f'{kind}: dashboard page by status',
+             keyset_query(model.query.filter(model.status == 'verified'), model, cursor, 50), {}),
+            (f'{kind}: dashboard page by type',
+             keyset_query(model.query.filter(model.id_type == 'Student ID'), model, cursor, 50), {}),
+            (f'{kind}: dashboard search',
+             search.order(search.filter(model.query, model, 'ravi'), model, 'ravi').limit(50), {}),
+            (f'{kind}: name token resync', name_tokens_delete(kind, 1), {}),
+            (f'{kind}: photo index refresh', photos.new_rows, {'last_id': 1000}),
+            (f'{kind}: photo index late commits', photos.late_rows, {'ids': [1, 2, 3]}),
+            (f'{kind}: photo index late attach', photos.late_attaches, {'since': when}),
+            (f'{kind}: pending photos', pending_photos_query(model), {}),
+            (f'{kind}: unlink matched counterpart', unlink_query(model, [1, 2, 3]), {}),
+            (f'{kind}: retention batch', expired_ids_query(model, when, 1000, 500), {}),
+        ]
+    queries += [
+        ('dashboard counts', report_counts_query(LostReport.query, FoundReport.query), {}),
+        ('dashboard counts by status', report_counts_query(
+            LostReport.query.filter(LostReport.status == 'verified'),
+            FoundReport.query.filter(FoundReport.status == 'verified')), {}),
+        ('gazetteer lookup', PLACE_LOOKUP, {'keys': ['library', 'north campus']}),
+        ('outbox: due entries', due_entries_query(when, 50), {}),
+        ('notifications: due recipients', due_recipients_query(when, 50), {}),
+        ('notifications: recipient events', recipient_events_query('owner@example.com'), {}),
+    ]
+    return [(name, _statement(query), params) for name, query, params in queries]
+
+
+def explain(connection, statement, params=None):
+    """Return (plan lines, tables read by a full scan) for one statement"""
+    rows = connection.execute(Explain(statement), params or {}).all()
+    if connection.dialect.name == 'sqlite':
+        lines = [row[-1] for row in rows]
+        # Scanning a subquery's own results (a UNION, say) reads no table
+        subqueries = {match.group(1) for match in map(_SQLITE_SUBQUERY_RE.match, lines) if match}
+        scanned = [match.group(1) for match in map(_SQLITE_FULL_SCAN_RE.match, lines)
+                   if match and match.group(1) not in subqueries]
+        return lines, scanned
+
+    plan = rows[0][0]
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    lines, scanned = [], []
+
+    def walk(node, depth=0):
+        relation = node.get('Relation Name')
+        lines.append('  ' * depth + node['Node Type'] + (f' on {relation}' if relation else ''))
+        if node['Node Type'] == 'Seq Scan':
+            scanned.append(relation)
+        for child in node.get('Plans', ()):
+            walk(child, depth + 1)
+
+    walk(plan[0]['Plan'])
+    return lines, scanned
+
+
+def check_query_plans():
+    """Explain every hot query; returns [(name, plan lines, full-scanned tables)].
+
+    On PostgreSQL sequential scans are disabled for the check so the planner
+    only picks one when no index can serve the query, which keeps the result
+    independent of table sizes and statistics.
+    """
+    results = []
+    with db.engine.connect() as connection:
+        if connection.dialect.name not in ('sqlite', 'postgresql'):
+            raise RuntimeError(f'Query plan check does not support {connection.dialect.name}')
+        if connection.dialect.name == 'postgresql':
+            connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        for name, statement, params in hot_queries():
+            lines, scanned = explain(connection, statement, params)
+            results.append((name, lines, scanned))
+        connection.rollback()
+    return results
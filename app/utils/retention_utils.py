@@ -0,0 +1,200 @@
+import gzip
+import io
+import json
+import mimetypes
+from collections import namedtuple
+from datetime import date, datetime
+from flask import current_app
+from app import db
+from app.models import LostReport, FoundReport, MatchCandidate, NameToken, CLOSED_STATUSES
+from app.utils.file_utils import variant_filename
+from app.utils.storage import get_archive_storage, get_storage
+
+# Archive storage prefixes for report partitions and cold-stored photos
+REPORT_ARCHIVE_PREFIX = 'reports'
+PHOTO_ARCHIVE_PREFIX = 'photos'
+
+_OTHER = {LostReport: FoundReport, FoundReport: LostReport}
+_KIND = {LostReport: 'lost', FoundReport: 'found'}
+
+RetentionBatch = namedtuple('RetentionBatch', 'lost found photos')
+
+
+def _expired(model, cutoff):
+    """Closed before cutoff, and so is the counterpart of a matched report.
+
+    Pairs are archived together, so a matched report waits for the other
+    side to expire too and an archived pair keeps its matched_with link.
+    """
+    other = db.aliased(_OTHER[model])
+    return db.and_(
+        model.status.in_(CLOSED_STATUSES),
+        model.closed_at < cutoff,
+        db.or_(model.matched_with.is_(None), db.exists().where(
+            other.id == model.matched_with,
+            other.status.in_(CLOSED_STATUSES),
+            other.closed_at < cutoff)))
+
+
+def expired_ids_query(model, cutoff, last_id, batch_size):
+    """Next batch of expired report ids after last_id, in id order"""
+    return db.select(model.id).where(model.id > last_id, _expired(model, cutoff)) \
+        .order_by(model.id).limit(batch_size)
+
+
+def _record(row):
+    return {column: value.isoformat() if isinstance(value, (date, datetime)) else value
+            for column, value in row._mapping.items()}
+
+
+def _write_partitions(archive, model, rows):
+    """Store rows as gzipped JSONL, one object per month closed; returns the keys written"""
+    partitions = {}
+    for row in rows:
+        partitions.setdefault(f'{row.closed_at:%Y-%m}', []).append(row)
+    keys = []
+    for month, partition in sorted(partitions.items()):
+        key = f'{REPORT_ARCHIVE_PREFIX}/{model.__tablename__}/{month}/{partition[0].id}-{partition[-1].id}.jsonl.gz'
+        body = ''.join(json.dumps(_record(row), ensure_ascii=False) + '\n' for row in partition)
+        archive.put(key, io.BytesIO(gzip.compress(body.encode('utf-8'))), 'application/gzip')
+        keys.append(key)
+    return keys
+
+
+def _unreferenced(photo_paths):
+    """The photo paths no remaining report points at (stored photos are shared)"""
+    if not photo_paths:
+        return set()
+    referenced = set(db.session.scalars(db.union(*[
+        db.select(model.photo_path).where(model.photo_path.in_(list(photo_paths)))
+        for model in (LostReport, FoundReport)])))
+    return set(photo_paths) - referenced
+
+
+def _retire_photo(storage, archive, photo_path, mode, storage_class):
+    """Delete or cold-store a photo with all its thumbnail sizes"""
+    for size in [None] + sorted(current_app.config['IMAGE_THUMBNAIL_SIZES']):
+        key = variant_filename(photo_path, size)
+        if mode == 'archive':
+            # Legacy uploads may lack some sizes
+            if not storage.exists(key):
+                continue
+            archive.put(f'{PHOTO_ARCHIVE_PREFIX}/{key}', io.BytesIO(storage.get(key)),
+                        mimetypes.guess_type(key)[0], storage_class=storage_class)
+        storage.delete(key)
+
+
+def unlink_query(model, ids):
+    """Clear matched_with on the reports of model that point at ids"""
+    return db.update(model).where(model.matched_with.in_(ids)).values(matched_with=None) \
+        .execution_options(synchronize_session=False)
+
+
+def _archive_batch(storage, archive, ids, config):
+    """Archive and delete reports {model: ids} in one transaction, then retire their photos"""
+    rows = {model: db.session.execute(db.select(model.__table__).where(model.id.in_(model_ids))
+                                      .order_by(model.id)).all()
+            for model, model_ids in ids.items()}
+    # Archive first: if anything below fails the rows are still in place, and
+    # a rerun only writes them again
+    for model, model_rows in rows.items():
+        _write_partitions(archive, model, model_rows)
+
+    for model, model_ids in ids.items():
+        if not model_ids:
+            continue
+        other = _OTHER[model]
+        db.session.execute(db.delete(NameToken).where(NameToken.report_kind == _KIND[model],
+                                                      NameToken.report_id.in_(model_ids)))
+        own_col = MatchCandidate.lost_id if model is LostReport else MatchCandidate.found_id
+        db.session.execute(db.delete(MatchCandidate).where(own_col.in_(model_ids)))
+        # Anything still pointing at these rows would break the foreign key
+        db.session.execute(unlink_query(other, model_ids))
+    for model, model_ids in ids.items():
+        db.session.execute(db.delete(model).where(model.id.in_(model_ids))
+                           .execution_options(synchronize_session=False))
+    db.session.commit()
+
+    # Files go only after the rows are gone, and only if no other report shares
+    # them. Each one is checked right before it goes rather than once for the
+    # batch, since a report stored meanwhile may have been given the same photo
+    retired = 0
+    for photo_path in sorted({row.photo_path for model_rows in rows.values()
+                              for row in model_rows if row.photo_path}):
+        if not _unreferenced({photo_path}):
+            continue
+        _retire_photo(storage, archive, photo_path, config['RETENTION_PHOTOS'], config['RETENTION_PHOTO_STORAGE_CLASS'])
+        retired += 1
+    return retired
+
+
+def apply_retention(cutoff, batch_size=None):
+    """Archive and delete expired closed reports in bounded batches.
+
+    Each batch is its own short transaction: its reports (and the other side
+    of matched pairs) are written to gzipped JSONL under REPORT_ARCHIVE_PREFIX
+    in the archive storage, removed with their name tokens and stored
+    candidates, and their photos deleted or moved there under
+    PHOTO_ARCHIVE_PREFIX per RETENTION_PHOTOS.
+    Yields a RetentionBatch of counts after each batch.
+    """
+    config = current_app.config
+    batch_size = batch_size or config['RETENTION_BATCH_SIZE']
+    storage, archive = get_storage(), get_archive_storage()
+    for model in (LostReport, FoundReport):
+        other = _OTHER[model]
+        last_id = 0
+        while True:
+            model_ids = db.session.scalars(expired_ids_query(model, cutoff, last_id, batch_size)).all()
+            if not model_ids:
+                break
+            other_ids = db.session.scalars(db.select(model.matched_with).where(
+                model.id.in_(model_ids), model.matched_with.isnot(None))).all()
+            photos = _archive_batch(storage, archive, {model: model_ids, other: other_ids}, config)
+            last_id = model_ids[-1]
+            counts = {_KIND[model]: len(model_ids), _KIND[other]: len(other_ids)}
+            yield RetentionBatch(counts['lost'], counts['found'], photos)
+
+
+def retention_report(cutoff):
+    """What apply_retention would do, without changing anything.
+
+    Returns {'lost': n, 'found': n, 'photos': n, 'oldest': date, 'newest': date}.
+    Photos counts the stored photos no report would point at afterwards.
+    """
+    report = {}
+    dates = []
+    for model in (LostReport, FoundReport):
+        count, oldest, newest = db.session.execute(db.select(
+            db.func.count(model.id), db.func.min(model.closed_at), db.func.max(model.closed_at)
+        ).where(_expired(model, cutoff))).one()
+        report[_KIND[model]] = count
+        dates += [value for value in (oldest, newest) if value]
+
+    expiring = db.union(*[db.select(model.photo_path).where(_expired(model, cutoff), model.photo_path.isnot(None))
+                          for model in (LostReport, FoundReport)]).subquery()
+    report['photos'] = db.session.scalar(db.select(db.func.count()).select_from(expiring).where(*[
+        expiring.c.photo_path.not_in(db.select(model.photo_path).where(
+            db.not_(_expired(model, cutoff)), model.photo_path.isnot(None)))
+        for model in (LostReport, FoundReport)]))
+    report['oldest'] = min(dates) if dates else None
+    report['newest'] = max(dates) if dates else None
+    return report
+
+
+def compact(vacuum=False):
+    """Refresh planner statistics after a purge, and reclaim space.
+
+    PostgreSQL gets VACUUM (ANALYZE) per report table, which doesn't block
+    reads or writes. SQLite gets ANALYZE; VACUUM rewrites the whole file
+    under an exclusive lock, so it only runs with vacuum=True.
+    """
+    tables = [model.__tablename__ for model in (LostReport, FoundReport, MatchCandidate, NameToken)]
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        if connection.dialect.name == 'postgresql':
+            for table in tables:
+                connection.exec_driver_sql(f'VACUUM (ANALYZE) {table}')
+            return
+        if vacuum:
+            connection.exec_driver_sql('VACUUM')
+        connection.exec_driver_sql('ANALYZE')
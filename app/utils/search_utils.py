@@ -0,0 +1,164 @@
+import re
+from flask import current_app
+from app import db
+from app.models import LostReport, FoundReport
+
+# Columns covered by full-text search, per report table
+SEARCH_COLUMNS = {
+    'lost_report': ('id_number', 'owner_name', 'reporter_name', 'description', 'location_lost'),
+    'found_report': ('id_number', 'owner_name', 'finder_name', 'description', 'location_found'),
+}
+
+_TERM_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def search_terms(text):
+    """Alphanumeric terms of a search string, lower-cased"""
+    return _TERM_RE.findall(text.lower())
+
+
+class LikeSearch:
+    """Fallback: case-insensitive substring match, newest first"""
+    name = 'like'
+
+    def filter(self, query, model, text):
+        columns = [getattr(model, column) for column in SEARCH_COLUMNS[model.__tablename__]]
+        return query.filter(db.or_(*[column.ilike(f'%{text}%') for column in columns]))
+
+    def order(self, query, model, text):
+        return query.order_by(model.date_reported.desc(), model.id.desc())
+
+
+class SqliteFtsSearch:
+    """FTS5 external-content tables kept in sync with the report tables by triggers"""
+    name = 'sqlite-fts5'
+
+    @staticmethod
+    def _fts(model):
+        return db.table(f'{model.__tablename__}_fts', db.column('rowid'), db.column('rank'))
+
+    @staticmethod
+    def _match_query(text):
+        # Every term must match, each as a prefix; quoting keeps FTS syntax inert
+        return ' '.join(f'"{term}"*' for term in search_terms(text)) or '""'
+
+    def filter(self, query, model, text):
+        fts = self._fts(model)
+        return query.join(fts, fts.c.rowid == model.id).filter(
+            db.literal_column(fts.name).op('MATCH')(self._match_query(text)))
+
+    def order(self, query, model, text):
+        return query.order_by(self._fts(model).c.rank)
+
+
+class PostgresSearch:
+    """tsvector expression over the searched columns, backed by a GIN index"""
+    name = 'postgres-tsvector'
+
+    @staticmethod
+    def _document(model):
+        # Must match the indexed expression in install_search_index exactly
+        return db.func.to_tsvector('simple', db.literal_column(_pg_document_sql(model.__tablename__)))
+
+    @staticmethod
+    def _tsquery(text):
+        terms = search_terms(text)
+        return db.func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms) or "''")
+
+    def filter(self, query, model, text):
+        return query.filter(self._document(model).op('@@')(self._tsquery(text)))
+
+    def order(self, query, model, text):
+        return query.order_by(db.func.ts_rank(self._document(model), self._tsquery(text)).desc(),
+                              model.id.desc())
+
+
+def _pg_document_sql(table):
+    return " || ' ' || ".join(f"coalesce({column}, '')" for column in SEARCH_COLUMNS[table])
+
+
+def _sqlite_search_ddl(table):
+    columns = SEARCH_COLUMNS[table]
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column_list}, content='{table}', content_rowid='id', tokenize='unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def _sqlite_has_fts5(connection):
+    return bool(connection.exec_driver_sql(
+        "SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+
+def install_search_index(connection, table, rebuild=False):
+    """Create the full-text index for one report table if the backend supports it.
+
+    Returns True when an index is in place afterwards. With rebuild=True the
+    index is repopulated from the table (needed after installing it on a
+    table that already has rows).
+    """
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        if not _sqlite_has_fts5(connection):
+            return False
+        for statement in _sqlite_search_ddl(table):
+            connection.exec_driver_sql(statement)
+        if rebuild:
+            connection.exec_driver_sql(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+        return True
+    if dialect == 'postgresql':
+        connection.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} "
+            f"USING GIN (to_tsvector('simple', {_pg_document_sql(table)}))")
+        return True
+    return False
+
+
+def _install_on_create(table, connection, **kw):
+    install_search_index(connection, table.name)
+
+
+for _model in (LostReport, FoundReport):
+    db.event.listen(_model.__table__, 'after_create', _install_on_create)
+
+
+_backends = {}
+
+
+def get_search_backend():
+    """Pick the best available backend for the current engine (cached per engine)"""
+    engine = db.engine
+    if engine not in _backends:
+        _backends[engine] = _detect_backend(engine)
+    return _backends[engine]
+
+
+def _detect_backend(engine):
+    if current_app.config.get('SEARCH_BACKEND') == 'like':
+        return LikeSearch()
+    with engine.connect() as connection:
+        if engine.dialect.name == 'sqlite':
+            installed = connection.exec_driver_sql(
+                "SELECT count(*) FROM sqlite_master WHERE name IN ('lost_report_fts', 'found_report_fts')"
+            ).scalar()
+            if installed == 2:
+                return SqliteFtsSearch()
+        elif engine.dialect.name == 'postgresql':
+            installed = connection.exec_driver_sql(
+                "SELECT count(*) FROM pg_indexes WHERE indexname IN "
+                "('ix_lost_report_search', 'ix_found_report_search')"
+            ).scalar()
+            if installed == 2:
+                return PostgresSearch()
+    return LikeSearch()
@@ -0,0 +1,213 @@
+import functools
+import os
+import shutil
+import tempfile
+import threading
+import time
+from flask import current_app
+from app.utils.metrics import FILE_IO_SECONDS, timed
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _timed(operation):
+    """Record a storage method's duration under the backend's name"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with timed(FILE_IO_SECONDS, self.name, operation):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class LocalStorage:
+    """Files under a directory on local disk; keys are relative paths"""
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = root
+
+    def local_path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f'Key escapes storage root: {key}')
+        return path
+
+    @_timed('put')
+    def put(self, key, fileobj, content_type=None, storage_class=None):
+        """Copy a file object to key in chunks; readers never see a partial file.
+
+        storage_class is S3-only.
+        """
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                shutil.copyfileobj(fileobj, out, CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @_timed('get')
+    def get(self, key):
+        with open(self.local_path(key), 'rb') as f:
+            return f.read()
+
+    def stream(self, key, chunk_size=CHUNK_SIZE):
+        with open(self.local_path(key), 'rb') as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    @_timed('exists')
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    @_timed('delete')
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    def presign(self, key, expires=None):
+        """Local files are served by the app itself"""
+        return None
+
+    def presign_upload(self, key, max_bytes, expires=None):
+        """Uploads to local disk always go through the app"""
+        return None
+
+
+class S3Storage:
+    """Objects in an S3-compatible bucket (AWS, MinIO, GCS interop, ...).
+
+    Uploads go through boto3's managed transfer, which streams large file
+    objects as multipart uploads instead of reading them into memory.
+    Presigned GET URLs are reused for half their lifetime so the same photo
+    keeps the same URL and browsers can cache it.
+    """
+    name = 's3'
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None,
+                 access_key=None, secret_key=None, presign_expires=3600,
+                 multipart_threshold=8 * 1024 * 1024):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+        except ImportError as e:
+            raise RuntimeError('STORAGE_BACKEND=s3 requires boto3 (pip install boto3)') from e
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.presign_expires = presign_expires
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region,
+                                   aws_access_key_id=access_key, aws_secret_access_key=secret_key)
+        self.transfer_config = TransferConfig(multipart_threshold=multipart_threshold,
+                                              multipart_chunksize=multipart_threshold)
+        self._presigned = {}
+        self._presigned_lock = threading.Lock()
+
+    def _key(self, key):
+        return self.prefix + key
+
+    @_timed('put')
+    def put(self, key, fileobj, content_type=None, storage_class=None):
+        """Upload a file object to key, in storage_class (e.g. GLACIER_IR) if given"""
+        extra = {'ContentType': content_type} if content_type else {}
+        if storage_class:
+            extra['StorageClass'] = storage_class
+        self.client.upload_fileobj(fileobj, self.bucket, self._key(key),
+                                   ExtraArgs=extra, Config=self.transfer_config)
+
+    @_timed('get')
+    def get(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body'].read()
+
+    def stream(self, key, chunk_size=CHUNK_SIZE):
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body']
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    @_timed('exists')
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    @_timed('delete')
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    @_timed('presign')
+    def presign(self, key, expires=None):
+        expires = expires or self.presign_expires
+        now = time.time()
+        with self._presigned_lock:
+            cached = self._presigned.get(key)
+            if cached and cached[1] - now > expires / 2:
+                return cached[0]
+        url = self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self._key(key)}, ExpiresIn=expires)
+        with self._presigned_lock:
+            if len(self._presigned) > 10000:
+                self._presigned.clear()
+            self._presigned[key] = (url, now + expires)
+        return url
+
+    @_timed('presign')
+    def presign_upload(self, key, max_bytes, expires=None):
+        """Signed form that lets a browser upload one image to key directly.
+
+        A POST policy rather than a presigned PUT, because only a policy can
+        cap the size and require an image content type.
+        """
+        return self.client.generate_presigned_post(
+            self.bucket, self._key(key),
+            Conditions=[['content-length-range', 1, max_bytes], ['starts-with', '$Content-Type', 'image/']],
+            ExpiresIn=expires or self.presign_expires)
+
+
+def _s3_storage(config, bucket, prefix):
+    return S3Storage(bucket, prefix=prefix,
+                     endpoint_url=config['S3_ENDPOINT_URL'], region=config['S3_REGION'],
+                     access_key=config['S3_ACCESS_KEY_ID'], secret_key=config['S3_SECRET_ACCESS_KEY'],
+                     presign_expires=config['S3_PRESIGN_EXPIRES'])
+
+
+def create_storage(config):
+    if config['STORAGE_BACKEND'] == 's3':
+        return _s3_storage(config, config['S3_BUCKET'], config['S3_PREFIX'])
+    return LocalStorage(config['UPLOAD_FOLDER'])
+
+
+def create_archive_storage(config):
+    """Where retention writes archived reports and photos; never served"""
+    if config['STORAGE_BACKEND'] == 's3':
+        return _s3_storage(config, config['ARCHIVE_BUCKET'] or config['S3_BUCKET'], config['ARCHIVE_S3_PREFIX'])
+    return LocalStorage(config['ARCHIVE_FOLDER'])
+
+
+def get_storage():
+    """Storage backend of the current app, created on first use"""
+    extensions = current_app.extensions
+    if 'storage' not in extensions:
+        extensions['storage'] = create_storage(current_app.config)
+    return extensions['storage']
+
+
+def get_archive_storage():
+    """Archive storage of the current app, created on first use"""
+    extensions = current_app.extensions
+    if 'archive_storage' not in extensions:
+        extensions['archive_storage'] = create_archive_storage(current_app.config)
+    return extensions['archive_storage']
@@ -0,0 +1,81 @@
+"""Clearing a verification backlog one report at a time vs with a bulk action.
+
+    python -m benchmarks.bench_bulk_actions --reports 20000 --backlog 500
+
+Seeds a throwaway SQLite file, logs in through the test client and
+verifies --backlog lost reports three ways: one POST to /admin/verify-lost
+per report (the old flow, without the GET that renders each page first),
+one dashboard form POST to /admin/bulk, and one JSON request to
+/admin/api/bulk. Each way gets its own reports. A last bulk request
+replays stale statuses to show that they come back as conflicts.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reports', type=int, default=20000)
+    parser.add_argument('--backlog', type=int, default=500)
+    args = parser.parse_args()
+
+    os.environ.update({
+        'DATABASE_URL': 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='lostid-bench-'), 'bench.db'),
+        'MAIL_OUTBOX_SENDER': 'false',
+    })
+    from app import create_app, db
+    from app.models import Admin, LostReport
+    from benchmarks.seed import seed_reports
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        seed_reports(args.reports // 2, args.reports - args.reports // 2)
+        admin = Admin(username='bench', email='bench@example.com')
+        admin.set_password('bench')
+        db.session.add(admin)
+        db.session.commit()
+        backlog = [report_id for (report_id,) in db.session.query(LostReport.id).filter(
+            LostReport.status == 'reported').order_by(LostReport.id).limit(args.backlog * 3)]
+    if len(backlog) < args.backlog * 3:
+        parser.error('not enough reported lost reports; raise --reports')
+    one_by_one, form, api = (backlog[i * args.backlog:(i + 1) * args.backlog] for i in range(3))
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+
+    started = time.perf_counter()
+    for report_id in one_by_one:
+        client.post(f'/admin/verify-lost/{report_id}', data={'action': 'verify'})
+    _print('one at a time', len(one_by_one), time.perf_counter() - started)
+
+    started = time.perf_counter()
+    client.post('/admin/bulk', data={'action': 'verify',
+                                     'report': [f'lost:{report_id}:reported' for report_id in form]})
+    _print('dashboard bulk form', 1, time.perf_counter() - started)
+
+    payload = {'action': 'verify', 'kind': 'lost',
+               'reports': [{'id': report_id, 'status': 'reported'} for report_id in api]}
+    started = time.perf_counter()
+    result = client.post('/admin/api/bulk', json=payload).json
+    _print('JSON bulk API', 1, time.perf_counter() - started)
+
+    stale = client.post('/admin/api/bulk', json=payload).json
+    print(f'replayed with stale statuses: {len(stale["updated"])} updated, {len(stale["conflicts"])} conflicts')
+
+    with app.app_context():
+        verified = db.session.query(LostReport).filter(
+            LostReport.id.in_(backlog), LostReport.status == 'verified').count()
+    if verified != len(backlog) or len(result['updated']) != len(api):
+        print(f'❌ {verified} of {len(backlog)} reports verified')
+
+
+def _print(label, requests, seconds):
+    print(f'{label:20}: {requests:4} request(s), {seconds * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
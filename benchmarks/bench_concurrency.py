@@ -0,0 +1,133 @@
+"""Parallel report submissions against several gunicorn workers.
+
+    python -m benchmarks.bench_concurrency --workers 4 --threads 16 \\
+        --submissions 400 --journal-mode DELETE WAL
+
+For each SQLite journal mode, a local gunicorn is started on a fresh SQLite
+file, or on --database-url for PostgreSQL, where the journal mode is ignored.
+--threads clients then post report_lost forms at the same time, like a
+burst of form submits, while --readers threads load the admin dashboard.
+Prints throughput, p50/p99 latency and failed requests; "database is
+locked" shows up as 500s. Also checks that every accepted submission was
+stored.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+
+def _run(args, journal_mode):
+    import requests as http
+    from sqlalchemy import create_engine, func, insert, select
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from app.models import Admin, LostReport
+    from benchmarks.load_test import ADMIN, _start_gunicorn
+    from benchmarks.seed import _id_number, _person
+
+    workdir = tempfile.mkdtemp(prefix='lostid-concurrency-')
+    env = dict(os.environ,
+               DATABASE_URL=args.database_url or 'sqlite:///' + os.path.join(workdir, 'bench.db'),
+               BENCH_UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+               MAIL_OUTBOX_SENDER='false',
+               SQLITE_JOURNAL_MODE=journal_mode)
+    # Set up with a plain engine: the app's Config reads DATABASE_URL once per process
+    engine = create_engine(env['DATABASE_URL'])
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        if connection.scalar(select(func.count()).select_from(Admin).where(
+                Admin.username == ADMIN['username'])) == 0:
+            connection.execute(insert(Admin), {'username': ADMIN['username'], 'email': 'bench@example.com',
+                                               'password_hash': generate_password_hash(ADMIN['password'])})
+        before = connection.scalar(select(func.count()).select_from(LostReport))
+
+    process, base_url = _start_gunicorn(args.workers, env)
+    samples, reads, failures, accepted = [], [], [], [0]
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def submit(index):
+        rng = random.Random(index)
+        session = http.Session()
+        for _ in range(index, args.submissions, args.threads):
+            form = {'reporter_name': _person(rng), 'reporter_email': 'bench@example.com',
+                    'id_number': _id_number(rng), 'id_type': 'Student ID',
+                    'owner_name': _person(rng), 'location_lost': 'Library'}
+            started = time.perf_counter()
+            response = session.post(f'{base_url}/report-lost', data=form, allow_redirects=False)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                samples.append(elapsed)
+                if response.status_code == 302:
+                    accepted[0] += 1
+                else:
+                    failures.append(response.status_code)
+
+    def read():
+        session = http.Session()
+        session.post(f'{base_url}/login', data=ADMIN)
+        while not done.is_set():
+            started = time.perf_counter()
+            response = session.get(f'{base_url}/admin/dashboard', allow_redirects=False)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                reads.append(elapsed)
+                if response.status_code != 200:
+                    failures.append(response.status_code)
+
+    readers = [threading.Thread(target=read) for _ in range(args.readers)]
+    writers = [threading.Thread(target=submit, args=(index,)) for index in range(args.threads)]
+    try:
+        for thread in readers:
+            thread.start()
+        started = time.perf_counter()
+        for thread in writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        for thread in readers:
+            thread.join()
+    finally:
+        process.terminate()
+        process.wait()
+
+    with engine.connect() as connection:
+        stored = connection.scalar(select(func.count()).select_from(LostReport)) - before
+    engine.dispose()
+    print(f'{journal_mode or "default":8} submits {len(samples) / elapsed:6.1f}/s {_percentiles(samples)}  '
+          f'failed {len(failures)}  accepted {accepted[0]}  stored {stored}')
+    if reads:
+        print(f'{"":8} dashboard reads {len(reads)}: {_percentiles(reads)}')
+    if stored != accepted[0]:
+        print(f'❌ {accepted[0] - stored} accepted submissions were not stored')
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return (f'p50 {statistics.median(samples):7.1f} ms  '
+            f'p99 {samples[max(int(len(samples) * 0.99) - 1, 0)]:7.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=16, help='concurrent submitting clients')
+    parser.add_argument('--readers', type=int, default=2, help='clients loading the dashboard meanwhile')
+    parser.add_argument('--submissions', type=int, default=400)
+    parser.add_argument('--journal-mode', nargs='+', default=['WAL'],
+                        help='SQLite journal modes to compare, e.g. DELETE WAL')
+    parser.add_argument('--database-url', help='default: a fresh temporary SQLite file per run')
+    args = parser.parse_args()
+
+    for journal_mode in args.journal_mode:
+        _run(args, journal_mode)
+
+
+if __name__ == '__main__':
+    main()
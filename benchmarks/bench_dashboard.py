@@ -0,0 +1,95 @@
+"""Admin dashboard latency as the report tables grow.
+
+    python -m benchmarks.bench_dashboard --sizes 10000 100000 1000000
+
+For each size the database is topped up to that many reports and the
+dashboard is requested through the Flask test client: the first page, a
+status filter, and a page ten cursors deep. The keyset page query and the
+status/type aggregate are also timed on their own: the page query should
+stay flat, while the aggregate is an index-only scan that grows linearly.
+Caching is off so every request runs the queries; run with
+CACHE_BACKEND=memory to time cached reloads instead.
+"""
+import argparse
+import os
+import re
+import statistics
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(prefix='lostid-bench-'), 'bench.db')
+    os.environ['MAIL_OUTBOX_SENDER'] = 'false'
+    os.environ.setdefault('CACHE_BACKEND', 'none')
+
+    from app import create_app, db
+    from app.models import Admin, LostReport, FoundReport
+    from app.routes.admin_routes import _report_counts
+    from app.utils.pagination import keyset_page
+    from benchmarks.seed import seed_reports
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        admin = Admin(username='bench', email='bench@example.com')
+        admin.set_password('bench')
+        db.session.add(admin)
+        db.session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+
+    seeded = 0
+    for size in sorted(args.sizes):
+        with app.app_context():
+            missing = size - seeded
+            seed_reports(missing // 2, missing - missing // 2, seed=size)
+            seeded = size
+            db.session.execute(db.text('ANALYZE'))
+
+        cursor = None
+        for _ in range(10):
+            page = client.get('/admin/dashboard', query_string={'lost_after': cursor} if cursor else {})
+            cursor = re.search(rb'lost_after=([^&"]+)', page.data).group(1).decode()
+
+        print(f'{size} reports')
+        for label, query in (('first page', {}),
+                             ('status filter', {'status': 'verified'}),
+                             ('10 pages deep', {'lost_after': cursor})):
+            samples = []
+            for _ in range(args.requests):
+                started = time.perf_counter()
+                response = client.get('/admin/dashboard', query_string=query)
+                samples.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200
+            _print(label, samples, f'{len(response.data) / 1024:.0f} KiB')
+
+        with app.app_context():
+            for label, call in (
+                    ('page query', lambda: keyset_page(LostReport.query, LostReport, cursor, 50)),
+                    ('counts query', lambda: _report_counts(LostReport.query, FoundReport.query))):
+                samples = []
+                for _ in range(args.requests):
+                    started = time.perf_counter()
+                    call()
+                    samples.append((time.perf_counter() - started) * 1000)
+                    db.session.expunge_all()
+                _print(label, samples)
+
+
+def _print(label, samples, extra=''):
+    samples.sort()
+    print(f'  {label:14} p50 {statistics.median(samples):7.2f} ms  '
+          f'p99 {samples[int(len(samples) * 0.99) - 1]:7.2f} ms  {extra}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Notification rendering, digest coalescing and rate-limited sending.
+
+    pip install aiosmtpd
+    python -m benchmarks.bench_notifications --events 2000 --recipients 500 --rate-limit 600
+
+Queues --events match notifications spread over --recipients addresses and
+reports:
+
+- render throughput with the app's cached templates, against compiling the
+  template source on every render;
+- how many emails the digests produce, against one email per event;
+- delivery rate to a local SMTP sink, unlimited and with
+  MAIL_RATE_LIMIT_PER_MINUTE set to --rate-limit (the first --limited events).
+"""
+import argparse
+import os
+import random
+import socket
+import tempfile
+import time
+
+
+def _events(rng, count, recipients):
+    from benchmarks.seed import _id_number
+    for _ in range(count):
+        to_email = f'user{rng.randrange(recipients)}@example.com'
+        if rng.random() < 0.5:
+            yield to_email, 'match_owner', {'id_type': 'Student ID', 'id_number': _id_number(rng),
+                                            'found_location': 'Library, Campus 3'}
+        else:
+            yield to_email, 'match_finder', {'id_type': 'Aadhar Card'}
+
+
+def _render_rate(render, events):
+    started = time.perf_counter()
+    for _, template, context in events:
+        render(template, context)
+    return len(events) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--recipients', type=int, default=500)
+    parser.add_argument('--rate-limit', type=int, default=600, help='emails per minute for the limited run')
+    parser.add_argument('--limited', type=int, default=20, help='events queued for the limited run')
+    args = parser.parse_args()
+
+    from aiosmtpd.controller import Controller
+    from benchmarks.bench_outbox import _SinkHandler
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    handler = _SinkHandler(None, 0)
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+
+    os.environ.update({
+        'DATABASE_URL': 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='lostid-bench-'), 'bench.db'),
+        'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': str(port), 'MAIL_USE_TLS': 'false',
+        'MAIL_OUTBOX_SENDER': 'false',
+    })
+    from flask import current_app
+    from app import create_app, db
+    from app.utils.email_utils import SMTPSender, drain_outbox
+    from app.utils.notification_utils import coalesce_notifications, notify, render_email
+
+    app = create_app()
+    app.config['MAIL_USERNAME'] = 'noreply@example.com'
+    events = list(_events(random.Random(7), args.events, args.recipients))
+    with app.app_context():
+        db.create_all()
+
+        cached = _render_rate(lambda template, context: render_email('Owner', [(template, context)]), events)
+        env = current_app.jinja_env
+        sources = {name: env.loader.get_source(env, f'email/{name}.html')[0]
+                   for name in ('match_owner', 'match_finder', 'notification')}
+
+        def compiled_each_time(template, context):
+            body = env.from_string(sources[template]).make_module(context)
+            env.from_string(sources['notification']).render(
+                name='Owner', items=[{'subject': body.subject, 'body': str(body)}], sender='bench')
+
+        uncached = _render_rate(compiled_each_time, events)
+        print(f'render: {cached:,.0f} emails/s with cached templates, '
+              f'{uncached:,.0f}/s compiling each time ({cached / uncached:.0f}x)')
+
+        for to_email, template, context in events:
+            notify(to_email, to_email.split('@')[0], template, **context)
+        db.session.commit()
+        started = time.perf_counter()
+        emails = 0
+        while True:
+            queued = coalesce_notifications(flush=True)
+            if not queued:
+                break
+            emails += queued
+        coalesce_seconds = time.perf_counter() - started
+        print(f'digests: {args.events} events -> {emails} emails '
+              f'({args.events / emails:.1f} events per email) in {coalesce_seconds:.2f}s')
+
+        sender = SMTPSender(app.config)
+        started = time.perf_counter()
+        sent, failed = drain_outbox(sender)
+        elapsed = time.perf_counter() - started
+        sender.close()
+        print(f'unlimited: {sent} sent, {failed} failed in {elapsed:.2f}s ({sent / elapsed:,.0f} msg/s)')
+
+        for to_email, template, context in events[:args.limited]:
+            notify(to_email, 'Owner', template, **context)
+        db.session.commit()
+        while coalesce_notifications(flush=True):
+            pass
+        app.config['MAIL_RATE_LIMIT_PER_MINUTE'] = args.rate_limit
+        sender = SMTPSender(app.config)
+        started = time.perf_counter()
+        sent, _ = drain_outbox(sender)
+        elapsed = time.perf_counter() - started
+        sender.close()
+        print(f'limited to {args.rate_limit}/min: {sent} sent in {elapsed:.2f}s '
+              f'({sent / elapsed * 60:,.0f}/min)')
+
+    controller.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Outbox delivery throughput against a local SMTP sink.
+
+    pip install aiosmtpd
+    python -m benchmarks.bench_outbox --messages 1000
+
+Queues N messages and drains them through one pooled SMTPSender, then sends
+the same messages opening a connection per message (the old behaviour) for
+comparison. --handshake-ms delays each EHLO to stand in for the STARTTLS and
+AUTH round trips of a remote server, which a local sink does not have.
+A fraction of recipients can be refused to exercise the retry path.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import tempfile
+import time
+
+
+class _SinkHandler:
+    def __init__(self, refuse_prefix, handshake_ms):
+        self.received = 0
+        self.refuse_prefix = refuse_prefix
+        self.handshake_ms = handshake_ms
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.handshake_ms / 1000)
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if self.refuse_prefix and address.startswith(self.refuse_prefix):
+            return '550 mailbox unavailable'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 Message accepted for delivery'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--refuse-every', type=int, default=0,
+                        help='refuse every Nth recipient (0 = accept all)')
+    parser.add_argument('--handshake-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    from aiosmtpd.controller import Controller
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    handler = _SinkHandler('refused' if args.refuse_every else None, args.handshake_ms)
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+
+    os.environ.update({
+        'DATABASE_URL': 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='lostid-bench-'), 'bench.db'),
+        'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': str(port), 'MAIL_USE_TLS': 'false',
+        'MAIL_OUTBOX_SENDER': 'false',
+    })
+    from app import create_app, db
+    from app.models import EmailOutbox
+    from app.utils.email_utils import SMTPSender, drain_outbox, outbox_status, send_email_notification
+
+    app = create_app()
+    app.config['MAIL_USERNAME'] = 'noreply@example.com'
+    with app.app_context():
+        db.create_all()
+        for i in range(args.messages):
+            refused = args.refuse_every and i % args.refuse_every == 0
+            to_email = f'{"refused" if refused else "owner"}{i}@example.com'
+            send_email_notification(to_email, f'Owner {i}', 'Your ID was found', f'<p>Message {i}</p>')
+        db.session.commit()
+
+        sender = SMTPSender(app.config)
+        started = time.perf_counter()
+        sent, failed = drain_outbox(sender)
+        pooled = time.perf_counter() - started
+        sender.close()
+        print(f'pooled: {sent} sent, {failed} failed in {pooled:.2f}s '
+              f'({sent / pooled:.0f} msg/s, {sender.connections_opened} connection(s))')
+        print(f'outbox: {outbox_status()}')
+
+        entries = EmailOutbox.query.filter_by(status='sent').all()
+        started = time.perf_counter()
+        for entry in entries:
+            one_shot = SMTPSender(app.config)
+            one_shot.send(entry)
+            one_shot.close()
+        per_message = time.perf_counter() - started
+        print(f'connection per message: {len(entries)} sent in {per_message:.2f}s '
+              f'({len(entries) / per_message:.0f} msg/s)')
+
+    controller.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Multi-index-hash photo lookup versus a linear scan.
+
+    python -m benchmarks.bench_phash --hashes 100000 300000 --radius 6 10
+
+Indexes random 64-bit hashes (a tenth of them near-duplicates of another
+entry, as re-photographed cards would be) and times radius searches for
+perturbed copies of indexed hashes against a brute-force scan.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.utils.phash_utils import MultiIndexHash, hamming
+
+
+def _perturb(rng, value, bits):
+    for bit in rng.sample(range(64), bits):
+        value ^= 1 << bit
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hashes', type=int, nargs='+', default=[100_000, 300_000])
+    parser.add_argument('--radius', type=int, nargs='+', default=[6, 10])
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    for size in args.hashes:
+        rng = random.Random(size)
+        hashes = []
+        for _ in range(size):
+            if hashes and rng.random() < 0.1:
+                hashes.append(_perturb(rng, rng.choice(hashes), rng.randint(1, 4)))
+            else:
+                hashes.append(rng.getrandbits(64))
+
+        index = MultiIndexHash()
+        started = time.perf_counter()
+        for report_id, value in enumerate(hashes):
+            index.add(value, report_id)
+        print(f'{size} hashes: built index in {time.perf_counter() - started:.2f}s')
+
+        queries = [_perturb(rng, rng.choice(hashes), rng.randint(0, 5)) for _ in range(args.queries)]
+        for radius in args.radius:
+            index_ms = []
+            for query in queries:
+                started = time.perf_counter()
+                found = index.search(query, radius)
+                index_ms.append((time.perf_counter() - started) * 1000)
+                assert found, 'perturbed copy of an indexed hash must be found'
+
+            scan_ms = []
+            for query in queries[:20]:
+                started = time.perf_counter()
+                expected = sorted(i for i, value in enumerate(hashes) if hamming(query, value) <= radius)
+                scan_ms.append((time.perf_counter() - started) * 1000)
+                assert sorted(item for _, item in index.search(query, radius)) == expected
+
+            print(f'  radius {radius:2}: index p50 {statistics.median(index_ms):7.3f} ms, '
+                  f'linear scan p50 {statistics.median(scan_ms):7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
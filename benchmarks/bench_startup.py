@@ -0,0 +1,116 @@
+"""App startup cost: import-time profile, cold start and per-worker memory.
+
+    python -m benchmarks.bench_startup --runs 5 --workers 4
+
+1. Import profile: `python -X importtime` of create_app(), with self time
+   summed per top-level package (top --top shown).
+2. Cold start: wall time of a fresh interpreter running create_app(), and of
+   a `flask` CLI command, median of --runs.
+3. Memory: a local gunicorn with --workers workers, started without and
+   with --preload (building the app with create_app(preload=True)). After
+   warm-up it prints each worker's RSS and PSS, and the total PSS of
+   master plus workers. PSS splits shared pages between
+   the processes that share them, so copy-on-write sharing shows up there.
+"""
+import argparse
+import collections
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.load_test import REPO_ROOT
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+_FACTORY = 'from app import create_app; create_app()'
+
+
+def _env():
+    workdir = tempfile.mkdtemp(prefix='lostid-startup-')
+    return dict(os.environ, PYTHONPATH=REPO_ROOT,
+                DATABASE_URL='sqlite:///' + os.path.join(workdir, 'bench.db'),
+                BENCH_UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+                MAIL_OUTBOX_SENDER='false')
+
+
+def import_profile(env, top):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _FACTORY],
+                            cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+    self_us = collections.Counter()
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            self_time, cumulative, indent, module = match.groups()
+            self_us[module.split('.')[0]] += int(self_time)
+            if len(indent) == 1:  # top-level import
+                total_us += int(cumulative)
+    print(f'imports: {total_us / 1000:.0f} ms total; by package (self time):')
+    for package, micros in self_us.most_common(top):
+        print(f'  {package:24} {micros / 1000:7.1f} ms')
+
+
+def cold_start(env, runs):
+    for label, command in (('create_app()', [sys.executable, '-c', _FACTORY]),
+                           ('flask CLI', [sys.executable, '-m', 'flask', '--app', 'run.py', 'plans', '--help'])):
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run(command, cwd=REPO_ROOT, env=env, capture_output=True, check=True)
+            samples.append((time.perf_counter() - started) * 1000)
+        print(f'cold start, {label:13}: median {statistics.median(samples):6.0f} ms over {runs} runs')
+
+
+def _memory_kb(pid):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            field, _, rest = line.partition(':')
+            if field in ('Rss', 'Pss'):
+                values[field] = int(rest.split()[0])
+    return values['Rss'], values['Pss']
+
+
+def _children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def worker_memory(env, workers, preload):
+    from benchmarks.load_test import _start_gunicorn
+    if preload:
+        process, _ = _start_gunicorn(workers, env, ['--preload'], 'benchmarks.load_test:bench_app(preload=True)')
+    else:
+        process, _ = _start_gunicorn(workers, env)
+    try:
+        time.sleep(1)
+        pids = _children(process.pid)
+        rss, pss = zip(*(_memory_kb(pid) for pid in pids))
+        total = _memory_kb(process.pid)[1] + sum(pss)
+        print(f"{'--preload' if preload else 'no preload':10}: {len(pids)} workers, "
+              f'RSS {statistics.mean(rss) / 1024:5.1f} MB and PSS {statistics.mean(pss) / 1024:5.1f} MB each, '
+              f'total PSS {total / 1024:6.1f} MB')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--top', type=int, default=12, help='packages shown in the import profile')
+    args = parser.parse_args()
+
+    env = _env()
+    import_profile(env, args.top)
+    cold_start(env, args.runs)
+    for preload in (False, True):
+        worker_memory(env, args.workers, preload)
+
+
+if __name__ == '__main__':
+    main()
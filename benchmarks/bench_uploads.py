@@ -0,0 +1,160 @@
+"""Report submissions while slow clients are uploading photos.
+
+    python -m benchmarks.bench_uploads --workers 2 --slow-clients 4 \\
+        --upload-kbps 8 --worker-class sync gthread
+
+For each gunicorn worker class, a local gunicorn is started on a fresh
+SQLite file. --slow-clients clients send report_found forms with a photo at
+--upload-kbps, like phones on a poor mobile link, and --clients fast
+clients keep submitting photo reports until the slow uploads finish.
+Prints p50/p99 latency of the fast submissions, how long their photos
+waited for the background worker, and whether every photo was attached.
+
+With sync workers each slow upload holds a whole worker until its last
+byte arrives; gthread workers (--threads per worker) read slow bodies in a
+thread, so the other submissions keep going.
+"""
+import argparse
+import os
+import random
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def _form(rng, photo):
+    from benchmarks.seed import _id_number, _person
+    return ({'finder_name': _person(rng), 'finder_email': 'bench@example.com',
+             'id_number': _id_number(rng), 'id_type': 'Student ID',
+             'owner_name': _person(rng), 'location_found': 'Library'},
+            {'photo': ('card.jpg', photo, 'image/jpeg')})
+
+
+def _slow_post(base_url, data, files, bytes_per_second, chunk_size=1024):
+    """POST a multipart form over a raw socket, trickling the body out"""
+    import requests as http
+    prepared = http.Request('POST', f'{base_url}/report-found', data=data, files=files).prepare()
+    url = urlsplit(base_url)
+    head = (f'POST /report-found HTTP/1.1\r\nHost: {url.netloc}\r\n'
+            f"Content-Type: {prepared.headers['Content-Type']}\r\n"
+            f'Content-Length: {len(prepared.body)}\r\nConnection: close\r\n\r\n')
+    with socket.create_connection((url.hostname, url.port), timeout=300) as sock:
+        sock.sendall(head.encode())
+        for offset in range(0, len(prepared.body), chunk_size):
+            sock.sendall(prepared.body[offset:offset + chunk_size])
+            time.sleep(chunk_size / bytes_per_second)
+        return int(sock.recv(64).split()[1])
+
+
+def _run(args, worker_class):
+    import requests as http
+    from sqlalchemy import create_engine, func, select
+    from app import db
+    from app.models import FoundReport
+    from benchmarks.load_test import _photos, _start_gunicorn
+
+    workdir = tempfile.mkdtemp(prefix='lostid-uploads-')
+    env = dict(os.environ,
+               DATABASE_URL='sqlite:///' + os.path.join(workdir, 'bench.db'),
+               BENCH_UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+               MAIL_OUTBOX_SENDER='false')
+    engine = create_engine(env['DATABASE_URL'])
+    db.metadata.create_all(engine)
+
+    extra = ['-k', worker_class] + (['--threads', str(args.threads)] if worker_class == 'gthread' else [])
+    process, base_url = _start_gunicorn(args.workers, env, extra)
+    photos = _photos()
+    samples, failures, slow_seconds = [], [], []
+    lock = threading.Lock()
+    slow_done = threading.Event()
+
+    def slow(index):
+        rng = random.Random(1000 + index)
+        data, files = _form(rng, photos[index % len(photos)])
+        started = time.perf_counter()
+        status = _slow_post(base_url, data, files, args.upload_kbps * 1024)
+        with lock:
+            slow_seconds.append(time.perf_counter() - started)
+            if status != 302:
+                failures.append(status)
+
+    def fast(index):
+        rng = random.Random(index)
+        session = http.Session()
+        while not slow_done.is_set():
+            data, files = _form(rng, photos[rng.randrange(len(photos))])
+            started = time.perf_counter()
+            try:
+                status = session.post(f'{base_url}/report-found', data=data, files=files,
+                                      allow_redirects=False, timeout=args.timeout).status_code
+            except http.exceptions.Timeout:
+                status = 'timeout'
+            with lock:
+                samples.append((time.perf_counter() - started) * 1000)
+                if status != 302:
+                    failures.append(status)
+
+    slow_threads = [threading.Thread(target=slow, args=(index,)) for index in range(args.slow_clients)]
+    fast_threads = [threading.Thread(target=fast, args=(index,)) for index in range(args.clients)]
+    try:
+        for thread in slow_threads:
+            thread.start()
+        # Let every slow upload connect and take its worker (or thread) first
+        time.sleep(1)
+        for thread in fast_threads:
+            thread.start()
+        for thread in slow_threads:
+            thread.join()
+        slow_done.set()
+        for thread in fast_threads:
+            thread.join()
+
+        # Photos are finished in the background; give the workers time to drain
+        deadline = time.time() + 60
+        with engine.connect() as connection:
+            while time.time() < deadline and connection.scalar(
+                    select(func.count()).select_from(FoundReport).where(FoundReport.photo_upload.isnot(None))):
+                time.sleep(0.2)
+    finally:
+        process.terminate()
+        process.wait()
+
+    with engine.connect() as connection:
+        rows = connection.execute(select(FoundReport.date_reported, FoundReport.photo_attached_at)).all()
+    engine.dispose()
+    lags = [(attached - reported).total_seconds() * 1000 for reported, attached in rows if attached]
+    print(f'{worker_class:8} submits {len(samples):4}: {_percentiles(samples)}  failed {len(failures)}  '
+          f'slow uploads {statistics.median(slow_seconds):.1f}s each')
+    if lags:
+        print(f'{"":8} photo attached after {_percentiles(lags)}')
+    if len(lags) != len(rows):
+        print(f'❌ {len(rows) - len(lags)} of {len(rows)} reports have no photo attached')
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return (f'p50 {statistics.median(samples):7.1f} ms  '
+            f'p99 {samples[max(int(len(samples) * 0.99) - 1, 0)]:7.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gthread worker')
+    parser.add_argument('--worker-class', nargs='+', default=['sync', 'gthread'],
+                        help='gunicorn worker classes to compare')
+    parser.add_argument('--slow-clients', type=int, default=4, help='concurrent slow photo uploads')
+    parser.add_argument('--upload-kbps', type=float, default=8, help='upload speed of the slow clients, KiB/s')
+    parser.add_argument('--clients', type=int, default=4, help='fast clients submitting meanwhile')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds before a fast submit counts as failed')
+    args = parser.parse_args()
+
+    for worker_class in args.worker_class:
+        _run(args, worker_class)
+
+
+if __name__ == '__main__':
+    main()
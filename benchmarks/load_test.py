@@ -0,0 +1,351 @@
+"""Load test of the public and admin hot paths against a stored baseline.
+
+    python -m benchmarks.load_test --rows 100000 --mode client gunicorn \\
+        --output results.json --baseline benchmarks/baseline.json
+
+Seeds a database with --rows synthetic reports, split evenly between lost
+and found. It uses a temporary SQLite file, or --database-url, for example
+PostgreSQL; an already-seeded database is reused. Each scenario is driven
+--requests times:
+  - report_lost
+  - report_found with a photo upload
+  - the admin dashboard: plain, with a search, and with status/type filters
+  - verify_lost and verify_found
+Two drivers are available: the Flask test client, which is sequential and
+in-process, and a local gunicorn server hit by --concurrency client threads.
+
+The p50/p99 latency and throughput of every scenario are written to
+--output as JSON. When --baseline exists, each p50/p99 is compared with it,
+and the exit status is 1 if any regressed by more than --tolerance.
+--save-baseline stores this run as the new baseline instead.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ADMIN = {'username': 'bench', 'password': 'bench'}
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bench_app(preload=False):
+    """App factory for the gunicorn driver: same config as the test client run"""
+    from app import create_app
+    app = create_app(preload)
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['UPLOAD_FOLDER'] = os.environ['BENCH_UPLOAD_FOLDER']
+    return app
+
+
+def _photos(count=20, seed=7):
+    """JPEG 'card photos' of phone-camera size, distinct so each is really processed"""
+    from PIL import Image, ImageDraw
+    rng = random.Random(seed)
+    photos = []
+    for _ in range(count):
+        img = Image.new('RGB', (1600, 1000), tuple(rng.randint(150, 255) for _ in range(3)))
+        draw = ImageDraw.Draw(img)
+        for _ in range(12):
+            x, y = rng.randint(0, 1400), rng.randint(0, 850)
+            draw.rectangle((x, y, x + rng.randint(40, 400), y + rng.randint(20, 150)),
+                           fill=tuple(rng.randint(0, 255) for _ in range(3)))
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=90)
+        photos.append(buffer.getvalue())
+    return photos
+
+
+def _scenarios(n_lost, n_found, photos):
+    """name -> function(rng) returning (method, path, form, photo bytes or None)"""
+    from app.models import ID_TYPES
+    from benchmarks.seed import _id_number, _name, _person
+
+    def report_lost(rng):
+        return 'POST', '/report-lost', {
+            'reporter_name': _person(rng), 'reporter_email': 'bench@example.com',
+            'id_number': _id_number(rng), 'id_type': rng.choice(ID_TYPES),
+            'owner_name': _person(rng), 'location_lost': 'Library'}, None
+
+    def report_found(rng):
+        return 'POST', '/report-found', {
+            'finder_name': _person(rng), 'finder_email': 'bench@example.com',
+            'id_number': _id_number(rng), 'id_type': rng.choice(ID_TYPES),
+            'owner_name': _person(rng), 'location_found': 'Main Gate'}, rng.choice(photos)
+
+    return {
+        'report_lost': report_lost,
+        'report_found_photo': report_found,
+        'dashboard': lambda rng: ('GET', '/admin/dashboard', None, None),
+        'dashboard_search': lambda rng: ('GET', f'/admin/dashboard?search={_name(rng)}', None, None),
+        'dashboard_filters': lambda rng: (
+            'GET', f"/admin/dashboard?status=verified&type={rng.choice(ID_TYPES).replace(' ', '+')}", None, None),
+        'verify_lost': lambda rng: ('GET', f'/admin/verify-lost/{rng.randint(1, n_lost)}', None, None),
+        'verify_found': lambda rng: ('GET', f'/admin/verify-found/{rng.randint(1, n_found)}', None, None),
+    }
+
+
+def _summary(samples, elapsed, errors):
+    samples.sort()
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'p50_ms': round(statistics.median(samples), 3),
+        'p99_ms': round(samples[max(math.ceil(len(samples) * 0.99) - 1, 0)], 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'throughput_rps': round(len(samples) / elapsed, 1),
+    }
+
+
+def run_client(app, scenarios, requests, seed):
+    client = app.test_client()
+    client.post('/login', data=ADMIN)
+    if client.get('/admin/dashboard').status_code != 200:
+        raise RuntimeError('admin login failed')
+    results = {}
+    for name, make in scenarios.items():
+        rng = random.Random(seed)
+        samples, errors = [], 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            method, path, form, photo = make(rng)
+            data = dict(form or {})
+            if photo:
+                data['photo'] = (io.BytesIO(photo), 'card.jpg')
+            t0 = time.perf_counter()
+            response = client.open(path, method=method, data=data or None,
+                                   content_type='multipart/form-data' if photo else None)
+            samples.append((time.perf_counter() - t0) * 1000)
+            errors += response.status_code >= 400
+        results[name] = _summary(samples, time.perf_counter() - started, errors)
+        _print(name, results[name])
+    return results
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_gunicorn(workers, env, extra_args=(), app='benchmarks.load_test:bench_app()'):
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+         '--log-level', 'warning', *extra_args, app],
+        cwd=REPO_ROOT, env=env)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            time.sleep(0.2)
+    else:
+        process.terminate()
+        raise RuntimeError('gunicorn did not start within 60s')
+    base_url = f'http://127.0.0.1:{port}'
+    _warm_up(base_url, workers)
+    return process, base_url
+
+
+def _warm_up(base_url, workers, timeout=60):
+    """Wait until every worker has imported the app and answers quickly.
+
+    The master accepts connections before the workers have loaded the app, so
+    without this the first request to each worker would be timed as well.
+    """
+    import requests as http
+
+    def probe(_):
+        started = time.perf_counter()
+        http.get(f'{base_url}/', timeout=timeout)
+        return time.perf_counter() - started
+
+    deadline = time.time() + timeout
+    with ThreadPoolExecutor(workers * 2) as pool:
+        while time.time() < deadline:
+            if max(pool.map(probe, range(workers * 4))) < 0.5:
+                return
+
+
+def run_gunicorn(base_url, scenarios, requests, concurrency, seed):
+    import requests as http
+
+    def session():
+        s = http.Session()
+        s.post(f'{base_url}/login', data=ADMIN)
+        if s.get(f'{base_url}/admin/dashboard', allow_redirects=False).status_code != 200:
+            raise RuntimeError('admin login failed')
+        return s
+
+    sessions = [session() for _ in range(concurrency)]
+    results = {}
+    for name, make in scenarios.items():
+        samples, errors = [], [0]
+        lock = threading.Lock()
+
+        def drive(index, s):
+            rng = random.Random(seed * 1000 + index)
+            local = []
+            for _ in range(index, requests, concurrency):
+                method, path, form, photo = make(rng)
+                files = {'photo': ('card.jpg', photo, 'image/jpeg')} if photo else None
+                t0 = time.perf_counter()
+                response = s.request(method, base_url + path, data=form, files=files, allow_redirects=False)
+                local.append((time.perf_counter() - t0) * 1000)
+                if response.status_code >= 400:
+                    with lock:
+                        errors[0] += 1
+            with lock:
+                samples.extend(local)
+
+        threads = [threading.Thread(target=drive, args=(index, s)) for index, s in enumerate(sessions)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results[name] = _summary(samples, time.perf_counter() - started, errors[0])
+        _print(name, results[name])
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print current vs baseline per scenario; returns the list of regressions"""
+    regressions = []
+    for mode, scenarios in results['results'].items():
+        for name, current in scenarios.items():
+            previous = baseline.get('results', {}).get(mode, {}).get(name)
+            if not previous:
+                continue
+            cells = []
+            for metric in ('p50_ms', 'p99_ms'):
+                ratio = current[metric] / previous[metric] if previous[metric] else 1.0
+                cells.append(f'{metric[:3]} {previous[metric]:8.2f} -> {current[metric]:8.2f} ({ratio - 1:+6.0%})')
+                # Sub-millisecond jitter is noise, not a regression
+                if ratio > 1 + tolerance and current[metric] - previous[metric] > 1.0:
+                    regressions.append(f'{mode}/{name} {metric}')
+            print(f'  {mode:8} {name:20} ' + '  '.join(cells))
+    return regressions
+
+
+def _print(name, summary):
+    print(f'  {name:20} p50 {summary["p50_ms"]:8.2f} ms  p99 {summary["p99_ms"]:8.2f} ms  '
+          f'{summary["throughput_rps"]:7.1f} req/s  errors {summary["errors"]}')
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000, help='seeded reports (10k / 100k / 1M)')
+    parser.add_argument('--database-url', help='default: a temporary SQLite file')
+    parser.add_argument('--mode', nargs='+', choices=['client', 'gunicorn'], default=['client'])
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads against gunicorn')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='load_test_results.json')
+    parser.add_argument('--baseline', default=os.path.join(REPO_ROOT, 'benchmarks', 'baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p50/p99 slowdown')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='lostid-load-')
+    os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ['BENCH_UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    os.environ['MAIL_OUTBOX_SENDER'] = 'false'
+
+    from app import db
+    from app.models import Admin, LostReport, FoundReport
+    from benchmarks.seed import seed_reports
+
+    app = bench_app()
+    with app.app_context():
+        db.create_all()
+        if not Admin.query.filter_by(username=ADMIN['username']).first():
+            admin = Admin(username=ADMIN['username'], email='bench@example.com')
+            admin.set_password(ADMIN['password'])
+            db.session.add(admin)
+            db.session.commit()
+        missing = args.rows - LostReport.query.count() - FoundReport.query.count()
+        if missing > 0:
+            print(f'Seeding {missing} reports...')
+            elapsed = seed_reports(missing // 2, missing - missing // 2, seed=args.seed)
+            print(f'  seeded in {elapsed:.1f}s')
+        if db.engine.dialect.name in ('sqlite', 'postgresql'):
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+        n_lost, n_found = LostReport.query.count(), FoundReport.query.count()
+        dialect = db.engine.dialect.name
+
+    scenarios = _scenarios(n_lost, n_found, _photos())
+    results = {
+        'meta': {
+            'rows': n_lost + n_found, 'database': dialect, 'requests': args.requests,
+            'concurrency': args.concurrency, 'workers': args.workers, 'git': _git_revision(),
+            'python': platform.python_version(), 'machine': platform.machine(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+        },
+        'results': {},
+    }
+
+    if 'client' in args.mode:
+        print('Flask test client (sequential)')
+        results['results']['client'] = run_client(app, scenarios, args.requests, args.seed)
+    if 'gunicorn' in args.mode:
+        print(f'gunicorn ({args.workers} workers, {args.concurrency} client threads)')
+        process, base_url = _start_gunicorn(args.workers, dict(os.environ))
+        try:
+            results['results']['gunicorn'] = run_gunicorn(
+                base_url, scenarios, args.requests, args.concurrency, args.seed)
+        finally:
+            process.terminate()
+            process.wait()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {args.output}')
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+        return
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}; run with --save-baseline to create one')
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['meta'].get('rows') != results['meta']['rows']:
+        print(f"⚠️ Baseline was recorded with {baseline['meta'].get('rows')} rows")
+    print(f"Compared with baseline {baseline['meta'].get('git')} ({baseline['meta'].get('date')})")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print('❌ Regressed beyond tolerance: ' + ', '.join(regressions))
+        sys.exit(1)
+    print('✅ No regressions beyond tolerance')
+
+
+if __name__ == '__main__':
+    main()
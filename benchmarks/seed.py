@@ -0,0 +1,85 @@
+"""Synthetic report data for the benchmarks.
+
+Rows are written with Core executemany in batches and explicit primary keys,
+so the ORM insert events are bypassed; the derived columns (normalized_id,
+name tokens, geocoded location) are filled in here instead.
+"""
+import random
+from datetime import datetime, timedelta
+from app import db
+from app.models import LostReport, FoundReport, NameToken, ID_TYPES
+from app.utils.geo_utils import import_places, place_key
+from app.utils.match_utils import normalize_id_number, token_rows
+
+# Names are built from syllables so token posting lists have a realistic
+# spread (~8k distinct first and last names) instead of a handful of hot keys
+SYLLABLES = ['an', 'ar', 'ba', 'chen', 'da', 'di', 'el', 'fa', 'go', 'ha', 'ir', 'ja',
+             'ka', 'li', 'ma', 'na', 'ok', 'pri', 'ra', 'sa']
+STATUSES = ['reported', 'reported', 'reported', 'verified', 'matched', 'recovered']
+LOCATIONS = ['Library', 'Cafeteria', 'Main Gate', 'Hostel Block A', 'Bus Stop', 'Sports Complex',
+             'Auditorium', 'Parking Lot', 'Lab Building', 'Admin Office']
+# Campuses about 66 km apart on a 5 x 5 grid, listed in the place table, so
+# locations like "Library, Campus 7" geocode and distance pruning has work to do
+CAMPUSES = [(f'Campus {index + 1}', 12.0 + (index // 5) * 0.6, 76.5 + (index % 5) * 0.6)
+            for index in range(25)]
+
+
+def _name(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(3)).capitalize()
+
+
+def _person(rng):
+    return f'{_name(rng)} {_name(rng)}'
+
+
+def _id_number(rng):
+    return f'{rng.choice("ABCDEFGH")}{rng.randint(10, 99)}-{rng.randint(0, 999999):06d}'
+
+
+def _next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def seed_reports(n_lost, n_found, batch_size=10000, seed=42):
+    """Insert n_lost lost and n_found found reports; returns elapsed seconds"""
+    rng = random.Random(seed)
+    started = datetime.now()
+    now = datetime.utcnow()
+    import_places({'key': place_key(name), 'name': name, 'latitude': lat, 'longitude': lon}
+                  for name, lat, lon in CAMPUSES)
+
+    for model, kind, total in ((LostReport, 'lost', n_lost), (FoundReport, 'found', n_found)):
+        next_id = _next_id(model)
+        for offset in range(0, total, batch_size):
+            rows, tokens = [], []
+            for report_id in range(next_id + offset, next_id + min(offset + batch_size, total)):
+                id_number = _id_number(rng)
+                owner_name = _person(rng)
+                reported = now - timedelta(minutes=rng.randint(0, 525600))
+                campus, lat, lon = rng.choice(CAMPUSES)
+                location = f'{rng.choice(LOCATIONS)}, {campus}'
+                row = {
+                    'id': report_id,
+                    'id_number': id_number,
+                    'normalized_id': normalize_id_number(id_number),
+                    'id_type': rng.choice(ID_TYPES),
+                    'owner_name': owner_name,
+                    'description': 'Synthetic benchmark report',
+                    'status': rng.choice(STATUSES),
+                    'date_reported': reported,
+                    'location_lat': lat,
+                    'location_lon': lon,
+                }
+                if kind == 'lost':
+                    row.update(reporter_name=_person(rng), reporter_email=f'lost{report_id}@example.com',
+                               date_lost=reported.date(), location_lost=location)
+                else:
+                    row.update(finder_name=_person(rng), finder_email=f'found{report_id}@example.com',
+                               date_found=reported.date(), location_found=location)
+                rows.append(row)
+                tokens.extend(token_rows(kind, report_id, owner_name))
+            db.session.execute(model.__table__.insert(), rows)
+            db.session.execute(NameToken.__table__.insert(), tokens)
+            db.session.commit()
+
+    return (datetime.now() - started).total_seconds()
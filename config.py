@@ -1,25 +1,165 @@
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
 
+# .env is loaded by create_app() (and by the flask CLI) before this module
+# is imported; importing it has no side effects
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 class Config:
     SECRET_KEY = os.getenv('SESSION_SECRET', 'dev-secret-key-change-in-production')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///id_recovery.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Optional read replica; dashboard and verify-page reads are sent there
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+
+    # Connection pool per worker process for PostgreSQL (unused by SQLite);
+    # keep workers * (size + overflow) under the server's max_connections
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+
+    # SQLite single-node profile: WAL lets readers run next to the one
+    # writer, and writers wait up to the busy timeout instead of failing
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 15000))
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_KB = 64 * 1024
+    SQLITE_MMAP_BYTES = 256 * 1024 * 1024
 
-    # Absolute path to uploads folder inside app/static/uploads
+    # Absolute path to uploads folder inside app/static/uploads; created by
+    # the local storage backend on first write
     UPLOAD_FOLDER = os.path.join(basedir, 'static/uploads')
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)  # ensure folder exists
 
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
 
-    MAIL_SERVER = 'smtp.gmail.com'
-    MAIL_PORT = 587
-    MAIL_USE_TLS = True
+    # Uploaded photos are re-encoded (EXIF stripped) to at most this edge,
+    # plus pre-generated thumbnails used by the templates
+    IMAGE_FORMAT = 'WEBP'  # falls back to JPEG if Pillow lacks WebP
+    IMAGE_QUALITY = 80
+    IMAGE_MAX_DIMENSION = 1600
+    IMAGE_THUMBNAIL_SIZES = {'md': 600, 'sm': 320}
+
+    # Upload serving. None streams through the worker; 'x-sendfile'
+    # (Apache/lighttpd) or 'x-accel' (nginx internal location at
+    # UPLOAD_ACCEL_PREFIX) hands the file to the front proxy instead
+    UPLOAD_SENDFILE_MODE = os.getenv('UPLOAD_SENDFILE_MODE') or None
+    UPLOAD_ACCEL_PREFIX = os.getenv('UPLOAD_ACCEL_PREFIX', '/protected-uploads/')
+    USE_X_SENDFILE = UPLOAD_SENDFILE_MODE == 'x-sendfile'
+    UPLOAD_LEGACY_MAX_AGE = 3600
+
+    # Photo storage: 'local' keeps files in UPLOAD_FOLDER, 's3' uses any
+    # S3-compatible bucket (set S3_ENDPOINT_URL for MinIO) and links pages
+    # to presigned URLs so browsers fetch photos from the bucket directly
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')
+    S3_BUCKET = os.getenv('S3_BUCKET')
+    S3_PREFIX = os.getenv('S3_PREFIX', 'uploads/')
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')
+    S3_REGION = os.getenv('S3_REGION')
+    S3_ACCESS_KEY_ID = os.getenv('S3_ACCESS_KEY_ID')
+    S3_SECRET_ACCESS_KEY = os.getenv('S3_SECRET_ACCESS_KEY')
+    S3_PRESIGN_EXPIRES = int(os.getenv('S3_PRESIGN_EXPIRES', 3600))
+
+    # Admin dashboard rows per tab; ?per_page= may override up to the max
+    ADMIN_PAGE_SIZE = int(os.getenv('ADMIN_PAGE_SIZE', 50))
+    ADMIN_MAX_PAGE_SIZE = 200
+    # Reports (or lost/found pairs) one bulk action may change at once
+    ADMIN_BULK_MAX_REPORTS = int(os.getenv('ADMIN_BULK_MAX_REPORTS', 1000))
+    # Bulk "match" only proposes stored candidates scoring at least this
+    # (0-1); the admin confirms the proposed pairs before anything changes
+    ADMIN_BULK_MATCH_MIN_SCORE = float(os.getenv('ADMIN_BULK_MATCH_MIN_SCORE', 0.7))
+
+    # Dashboard fragments, report counts and verify-page candidates are
+    # cached until a report is added or changes status, or the TTL (seconds)
+    # runs out. 'redis' is shared by all workers and is the default when
+    # CACHE_REDIS_URL is set; 'memory' is a per-process LRU, only right for a
+    # single worker process; 'none' turns caching off
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND') or ('redis' if os.getenv('CACHE_REDIS_URL') else 'memory')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_MAX_ENTRIES = 1024
+    CACHE_DEFAULT_TTL = 60
+    CACHE_TTLS = {'dashboard_reports': 30, 'dashboard_counts': 60, 'verify_candidates': 120}
+    # With a read replica, entries filled this soon (seconds) after an
+    # invalidation expire after this long, in case the replica lagged
+    CACHE_REPLICA_LAG = int(os.getenv('CACHE_REPLICA_LAG', 5))
+
+    # Rows per INSERT transaction for bulk report imports
+    IMPORT_BATCH_SIZE = 1000
+
+    # Dashboard search: 'auto' uses SQLite FTS5 / PostgreSQL tsvector when
+    # the index is installed, 'like' forces substring matching
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+
+    # Maximum number of ranked candidates shown on the verify pages
+    MATCH_CANDIDATE_LIMIT = int(os.getenv('MATCH_CANDIDATE_LIMIT', 20))
+    # Candidates scoring below this (0-1) are not shown at all
+    MATCH_MIN_SCORE = float(os.getenv('MATCH_MIN_SCORE', 0.35))
+    # Reports sharing owner-name tokens fetched per ranking (most shared
+    # tokens first), besides exact ID-number matches and photo hits
+    MATCH_BLOCK_SIZE = int(os.getenv('MATCH_BLOCK_SIZE', 500))
+    # Background threads scoring new reports; 0 scores inline in the request
+    MATCH_WORKERS = int(os.getenv('MATCH_WORKERS', 2))
+    # Photos whose perceptual hashes differ in at most this many of 64 bits
+    PHOTO_MATCH_MAX_DISTANCE = 10
+    # Candidates whose geocoded place is farther than this (km), or whose
+    # date is further apart than this (days), are never scored; 0 disables.
+    # Reports without a known place or date are always scored
+    MATCH_RADIUS_KM = float(os.getenv('MATCH_RADIUS_KM', 10))
+    MATCH_DATE_WINDOW_DAYS = int(os.getenv('MATCH_DATE_WINDOW_DAYS', 60))
+
+    # Retention (`flask retention run`): reports matched or recovered
+    # (closed_at) more than RETENTION_DAYS ago are archived to gzipped JSONL
+    # under reports/ in the archive storage and deleted, in batches of
+    # RETENTION_BATCH_SIZE; 0 days disables. RETENTION_PHOTOS is 'archive'
+    # (move to photos/ in the archive storage, in
+    # RETENTION_PHOTO_STORAGE_CLASS on S3) or 'delete'
+    RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', 365))
+    RETENTION_BATCH_SIZE = 500
+    RETENTION_PHOTOS = os.getenv('RETENTION_PHOTOS', 'archive')
+    RETENTION_PHOTO_STORAGE_CLASS = os.getenv('RETENTION_PHOTO_STORAGE_CLASS')
+
+    # Archive storage, kept apart from the served photos: ARCHIVE_FOLDER on
+    # local disk (outside static/), or ARCHIVE_S3_PREFIX in ARCHIVE_BUCKET
+    # (default S3_BUCKET) with the s3 backend
+    ARCHIVE_FOLDER = os.getenv('ARCHIVE_FOLDER', os.path.join(basedir, 'instance/archive'))
+    ARCHIVE_BUCKET = os.getenv('ARCHIVE_BUCKET')
+    ARCHIVE_S3_PREFIX = os.getenv('ARCHIVE_S3_PREFIX', 'archive/')
+
+    # Request, SQL, SMTP and storage instrumentation. Prometheus metrics are
+    # served on /metrics (per process) only when METRICS_TOKEN is set, to
+    # scrapers sending "Authorization: Bearer <token>"
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    # Flag requests that run one SQL statement this many times (0 disables)
+    METRICS_N_PLUS_ONE_THRESHOLD = 10
+
+    # Opt-in sampling profiler: requests slower than PROFILE_SLOW_SECONDS
+    # leave a folded-stack file (flamegraph.pl / speedscope) in PROFILE_DIR
+    PROFILE_SLOW_REQUESTS = os.getenv('PROFILE_SLOW_REQUESTS', 'false').lower() == 'true'
+    PROFILE_SLOW_SECONDS = float(os.getenv('PROFILE_SLOW_SECONDS', 1.0))
+    PROFILE_SAMPLE_INTERVAL = 0.005
+    PROFILE_DIR = os.path.join(basedir, 'instance', 'profiles')
+
+    MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+    MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
+    MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'true').lower() == 'true'
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = ('Lost ID Finder', os.getenv('MAIL_USERNAME'))
     SENDER_NAME = 'Lost ID Finder System'
+    MAIL_TIMEOUT = 30
+
+    # Outbox delivery: a background thread per process drains the queue over
+    # one reused SMTP connection, retrying failures with exponential backoff
+    MAIL_OUTBOX_SENDER = os.getenv('MAIL_OUTBOX_SENDER', 'true').lower() == 'true'
+    MAIL_OUTBOX_BATCH_SIZE = 50
+    MAIL_OUTBOX_POLL_SECONDS = 5
+    MAIL_OUTBOX_LEASE_SECONDS = 300
+    MAIL_MAX_ATTEMPTS = 5
+    MAIL_RETRY_BASE_SECONDS = 30
+
+    # Notification events for one recipient are held this long and then sent
+    # as a single digest email (0 sends each event as soon as it is committed)
+    MAIL_DIGEST_SECONDS = int(os.getenv('MAIL_DIGEST_SECONDS', 60))
+    # Per-process cap on outgoing emails to stay under the provider's sending
+    # quota (0 = unlimited); batches shrink so they finish within their lease
+    MAIL_RATE_LIMIT_PER_MINUTE = int(os.getenv('MAIL_RATE_LIMIT_PER_MINUTE', 0))
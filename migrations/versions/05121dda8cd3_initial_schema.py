@@ -0,0 +1,80 @@
+"""initial schema
+
+Revision ID: 05121dda8cd3
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+Databases created with db.create_all() before migrations were tracked
+match this revision: run `flask db stamp 05121dda8cd3` once, then
+`flask db upgrade`.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '05121dda8cd3'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('admin',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=80), nullable=False),
+    sa.Column('password_hash', sa.String(length=200), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('username')
+    )
+    # lost_report and found_report reference each other; the second
+    # foreign key is added once both tables exist
+    op.create_table('lost_report',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('reporter_name', sa.String(length=100), nullable=False),
+    sa.Column('reporter_email', sa.String(length=120), nullable=False),
+    sa.Column('reporter_phone', sa.String(length=20), nullable=True),
+    sa.Column('id_number', sa.String(length=50), nullable=False),
+    sa.Column('id_type', sa.String(length=50), nullable=False),
+    sa.Column('owner_name', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('photo_path', sa.String(length=200), nullable=True),
+    sa.Column('date_lost', sa.Date(), nullable=True),
+    sa.Column('location_lost', sa.String(length=200), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('date_reported', sa.DateTime(), nullable=True),
+    sa.Column('matched_with', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('found_report',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('finder_name', sa.String(length=100), nullable=False),
+    sa.Column('finder_email', sa.String(length=120), nullable=False),
+    sa.Column('finder_phone', sa.String(length=20), nullable=True),
+    sa.Column('id_number', sa.String(length=50), nullable=True),
+    sa.Column('id_type', sa.String(length=50), nullable=False),
+    sa.Column('owner_name', sa.String(length=100), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('photo_path', sa.String(length=200), nullable=True),
+    sa.Column('date_found', sa.Date(), nullable=True),
+    sa.Column('location_found', sa.String(length=200), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('date_reported', sa.DateTime(), nullable=True),
+    sa.Column('matched_with', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['matched_with'], ['lost_report.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('lost_report', schema=None) as batch_op:
+        batch_op.create_foreign_key('fk_lost_report_matched_with', 'found_report', ['matched_with'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('lost_report', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_lost_report_matched_with', type_='foreignkey')
+
+    op.drop_table('found_report')
+    op.drop_table('lost_report')
+    op.drop_table('admin')
@@ -0,0 +1,69 @@
+"""report photo hash
+
+Revision ID: 2da00d0506bb
+Revises: 3a304ca32652
+Create Date: 2026-10-18 09:10:00.000000
+
+Perceptual hash of each report's photo, compared when ranking candidates.
+Photos stored before this revision have no hash and are ranked on their
+text fields only.
+
+Until the features were split into their own revisions, this revision
+also added the matching columns, match_candidate, email_outbox, the paging
+indexes and the search index; databases already at 2da00d0506bb have all
+of them and need nothing re-run.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2da00d0506bb'
+down_revision = '3a304ca32652'
+branch_labels = None
+depends_on = None
+
+REPORT_TABLES = ('lost_report', 'found_report')
+
+# Frozen copy of the search triggers from 3a304ca32652
+SEARCH_COLUMNS = {
+    'lost_report': ('id_number', 'owner_name', 'reporter_name', 'description', 'location_lost'),
+    'found_report': ('id_number', 'owner_name', 'finder_name', 'description', 'location_found'),
+}
+
+
+def _reinstall_search_triggers(table):
+    # SQLite batch mode recreates the table, which drops its FTS triggers
+    bind = op.get_bind()
+    fts = f'{table}_fts'
+    if bind.dialect.name != 'sqlite' or not bind.exec_driver_sql(
+            'SELECT count(*) FROM sqlite_master WHERE name = ?', (fts,)).scalar():
+        return
+    columns = SEARCH_COLUMNS[table]
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    for statement in (
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+    ):
+        bind.exec_driver_sql(statement)
+
+
+def upgrade():
+    for table in REPORT_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('photo_hash', sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    for table in REPORT_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('photo_hash')
+        _reinstall_search_triggers(table)
@@ -0,0 +1,71 @@
+"""report full-text search index
+
+Revision ID: 3a304ca32652
+Revises: ec70d4bd6fcf
+Create Date: 2026-10-18 09:09:00.000000
+
+An FTS5 table kept in sync by triggers on SQLite, a GIN expression index
+on PostgreSQL; other databases keep the LIKE search. The DDL is a frozen
+copy of what the app installed when this revision was written. Later
+revisions that rebuild a report table on SQLite put the triggers back.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a304ca32652'
+down_revision = 'ec70d4bd6fcf'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = {
+    'lost_report': ('id_number', 'owner_name', 'reporter_name', 'description', 'location_lost'),
+    'found_report': ('id_number', 'owner_name', 'finder_name', 'description', 'location_found'),
+}
+
+
+def _sqlite_search_ddl(table):
+    columns = SEARCH_COLUMNS[table]
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column_list}, content='{table}', content_rowid='id', tokenize='unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table, columns in SEARCH_COLUMNS.items():
+        if bind.dialect.name == 'sqlite':
+            if not bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar():
+                return
+            for statement in _sqlite_search_ddl(table):
+                bind.exec_driver_sql(statement)
+            bind.exec_driver_sql(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+        elif bind.dialect.name == 'postgresql':
+            document = " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+            bind.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} "
+                                 f"USING GIN (to_tsvector('simple', {document}))")
+
+
+def downgrade():
+    bind = op.get_bind()
+    for table in SEARCH_COLUMNS:
+        if bind.dialect.name == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {table}_fts')
+        elif bind.dialect.name == 'postgresql':
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_search')
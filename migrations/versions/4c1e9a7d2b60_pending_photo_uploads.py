@@ -0,0 +1,77 @@
+"""pending photo uploads
+
+Revision ID: 4c1e9a7d2b60
+Revises: b682f73003be
+Create Date: 2026-10-18 11:40:00.000000
+
+Reports are stored as soon as they are submitted; their photo is processed
+afterwards by the match worker. photo_upload holds the staged upload while
+it waits, and photo_attached_at tells the in-process photo indexes which
+rows gained a photo after they were first indexed.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1e9a7d2b60'
+down_revision = 'b682f73003be'
+branch_labels = None
+depends_on = None
+
+REPORT_TABLES = ('lost_report', 'found_report')
+
+PENDING_PREDICATE = sa.text('photo_upload IS NOT NULL')
+
+
+# Frozen copy of the search triggers from 3a304ca32652
+SEARCH_COLUMNS = {
+    'lost_report': ('id_number', 'owner_name', 'reporter_name', 'description', 'location_lost'),
+    'found_report': ('id_number', 'owner_name', 'finder_name', 'description', 'location_found'),
+}
+
+
+def _reinstall_search_triggers(table):
+    # SQLite batch mode recreates the table, which drops its FTS triggers
+    bind = op.get_bind()
+    fts = f'{table}_fts'
+    if bind.dialect.name != 'sqlite' or not bind.exec_driver_sql(
+            'SELECT count(*) FROM sqlite_master WHERE name = ?', (fts,)).scalar():
+        return
+    columns = SEARCH_COLUMNS[table]
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    for statement in (
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+    ):
+        bind.exec_driver_sql(statement)
+
+
+def upgrade():
+    for table in REPORT_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('photo_upload', sa.String(length=200), nullable=True))
+            batch_op.add_column(sa.Column('photo_attached_at', sa.DateTime(), nullable=True))
+
+        op.create_index(f'ix_{table}_photo_pending', table, ['photo_upload'], unique=False,
+                        sqlite_where=PENDING_PREDICATE, postgresql_where=PENDING_PREDICATE)
+        op.create_index(f'ix_{table}_photo_attached', table, ['photo_attached_at'], unique=False)
+
+
+def downgrade():
+    for table in REPORT_TABLES:
+        op.drop_index(f'ix_{table}_photo_attached', table_name=table)
+        op.drop_index(f'ix_{table}_photo_pending', table_name=table)
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('photo_attached_at')
+            batch_op.drop_column('photo_upload')
+        _reinstall_search_triggers(table)
@@ -0,0 +1,79 @@
+"""gazetteer and geocoded report locations
+
+Revision ID: 8f3b2d5c7e14
+Revises: 4c1e9a7d2b60
+Create Date: 2026-10-18 13:10:00.000000
+
+Adds the place table used to geocode report locations offline, and the
+lat/lon of each report's location. Load places with `flask places import`
+and locate existing reports with `flask places geocode`.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3b2d5c7e14'
+down_revision = '4c1e9a7d2b60'
+branch_labels = None
+depends_on = None
+
+REPORT_TABLES = ('lost_report', 'found_report')
+
+
+# Frozen copy of the search triggers from 3a304ca32652
+SEARCH_COLUMNS = {
+    'lost_report': ('id_number', 'owner_name', 'reporter_name', 'description', 'location_lost'),
+    'found_report': ('id_number', 'owner_name', 'finder_name', 'description', 'location_found'),
+}
+
+
+def _reinstall_search_triggers(table):
+    # SQLite batch mode recreates the table, which drops its FTS triggers
+    bind = op.get_bind()
+    fts = f'{table}_fts'
+    if bind.dialect.name != 'sqlite' or not bind.exec_driver_sql(
+            'SELECT count(*) FROM sqlite_master WHERE name = ?', (fts,)).scalar():
+        return
+    columns = SEARCH_COLUMNS[table]
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    for statement in (
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+    ):
+        bind.exec_driver_sql(statement)
+
+
+def upgrade():
+    op.create_table('place',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=200), nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+
+    for table in REPORT_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('location_lat', sa.Float(), nullable=True))
+            batch_op.add_column(sa.Column('location_lon', sa.Float(), nullable=True))
+
+
+def downgrade():
+    for table in REPORT_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('location_lon')
+            batch_op.drop_column('location_lat')
+        _reinstall_search_triggers(table)
+
+    op.drop_table('place')
@@ -0,0 +1,141 @@
+"""report indexes and status/type enums
+
+Revision ID: b682f73003be
+Revises: 2da00d0506bb
+Create Date: 2026-10-18 09:20:00.000000
+
+status and id_type become enums (native ENUM types on PostgreSQL). The
+candidate lookup index only covers open reports, and a second partial
+index covers the matched_with back-reference of matched reports.
+`flask plans check` verifies that no hot query falls back to a full scan.
+
+Existing rows are brought into the enums first. A missing status becomes
+'reported'. Any other status outside REPORT_STATUSES stops the upgrade with
+a list of the offending rows, since there is no safe guess for it. An
+id_type outside ID_TYPES becomes 'Other', and its original text is appended
+to the report's description and logged with the report id, so nothing
+typed in by a reporter is lost.
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# revision identifiers, used by Alembic.
+revision = 'b682f73003be'
+down_revision = '2da00d0506bb'
+branch_labels = None
+depends_on = None
+
+REPORT_TABLES = ('lost_report', 'found_report')
+REPORT_STATUSES = ('reported', 'verified', 'matched', 'recovered')
+OPEN_STATUSES = ('reported', 'verified')
+ID_TYPES = ('Student ID', 'Staff ID', 'Employee ID', 'Library Card', 'Access Card', 'Other')
+
+report_status = sa.Enum(*REPORT_STATUSES, name='report_status')
+report_id_type = sa.Enum(*ID_TYPES, name='report_id_type')
+
+OPEN_PREDICATE = sa.text('status IN (%s)' % ', '.join(f"'{status}'" for status in OPEN_STATUSES))
+MATCHED_PREDICATE = sa.text('matched_with IS NOT NULL')
+
+
+# Frozen copy of the search triggers from 3a304ca32652
+SEARCH_COLUMNS = {
+    'lost_report': ('id_number', 'owner_name', 'reporter_name', 'description', 'location_lost'),
+    'found_report': ('id_number', 'owner_name', 'finder_name', 'description', 'location_found'),
+}
+
+
+def _reinstall_search_triggers(table):
+    # SQLite batch mode recreates the table, which drops its FTS triggers
+    bind = op.get_bind()
+    fts = f'{table}_fts'
+    if bind.dialect.name != 'sqlite' or not bind.exec_driver_sql(
+            'SELECT count(*) FROM sqlite_master WHERE name = ?', (fts,)).scalar():
+        return
+    columns = SEARCH_COLUMNS[table]
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    for statement in (
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+    ):
+        bind.exec_driver_sql(statement)
+
+
+def _check_statuses(bind):
+    unknown = []
+    for table in REPORT_TABLES:
+        reports = sa.table(table, sa.column('id'), sa.column('status'))
+        rows = bind.execute(sa.select(reports.c.id, reports.c.status)
+                            .where(reports.c.status.notin_(REPORT_STATUSES))).all()
+        unknown += [f'{table} {report_id}: {status!r}' for report_id, status in rows]
+    if unknown:
+        raise RuntimeError('Reports with a status outside %s; fix them and rerun the upgrade:\n  %s'
+                           % (', '.join(REPORT_STATUSES), '\n  '.join(unknown)))
+
+
+def _coerce_id_types(bind, table):
+    reports = sa.table(table, sa.column('id'), sa.column('id_type'), sa.column('description'))
+    rows = bind.execute(sa.select(reports.c.id, reports.c.id_type, reports.c.description)
+                        .where(reports.c.id_type.notin_(ID_TYPES))).all()
+    for report_id, id_type, description in rows:
+        note = f'ID type before migration: {id_type}'
+        logger.warning('%s %s: id_type %r set to Other', table, report_id, id_type)
+        bind.execute(reports.update().where(reports.c.id == report_id).values(
+            id_type='Other', description=f'{description}\n\n{note}' if description else note))
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table in REPORT_TABLES:
+        reports = sa.table(table, sa.column('status'))
+        op.execute(reports.update().where(reports.c.status.is_(None)).values(status='reported'))
+    _check_statuses(bind)
+
+    report_status.create(bind, checkfirst=True)
+    report_id_type.create(bind, checkfirst=True)
+
+    for table in REPORT_TABLES:
+        _coerce_id_types(bind, table)
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_match')
+            batch_op.alter_column('status', existing_type=sa.String(length=20), type_=report_status,
+                                  nullable=False, postgresql_using='status::report_status')
+            batch_op.alter_column('id_type', existing_type=sa.String(length=50), type_=report_id_type,
+                                  existing_nullable=False, postgresql_using='id_type::report_id_type')
+        _reinstall_search_triggers(table)
+
+        op.create_index(f'ix_{table}_open_id', table, ['normalized_id', 'id_type'], unique=False,
+                        sqlite_where=OPEN_PREDICATE, postgresql_where=OPEN_PREDICATE)
+        op.create_index(f'ix_{table}_matched_with', table, ['matched_with'], unique=False,
+                        sqlite_where=MATCHED_PREDICATE, postgresql_where=MATCHED_PREDICATE)
+
+
+def downgrade():
+    for table in REPORT_TABLES:
+        op.drop_index(f'ix_{table}_matched_with', table_name=table)
+        op.drop_index(f'ix_{table}_open_id', table_name=table)
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('id_type', existing_type=report_id_type, type_=sa.String(length=50),
+                                  existing_nullable=False, postgresql_using='id_type::text')
+            batch_op.alter_column('status', existing_type=report_status, type_=sa.String(length=20),
+                                  nullable=True, postgresql_using='status::text')
+            batch_op.create_index(f'ix_{table}_match', ['id_type', 'normalized_id', 'status'], unique=False)
+        _reinstall_search_triggers(table)
+
+    bind = op.get_bind()
+    report_id_type.drop(bind, checkfirst=True)
+    report_status.drop(bind, checkfirst=True)
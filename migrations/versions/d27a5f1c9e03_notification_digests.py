@@ -0,0 +1,37 @@
+"""notification digests
+
+Revision ID: d27a5f1c9e03
+Revises: 8f3b2d5c7e14
+Create Date: 2026-10-18 15:20:00.000000
+
+Notification events wait in the notification table until the mail sender
+coalesces every pending event of one recipient into a single email.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd27a5f1c9e03'
+down_revision = '8f3b2d5c7e14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('to_email', sa.String(length=120), nullable=False),
+    sa.Column('to_name', sa.String(length=100), nullable=True),
+    sa.Column('template', sa.String(length=50), nullable=False),
+    sa.Column('context', sa.Text(), nullable=False),
+    sa.Column('date_created', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_notification_recipient', 'notification', ['to_email', 'date_created'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_notification_recipient', table_name='notification')
+    op.drop_table('notification')
@@ -0,0 +1,43 @@
+"""match candidates
+
+Revision ID: da32c06e066d
+Revises: f4b3bcd422ab
+Create Date: 2026-10-18 09:04:00.000000
+
+Stores the scored candidate pairs shown on the verify pages. Run
+`flask match backfill` afterwards to score existing reports.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'da32c06e066d'
+down_revision = 'f4b3bcd422ab'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('match_candidate',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('lost_id', sa.Integer(), nullable=False),
+    sa.Column('found_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('date_scored', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['found_id'], ['found_report.id'], ),
+    sa.ForeignKeyConstraint(['lost_id'], ['lost_report.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('lost_id', 'found_id', name='uq_match_candidate_pair')
+    )
+    with op.batch_alter_table('match_candidate', schema=None) as batch_op:
+        batch_op.create_index('ix_match_candidate_found', ['found_id', 'score'], unique=False)
+        batch_op.create_index('ix_match_candidate_lost', ['lost_id', 'score'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('match_candidate', schema=None) as batch_op:
+        batch_op.drop_index('ix_match_candidate_lost')
+        batch_op.drop_index('ix_match_candidate_found')
+    op.drop_table('match_candidate')
@@ -0,0 +1,29 @@
+"""notification failures
+
+Revision ID: e41b7c9d2a56
+Revises: d27a5f1c9e03
+Create Date: 2026-10-18 18:05:00.000000
+
+Events whose digest could not be rendered are marked with failed_at and
+skipped by the mail sender until they are retried.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b7c9d2a56'
+down_revision = 'd27a5f1c9e03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('failed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.drop_column('failed_at')
@@ -0,0 +1,39 @@
+"""dashboard paging indexes
+
+Revision ID: ec70d4bd6fcf
+Revises: 6a07220e2a02
+Create Date: 2026-10-18 09:08:00.000000
+
+Indexes for the keyset-paged dashboard tabs, newest first, with and
+without the status and ID type filters, and for the per-status counts.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ec70d4bd6fcf'
+down_revision = '6a07220e2a02'
+branch_labels = None
+depends_on = None
+
+REPORT_TABLES = ('lost_report', 'found_report')
+
+
+def upgrade():
+    for table in REPORT_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(f'ix_{table}_recent', ['date_reported', 'id'], unique=False)
+            batch_op.create_index(f'ix_{table}_status_recent', ['status', 'date_reported', 'id'], unique=False)
+            batch_op.create_index(f'ix_{table}_type_recent', ['id_type', 'date_reported', 'id'], unique=False)
+            batch_op.create_index(f'ix_{table}_status_type', ['status', 'id_type'], unique=False)
+
+
+def downgrade():
+    for table in REPORT_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_status_type')
+            batch_op.drop_index(f'ix_{table}_type_recent')
+            batch_op.drop_index(f'ix_{table}_status_recent')
+            batch_op.drop_index(f'ix_{table}_recent')
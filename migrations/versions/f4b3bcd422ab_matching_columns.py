@@ -0,0 +1,93 @@
+"""matching columns and name tokens
+
+Revision ID: f4b3bcd422ab
+Revises: 05121dda8cd3
+Create Date: 2026-10-18 09:02:00.000000
+
+Adds normalized_id with its blocking index and the name_token table, and
+fills both for existing reports. The normalization below is a frozen copy
+of the one the app used when this revision was written, so the migration
+gives the same result whatever the app code looks like later.
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b3bcd422ab'
+down_revision = '05121dda8cd3'
+branch_labels = None
+depends_on = None
+
+REPORT_TABLES = {'lost_report': 'lost', 'found_report': 'found'}
+BATCH_SIZE = 1000
+
+_ID_STRIP_RE = re.compile(r'[\s\-]+')
+_NAME_TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def _normalize_id_number(value):
+    if not value:
+        return None
+    return _ID_STRIP_RE.sub('', value).upper() or None
+
+
+def _token_rows(kind, report_id, name):
+    tokens = {token for token in _NAME_TOKEN_RE.findall((name or '').lower()) if len(token) > 1}
+    return [{'report_kind': kind, 'report_id': report_id, 'token': token} for token in sorted(tokens)]
+
+
+def _backfill(table, kind):
+    bind = op.get_bind()
+    reports = sa.table(table, sa.column('id'), sa.column('id_number'),
+                       sa.column('owner_name'), sa.column('normalized_id'))
+    tokens = sa.table('name_token', sa.column('report_kind'), sa.column('report_id'), sa.column('token'))
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.select(reports.c.id, reports.c.id_number, reports.c.owner_name)
+                            .where(reports.c.id > last_id).order_by(reports.c.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            break
+        bind.execute(reports.update().where(reports.c.id == sa.bindparam('report_id'))
+                     .values(normalized_id=sa.bindparam('value')),
+                     [{'report_id': row.id, 'value': _normalize_id_number(row.id_number)} for row in rows])
+        token_batch = [token for row in rows for token in _token_rows(kind, row.id, row.owner_name)]
+        if token_batch:
+            bind.execute(tokens.insert(), token_batch)
+        last_id = rows[-1].id
+
+
+def upgrade():
+    for table in REPORT_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('normalized_id', sa.String(length=50), nullable=True))
+            batch_op.create_index(f'ix_{table}_match', ['id_type', 'normalized_id', 'status'], unique=False)
+
+    op.create_table('name_token',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('report_kind', sa.String(length=5), nullable=False),
+    sa.Column('report_id', sa.Integer(), nullable=False),
+    sa.Column('token', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('name_token', schema=None) as batch_op:
+        batch_op.create_index('ix_name_token_lookup', ['report_kind', 'token', 'report_id'], unique=False)
+        batch_op.create_index('ix_name_token_report', ['report_id', 'report_kind'], unique=False)
+
+    for table, kind in REPORT_TABLES.items():
+        _backfill(table, kind)
+
+
+def downgrade():
+    with op.batch_alter_table('name_token', schema=None) as batch_op:
+        batch_op.drop_index('ix_name_token_report')
+        batch_op.drop_index('ix_name_token_lookup')
+    op.drop_table('name_token')
+
+    for table in REPORT_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_match')
+            batch_op.drop_column('normalized_id')
@@ -0,0 +1,81 @@
+"""report closed_at
+
+Revision ID: f58a3c1d7b92
+Revises: e41b7c9d2a56
+Create Date: 2026-10-18 19:20:00.000000
+
+closed_at records when a report's status last became matched or recovered;
+retention ages closed reports from it. Reports that are already closed get
+the upgrade time, so none of them are archived before a full retention
+period has passed.
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f58a3c1d7b92'
+down_revision = 'e41b7c9d2a56'
+branch_labels = None
+depends_on = None
+
+REPORT_TABLES = ('lost_report', 'found_report')
+
+CLOSED_PREDICATE = sa.text('closed_at IS NOT NULL')
+
+
+# Frozen copy of the search triggers from 3a304ca32652
+SEARCH_COLUMNS = {
+    'lost_report': ('id_number', 'owner_name', 'reporter_name', 'description', 'location_lost'),
+    'found_report': ('id_number', 'owner_name', 'finder_name', 'description', 'location_found'),
+}
+
+
+def _reinstall_search_triggers(table):
+    # SQLite batch mode recreates the table, which drops its FTS triggers
+    bind = op.get_bind()
+    fts = f'{table}_fts'
+    if bind.dialect.name != 'sqlite' or not bind.exec_driver_sql(
+            'SELECT count(*) FROM sqlite_master WHERE name = ?', (fts,)).scalar():
+        return
+    columns = SEARCH_COLUMNS[table]
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    for statement in (
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+    ):
+        bind.exec_driver_sql(statement)
+
+
+def upgrade():
+    now = datetime.utcnow()
+    for table in REPORT_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('closed_at', sa.DateTime(), nullable=True))
+        _reinstall_search_triggers(table)
+
+        reports = sa.table(table, sa.column('status', sa.String), sa.column('closed_at', sa.DateTime))
+        op.execute(reports.update()
+                   .where(sa.cast(reports.c.status, sa.String).in_(('matched', 'recovered')))
+                   .values(closed_at=now))
+        op.create_index(f'ix_{table}_closed', table, ['closed_at'], unique=False,
+                        sqlite_where=CLOSED_PREDICATE, postgresql_where=CLOSED_PREDICATE)
+
+
+def downgrade():
+    for table in REPORT_TABLES:
+        op.drop_index(f'ix_{table}_closed', table_name=table)
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('closed_at')
+        _reinstall_search_triggers(table)
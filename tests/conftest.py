@@ -0,0 +1,33 @@
+import glob
+import os
+import tempfile
+
+import pytest
+
+# Config reads the environment once, on the first create_app()
+_tmp = tempfile.mkdtemp(prefix='lostid-tests-')
+os.environ.update({
+    'DATABASE_URL': f'sqlite:///{_tmp}/test.db',
+    'MAIL_OUTBOX_SENDER': 'false',
+    'CACHE_BACKEND': 'memory',
+    'STORAGE_BACKEND': 'local',
+})
+for name in ('DATABASE_REPLICA_URL', 'CACHE_REDIS_URL', 'PROFILE_SLOW_REQUESTS'):
+    os.environ.pop(name, None)
+
+from app import create_app, db  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, UPLOAD_FOLDER=str(tmp_path / 'uploads'))
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    # A fresh file per test; drop_all can't order the lost/found report cycle
+    for path in glob.glob(f'{_tmp}/test.db*'):
+        os.remove(path)
@@ -0,0 +1,163 @@
+import fakeredis
+import pytest
+import redis
+
+from app.utils import cache as cache_module
+from app.utils.cache import MemoryCache, RedisCache, cached, get_cache, invalidate
+from app.utils.metrics import CACHE_INVALIDATIONS, CACHE_REQUESTS
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    return clock
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def backend(request, app):
+    if request.param == 'redis':
+        backend = RedisCache(None, client=fakeredis.FakeRedis())
+    else:
+        backend = MemoryCache(16)
+    app.extensions['cache'] = backend
+    return backend
+
+
+def counting(value):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return value
+    return compute, calls
+
+
+def test_miss_then_hit_counts(backend):
+    hits, misses = CACHE_REQUESTS.value('counts', 'hit'), CACHE_REQUESTS.value('counts', 'miss')
+    compute, calls = counting({'open': 3})
+
+    assert cached('counts', 'k', compute) == {'open': 3}
+    assert cached('counts', 'k', compute) == {'open': 3}
+
+    assert len(calls) == 1
+    assert CACHE_REQUESTS.value('counts', 'miss') == misses + 1
+    assert CACHE_REQUESTS.value('counts', 'hit') == hits + 1
+
+
+def test_invalidate_bumps_generation(backend):
+    invalidations = CACHE_INVALIDATIONS.value('reports')
+    compute, calls = counting([1, 2])
+    cached('counts', 'k', compute)
+
+    invalidate()
+    cached('counts', 'k', compute)
+
+    assert len(calls) == 2
+    assert backend.generation('reports')[0] == 1
+    assert CACHE_INVALIDATIONS.value('reports') == invalidations + 1
+
+
+def test_invalidate_leaves_other_namespaces(backend):
+    compute, calls = counting('x')
+    cached('counts', 'k', compute, namespace='places')
+
+    invalidate('reports')
+    cached('counts', 'k', compute, namespace='places')
+
+    assert len(calls) == 1
+
+
+def test_memory_entry_expires_after_ttl(app, clock):
+    app.extensions['cache'] = MemoryCache(16)
+    app.config['CACHE_TTLS'] = {'counts': 30}
+    compute, calls = counting(1)
+
+    cached('counts', 'k', compute)
+    clock.now += 29
+    cached('counts', 'k', compute)
+    clock.now += 2
+    cached('counts', 'k', compute)
+
+    assert len(calls) == 2
+
+
+def test_redis_entry_gets_ttl(app):
+    client = fakeredis.FakeRedis()
+    app.extensions['cache'] = RedisCache(None, client=client)
+    app.config['CACHE_TTLS'] = {'counts': 30}
+
+    cached('counts', 'k', lambda: 1)
+
+    (key,) = client.keys('lostid:counts:*')
+    assert 0 < client.ttl(key) <= 30
+
+
+def test_replica_fill_after_invalidation_is_short_lived(app, clock, monkeypatch):
+    app.extensions['cache'] = MemoryCache(16)
+    app.config.update(CACHE_TTLS={'counts': 30}, CACHE_REPLICA_LAG=5)
+    monkeypatch.setattr(cache_module, 'reading_replica', lambda: True)
+    compute, calls = counting(1)
+
+    invalidate()
+    cached('counts', 'k', compute)
+    clock.now += 6
+    cached('counts', 'k', compute)  # refilled, now well after the invalidation
+    clock.now += 20
+    cached('counts', 'k', compute)
+
+    assert len(calls) == 2
+
+
+def test_memory_cache_evicts_least_recently_used():
+    backend = MemoryCache(2)
+    backend.set('a', 1, 60)
+    backend.set('b', 2, 60)
+    backend.get('a')
+    backend.set('c', 3, 60)
+
+    assert backend.get('a') == 1
+    assert backend.get('b') is None
+    assert backend.get('c') == 3
+
+
+class BrokenRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise redis.ConnectionError('Connection refused')
+        return fail
+
+
+def test_redis_failure_is_a_miss(app, caplog):
+    app.extensions['cache'] = RedisCache(None, client=BrokenRedis())
+    compute, calls = counting({'open': 1})
+
+    assert cached('counts', 'k', compute) == {'open': 1}
+    assert cached('counts', 'k', compute) == {'open': 1}
+    invalidate()
+
+    assert len(calls) == 2
+    assert 'Cache get failed' in caplog.text
+
+
+def test_memory_backend_warns_with_several_workers(app, monkeypatch, caplog):
+    monkeypatch.setattr(cache_module.sys, 'argv', ['gunicorn', '-w', '4', 'run:app'])
+    app.extensions.pop('cache', None)
+
+    assert isinstance(get_cache(), MemoryCache)
+    assert '4 worker processes' in caplog.text
+
+
+def test_redis_url_selects_redis_backend():
+    assert cache_module.create_cache({'CACHE_BACKEND': 'redis', 'CACHE_REDIS_URL': 'redis://localhost:1/0'}).name == 'redis'
@@ -0,0 +1,193 @@
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app import db
+from app.models import EmailOutbox
+from app.utils.email_utils import SMTPSender, _claim_due, deliver_pending, drain_outbox, send_email_notification
+
+
+class Inbox:
+    """aiosmtpd handler that keeps what it receives and can refuse on demand"""
+
+    def __init__(self):
+        self.messages = []
+        self.fail_data = 0  # answer the next n DATA commands with a temporary error
+        self.refused = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refused:
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.fail_data:
+            self.fail_data -= 1
+            return '451 Try again later'
+        self.messages.append(envelope)
+        return '250 Message accepted'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def inbox():
+    inbox = Inbox()
+    inbox.port = free_port()
+    controller = Controller(inbox, hostname='127.0.0.1', port=inbox.port)
+    controller.start()
+    yield inbox
+    controller.stop()
+
+
+@pytest.fixture
+def sender(app, inbox):
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=inbox.port, MAIL_USE_TLS=False,
+                      MAIL_USERNAME='lostid@example.com', MAIL_PASSWORD=None, MAIL_TIMEOUT=5,
+                      MAIL_OUTBOX_SENDER=False, MAIL_RATE_LIMIT_PER_MINUTE=0)
+    sender = SMTPSender(app.config)
+    yield sender
+    sender.close()
+
+
+def queue(count, to='owner@example.com'):
+    for n in range(count):
+        send_email_notification(to, 'Owner', f'Match {n}', f'<p>Match {n}</p>')
+    db.session.commit()
+
+
+def make_due(entry):
+    entry.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_batch_is_sent_over_one_connection(app, sender, inbox):
+    queue(20)
+
+    assert deliver_pending(sender) == (20, 0)
+
+    assert len(inbox.messages) == 20
+    assert sender.connections_opened == 1
+    assert {entry.status for entry in EmailOutbox.query} == {'sent'}
+
+
+def test_drain_reuses_the_connection_across_batches(app, sender, inbox):
+    app.config['MAIL_OUTBOX_BATCH_SIZE'] = 10
+    queue(25)
+
+    assert drain_outbox(sender) == (25, 0)
+
+    assert len(inbox.messages) == 25
+    assert sender.connections_opened == 1
+
+
+def test_rate_limit_shrinks_the_batch(app, sender):
+    app.config.update(MAIL_RATE_LIMIT_PER_MINUTE=6000, MAIL_OUTBOX_LEASE_SECONDS=1)
+    queue(60)
+
+    sent, failed = deliver_pending(sender)
+
+    assert (sent, failed) == (50, 0)  # 6000/min for half a 1s lease
+
+
+def test_failed_send_is_retried_with_backoff(app, sender, inbox):
+    app.config.update(MAIL_RETRY_BASE_SECONDS=30, MAIL_MAX_ATTEMPTS=5)
+    inbox.fail_data = 2
+    queue(1)
+    entry = EmailOutbox.query.one()
+
+    before = datetime.utcnow()
+    assert deliver_pending(sender) == (0, 1)
+    assert entry.status == 'pending'
+    assert entry.attempts == 1
+    assert '451' in entry.last_error
+    assert before + timedelta(seconds=30) <= entry.next_attempt_at <= datetime.utcnow() + timedelta(seconds=30)
+
+    assert deliver_pending(sender) == (0, 0)  # not due yet
+
+    make_due(entry)
+    before = datetime.utcnow()
+    assert deliver_pending(sender) == (0, 1)
+    assert entry.next_attempt_at >= before + timedelta(seconds=60)
+
+    make_due(entry)
+    assert deliver_pending(sender) == (1, 0)
+    assert entry.status == 'sent'
+    assert entry.attempts == 3
+    assert entry.last_error is None
+    # A failed DATA leaves the connection in an unknown state, so it is replaced
+    assert sender.connections_opened == 3
+
+
+def test_entry_fails_after_max_attempts(app, sender, inbox):
+    app.config['MAIL_MAX_ATTEMPTS'] = 2
+    inbox.fail_data = 5
+    queue(1)
+    entry = EmailOutbox.query.one()
+
+    deliver_pending(sender)
+    make_due(entry)
+    assert deliver_pending(sender) == (0, 1)
+
+    assert entry.status == 'failed'
+    make_due(entry)
+    assert deliver_pending(sender) == (0, 0)
+
+
+def test_refused_recipient_keeps_the_connection(app, sender, inbox):
+    inbox.refused.add('gone@example.com')
+    queue(1, to='gone@example.com')
+    queue(2)
+
+    assert deliver_pending(sender) == (2, 1)
+
+    assert sender.connections_opened == 1
+    assert EmailOutbox.query.filter_by(to_email='gone@example.com').one().status == 'pending'
+
+
+def test_dropped_connection_is_replaced(app, sender, inbox):
+    queue(1)
+    deliver_pending(sender)
+    sender._smtp.sock.shutdown(socket.SHUT_RDWR)  # as if the server had timed the idle connection out
+
+    queue(1)
+    assert deliver_pending(sender) == (1, 0)
+
+    assert sender.connections_opened == 2
+
+
+def test_claim_leases_due_entries(app):
+    app.config['MAIL_OUTBOX_LEASE_SECONDS'] = 300
+    queue(3)
+    later = EmailOutbox(to_email='later@example.com', subject='Later', html_content='<p></p>',
+                        next_attempt_at=datetime.utcnow() + timedelta(hours=1))
+    db.session.add(later)
+    db.session.commit()
+
+    first = _claim_due(2, 300)
+    second = _claim_due(2, 300)
+    third = _claim_due(2, 300)
+
+    assert len(first) == 2 and len(second) == 1 and third == []
+    assert {entry.id for entry in first}.isdisjoint(entry.id for entry in second)
+    for entry in first + second:
+        assert entry.status == 'sending'
+        assert entry.next_attempt_at > datetime.utcnow() + timedelta(seconds=290)
+    assert later.status == 'pending'
+
+
+def test_expired_lease_is_reclaimed(app):
+    queue(1)
+    (entry,) = _claim_due(10, 300)
+    assert _claim_due(10, 300) == []
+
+    make_due(entry)  # the sender holding it died before finishing
+
+    assert [claimed.id for claimed in _claim_due(10, 300)] == [entry.id]
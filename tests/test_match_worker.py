@@ -0,0 +1,64 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app import db
+from app.models import FoundReport, LostReport, MatchCandidate
+from app.utils import match_worker
+from app.utils.file_utils import staged_upload_key
+from app.utils.match_worker import _queue, _retry_photo, process_report
+from app.utils.storage import get_storage
+
+
+@pytest.fixture
+def reports(app):
+    """A found report, and a lost report for the same ID whose photo is still staged"""
+    buf = io.BytesIO()
+    Image.new('RGB', (400, 250), 'red').save(buf, 'JPEG')
+    buf.seek(0)
+    key = staged_upload_key('card.jpg')
+    get_storage().put(key, buf, 'image/jpeg')
+
+    found = FoundReport(finder_name='F', finder_email='f@example.com', id_number='S-123',
+                        id_type='Student ID', owner_name='Jane Doe')
+    lost = LostReport(reporter_name='J', reporter_email='j@example.com', id_number='S123',
+                      id_type='Student ID', owner_name='Jane Doe', photo_upload=key)
+    db.session.add_all([found, lost])
+    db.session.commit()
+    return lost, found, key
+
+
+def test_failed_photo_still_scores_and_keeps_the_upload(app, reports, monkeypatch):
+    lost, found, key = reports
+    storage = get_storage()
+
+    def unavailable(key, chunk_size=None):
+        raise OSError('storage unavailable')
+        yield
+    monkeypatch.setattr(storage, 'stream', unavailable)
+
+    assert process_report('lost', lost.id) is False
+
+    assert MatchCandidate.query.filter_by(lost_id=lost.id, found_id=found.id).count() == 1
+    lost = db.session.get(LostReport, lost.id)
+    assert lost.photo_upload == key and lost.photo_path is None
+
+    monkeypatch.undo()
+    assert process_report('lost', lost.id) is True
+
+    lost = db.session.get(LostReport, lost.id)
+    assert lost.photo_upload is None and lost.photo_path and lost.photo_hash is not None
+    assert not storage.exists(key)
+
+
+def test_photo_retry_is_requeued_then_given_up(app, monkeypatch, caplog):
+    monkeypatch.setattr(match_worker, 'PHOTO_RETRY_SECONDS', (0.01,))
+
+    _retry_photo(app, 'lost', 7, 0)
+    assert _queue.get(timeout=2) == ('lost', 7, 1)
+    _queue.task_done()
+
+    _retry_photo(app, 'lost', 7, 1)
+    assert _queue.empty()
+    assert 'Giving up on the photo of lost report 7' in caplog.text
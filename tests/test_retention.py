@@ -0,0 +1,88 @@
+import io
+from datetime import datetime, timedelta
+
+from PIL import Image
+
+from app import db
+from app.models import FoundReport, LostReport
+from app.utils import file_utils, retention_utils
+from app.utils.file_utils import attach_pending_photo, staged_upload_key, variant_filename
+from app.utils.retention_utils import apply_retention
+from app.utils.storage import get_storage
+
+LONG_AGO = datetime.utcnow() - timedelta(days=400)
+
+
+def lost_report(**fields):
+    return LostReport(reporter_name='R', reporter_email='r@example.com', id_number='S1',
+                      id_type='Student ID', owner_name='Jane Doe', **fields)
+
+
+def store_photo(app, name):
+    storage = get_storage()
+    for size in [None] + sorted(app.config['IMAGE_THUMBNAIL_SIZES']):
+        storage.put(variant_filename(name, size), io.BytesIO(b'image'))
+
+
+def test_unshared_photo_is_retired(app, tmp_path):
+    app.config.update(ARCHIVE_FOLDER=str(tmp_path / 'archive'), RETENTION_PHOTOS='delete')
+    store_photo(app, 'aa/bb/old.webp')
+    db.session.add(lost_report(status='recovered', closed_at=LONG_AGO, photo_path='aa/bb/old.webp'))
+    db.session.commit()
+
+    batches = list(apply_retention(datetime.utcnow() - timedelta(days=365)))
+
+    assert [tuple(batch) for batch in batches] == [(1, 0, 1)]
+    assert not get_storage().exists('aa/bb/old.webp')
+
+
+def test_photo_given_to_a_new_report_during_the_batch_is_kept(app, tmp_path, monkeypatch):
+    app.config.update(ARCHIVE_FOLDER=str(tmp_path / 'archive'), RETENTION_PHOTOS='delete')
+    for name in ('aa/bb/first.webp', 'aa/bb/second.webp'):
+        store_photo(app, name)
+        db.session.add(lost_report(status='recovered', closed_at=LONG_AGO, photo_path=name))
+    db.session.commit()
+
+    # Another worker attaches an upload identical to the second photo while
+    # the first one is being retired
+    retire = retention_utils._retire_photo
+    def retire_while_attaching(storage, archive, photo_path, *args):
+        if photo_path == 'aa/bb/first.webp':
+            with db.engine.begin() as connection:
+                connection.execute(db.insert(FoundReport).values(
+                    finder_name='F', finder_email='f@example.com', id_type='Student ID',
+                    owner_name='Jane Doe', status='reported', photo_path='aa/bb/second.webp'))
+        retire(storage, archive, photo_path, *args)
+    monkeypatch.setattr(retention_utils, '_retire_photo', retire_while_attaching)
+
+    batches = list(apply_retention(datetime.utcnow() - timedelta(days=365)))
+
+    assert [tuple(batch) for batch in batches] == [(2, 0, 1)]
+    assert not get_storage().exists('aa/bb/first.webp')
+    assert get_storage().exists('aa/bb/second.webp')
+
+
+def test_attach_restores_a_photo_retired_while_it_was_processed(app, monkeypatch):
+    buf = io.BytesIO()
+    Image.new('RGB', (400, 250), 'red').save(buf, 'JPEG')
+    buf.seek(0)
+    key = staged_upload_key('card.jpg')
+    storage = get_storage()
+    storage.put(key, buf, 'image/jpeg')
+    report = lost_report(photo_upload=key)
+    db.session.add(report)
+    db.session.commit()
+
+    save_photo = file_utils.save_photo
+    saved = []
+    def save_then_retire(fileobj, label):
+        filename, photo_hash = save_photo(fileobj, label)
+        if not saved:
+            storage.delete(filename)  # retention removing the identical stored photo
+        saved.append(filename)
+        return filename, photo_hash
+    monkeypatch.setattr(file_utils, 'save_photo', save_then_retire)
+
+    assert attach_pending_photo(report)
+
+    assert storage.exists(db.session.get(LostReport, report.id).photo_path)
@@ -0,0 +1,114 @@
+import base64
+import io
+import json
+import os
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from app.utils import storage as storage_module
+from app.utils.storage import S3Storage
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+        monkeypatch.setenv(name, 'testing')
+    with mock_aws():
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='photos')
+        yield S3Storage('photos', prefix='uploads/', region='us-east-1', presign_expires=3600,
+                        multipart_threshold=5 * MB)
+
+
+def head(s3, key):
+    return s3.client.head_object(Bucket='photos', Key='uploads/' + key)
+
+
+def test_small_put_is_a_single_upload(s3):
+    s3.put('a.webp', io.BytesIO(b'image bytes'), content_type='image/webp')
+
+    response = head(s3, 'a.webp')
+    assert '-' not in response['ETag']
+    assert response['ContentType'] == 'image/webp'
+    assert s3.get('a.webp') == b'image bytes'
+
+
+def test_put_above_threshold_is_multipart(s3):
+    data = os.urandom(11 * MB)
+
+    s3.put('big.bin', io.BytesIO(data))
+
+    assert head(s3, 'big.bin')['ETag'].strip('"').endswith('-3')  # 5 + 5 + 1 MB parts
+    assert s3.get('big.bin') == data
+
+
+def test_put_with_storage_class(s3):
+    s3.put('old.webp', io.BytesIO(b'x'), storage_class='GLACIER_IR')
+
+    assert head(s3, 'old.webp')['StorageClass'] == 'GLACIER_IR'
+
+
+def test_stream_yields_chunks(s3):
+    data = os.urandom(200 * 1024)
+    s3.put('s.bin', io.BytesIO(data))
+
+    chunks = list(s3.stream('s.bin', chunk_size=64 * 1024))
+
+    assert b''.join(chunks) == data
+    assert max(len(chunk) for chunk in chunks) <= 64 * 1024
+    assert len(chunks) >= 4
+
+
+def test_delete(s3):
+    s3.put('d.webp', io.BytesIO(b'x'))
+    assert s3.exists('d.webp')
+
+    s3.delete('d.webp')
+
+    assert not s3.exists('d.webp')
+    with pytest.raises(ClientError):
+        s3.get('d.webp')
+
+
+class Clock:
+    now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+def test_presigned_url_is_reused_for_half_its_lifetime(s3, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(storage_module, 'time', clock)
+    signed = []
+    generate = s3.client.generate_presigned_url
+    monkeypatch.setattr(s3.client, 'generate_presigned_url',
+                        lambda *args, **kwargs: signed.append(kwargs) or generate(*args, **kwargs))
+
+    url = s3.presign('p.webp')
+    clock.now += 1700
+    assert s3.presign('p.webp') == url
+    assert len(signed) == 1
+
+    clock.now += 200  # past half of the hour
+    s3.presign('p.webp')
+    assert len(signed) == 2
+
+    s3.presign('other.webp')
+    assert signed[-1]['Params'] == {'Bucket': 'photos', 'Key': 'uploads/other.webp'}
+    assert signed[-1]['ExpiresIn'] == 3600
+    assert 'uploads/p.webp' in url
+
+
+def test_presign_upload_limits_size_and_type(s3):
+    form = s3.presign_upload('pending/u.webp', max_bytes=5 * MB, expires=600)
+
+    assert form['fields']['key'] == 'uploads/pending/u.webp'
+    policy = json.loads(base64.b64decode(form['fields']['policy']))
+    assert ['content-length-range', 1, 5 * MB] in policy['conditions']
+    assert ['starts-with', '$Content-Type', 'image/'] in policy['conditions']
+    assert 'photos' in form['url']